@@ -1,17 +1,149 @@
 """Integration with Ollama for AI-powered command analysis."""
 
 import json
-import requests
-import os
-from dotenv import load_dotenv
-from typing import Dict, Any, Tuple
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
-# Load environment variables from .env file
-load_dotenv()
+from analysis_cache import AnalysisCache, get_analysis_cache
+from circuit_breaker import CircuitBreaker
+from command_rules import Classification, RuleClassifier
+from command_templates import normalize_command
+from config import get_bool, get_env, get_float, get_int, get_path
 
 # Default Ollama endpoint and model from environment variables
-OLLAMA_API_URL = os.environ.get("OLLAMA_API_URL", "http://localhost:11434/api/generate")
-DEFAULT_AI_MODEL = os.environ.get("AI_MODEL", "deepseek")
+OLLAMA_API_URL = get_env("OLLAMA_API_URL", "http://localhost:11434/api/generate")
+DEFAULT_AI_MODEL = get_env("AI_MODEL", "deepseek")
+CLASSIFIER_RULES_ENABLED = get_bool("CLASSIFIER_RULES_ENABLED", True)
+CLASSIFIER_MIN_CONFIDENCE = get_float("CLASSIFIER_MIN_CONFIDENCE", 0.8)
+AI_BATCH_SIZE = get_int("AI_BATCH_SIZE", 20)
+OLLAMA_CONNECT_TIMEOUT = get_float("OLLAMA_CONNECT_TIMEOUT", 2)
+OLLAMA_READ_TIMEOUT = get_float("OLLAMA_READ_TIMEOUT", 60)
+OLLAMA_POOL_SIZE = get_int("OLLAMA_POOL_SIZE", 4)
+OLLAMA_FAILURE_THRESHOLD = get_int("OLLAMA_FAILURE_THRESHOLD", 3)
+OLLAMA_COOLDOWN_SECONDS = get_float("OLLAMA_COOLDOWN_SECONDS", 300)
+OLLAMA_CIRCUIT_PATH = get_path("OLLAMA_CIRCUIT_PATH", "~/.terminal_logger/ollama_circuit.json")
+
+# A classifier stage takes a command and returns a Classification, or None to abstain
+ClassifierStage = Callable[[str], Optional[Classification]]
+
+_classifier_stages: Optional[List[ClassifierStage]] = None
+_session = None
+_session_lock = threading.Lock()
+_circuit_breaker: Optional[CircuitBreaker] = None
+
+
+def get_session():
+    """Return the pooled keep-alive session used for every Ollama request."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests is only imported when a command is actually analyzed
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Return the breaker that skips Ollama after repeated failures."""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker(OLLAMA_FAILURE_THRESHOLD, OLLAMA_COOLDOWN_SECONDS, OLLAMA_CIRCUIT_PATH)
+    return _circuit_breaker
+
+
+def _has_complete_json(text: str, opener: str) -> bool:
+    """Return True once text contains a complete JSON value starting at the first opener."""
+    start = text.find(opener)
+    if start < 0:
+        return False
+    try:
+        json.JSONDecoder().raw_decode(text, start)
+    except json.JSONDecodeError:
+        return False
+    return True
+
+
+def _generate(prompt: str, model: str, opener: str = "{") -> Tuple[int, str]:
+    """
+    Stream a completion from Ollama, stopping as soon as a complete JSON value has arrived.
+
+    Connection errors, server errors and running past the read deadline count
+    as failures for the circuit breaker; exceptions are re-raised.
+
+    Args:
+        prompt: The prompt to send
+        model: The Ollama model to use
+        opener: '{' to wait for a JSON object, '[' for an array
+
+    Returns:
+        Tuple containing (HTTP status code, response text so far)
+    """
+    breaker = get_circuit_breaker()
+    deadline = time.monotonic() + OLLAMA_READ_TIMEOUT
+    try:
+        response = get_session().post(
+            OLLAMA_API_URL,
+            json={
+                "model": model,
+                "prompt": prompt,
+                "stream": True
+            },
+            timeout=(OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT),
+            stream=True
+        )
+    except Exception:
+        breaker.record_failure()
+        raise
+
+    try:
+        if response.status_code != 200:
+            if response.status_code >= 500:
+                breaker.record_failure()
+            return response.status_code, ""
+
+        text = ""
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            text += chunk.get("response", "")
+            if chunk.get("done") or _has_complete_json(text, opener):
+                break
+            if time.monotonic() > deadline:
+                # Too slow: keep what arrived, but let the breaker know
+                breaker.record_failure()
+                return 200, text
+    except Exception:
+        breaker.record_failure()
+        raise
+    finally:
+        # Closing early stops the generation instead of reading it to the end
+        response.close()
+
+    breaker.record_success()
+    return 200, text
+
+
+def get_classifier_stages() -> List[ClassifierStage]:
+    """Return the stages run before the cache and Ollama, building the defaults on first use."""
+    global _classifier_stages
+    if _classifier_stages is None:
+        _classifier_stages = [RuleClassifier.from_config()] if CLASSIFIER_RULES_ENABLED else []
+    return _classifier_stages
+
+
+def register_classifier_stage(stage: ClassifierStage, index: int = None):
+    """Add a classifier stage, by default after the existing ones."""
+    stages = get_classifier_stages()
+    stages.insert(len(stages) if index is None else index, stage)
+
 
 def analyze_command(command: str, model: str = None) -> Tuple[str, str]:
     """
@@ -24,8 +156,13 @@ def analyze_command(command: str, model: str = None) -> Tuple[str, str]:
     Returns:
         Tuple containing (category, description)
     """
+    # requests is only imported when a command is actually analyzed
+    import requests
+
     if model is None:
         model = DEFAULT_AI_MODEL
+    if not get_circuit_breaker().allow():
+        return "uncategorized", "AI analysis skipped: Ollama is unavailable"
     prompt = f"""
 Analyze the following shell command and provide:
 1. A single category it belongs to (file management, network, system administration, data processing, etc.)
@@ -37,22 +174,10 @@ Command: {command}
 """
 
     try:
-        response = requests.post(
-            OLLAMA_API_URL,
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=1000
-        )
-        
-        if response.status_code != 200:
-            return "uncategorized", f"Failed to categorize: API returned status {response.status_code}"
+        status_code, response_text = _generate(prompt, model)
         
-        # Parse the response
-        result = response.json()
-        response_text = result.get('response', '')
+        if status_code != 200:
+            return "uncategorized", f"Failed to categorize: API returned status {status_code}"
         
         # Extract JSON from the response
         # Sometimes LLM responses include extra text before/after the JSON
@@ -80,3 +205,185 @@ Command: {command}
         return "uncategorized", f"Failed to connect to Ollama API: {str(e)}"
     except Exception as e:
         return "uncategorized", f"Error analyzing command: {str(e)}"
+
+
+def _parse_batch_response(response_text: str, count: int) -> Dict[int, Tuple[str, str]]:
+    """
+    Map the objects in a batch response to command indexes.
+
+    Every JSON object in the text is decoded on its own, so a truncated or
+    partly malformed array still yields the entries that did arrive. Objects
+    carrying a valid 'index' are mapped by it; the rest are mapped by position.
+    """
+    decoder = json.JSONDecoder()
+    objects = []
+    pos = response_text.find('{')
+    while pos >= 0:
+        try:
+            obj, end = decoder.raw_decode(response_text, pos)
+        except json.JSONDecodeError:
+            pos = response_text.find('{', pos + 1)
+            continue
+        if isinstance(obj, dict) and "category" in obj:
+            objects.append(obj)
+        pos = response_text.find('{', end)
+
+    parsed = {}
+    for position, obj in enumerate(objects):
+        index = obj.get("index")
+        if not isinstance(index, int) or not 0 <= index < count:
+            index = position if len(objects) == count else None
+        if index is None or index in parsed:
+            continue
+        parsed[index] = (obj["category"], obj.get("description", "No description provided"))
+    return parsed
+
+
+def analyze_commands(commands: List[str], model: str = None, batch_size: int = None) -> List[Tuple[str, str]]:
+    """
+    Analyze many shell commands with one Ollama request per batch.
+
+    The commands are numbered in a single prompt and the model is asked for a
+    JSON array back. Commands missing from a partial or malformed response are
+    analyzed one at a time with analyze_command.
+    
+    Args:
+        commands: The shell commands to analyze
+        model: The Ollama model to use (default: from env or 'deepseek')
+        batch_size: Commands per request (default: $AI_BATCH_SIZE or 20)
+        
+    Returns:
+        List of (category, description) tuples, in the same order as commands
+    """
+    if model is None:
+        model = DEFAULT_AI_MODEL
+    batch_size = batch_size or AI_BATCH_SIZE
+
+    results: List[Tuple[str, str]] = []
+    for offset in range(0, len(commands), batch_size):
+        batch = commands[offset:offset + batch_size]
+        numbered = "\n".join(f"{i}: {command}" for i, command in enumerate(batch))
+        prompt = f"""
+Analyze each of the following shell commands and provide, for every command:
+1. A single category it belongs to (file management, network, system administration, data processing, etc.)
+2. A brief description explaining what the command does in 1-2 sentences.
+
+Format your response as a JSON array with one object per command, in the same order, each with keys 'index', 'category' and 'description'. 'index' is the number before the command.
+
+Commands:
+{numbered}
+"""
+
+        parsed = {}
+        try:
+            if get_circuit_breaker().allow():
+                status_code, response_text = _generate(prompt, model, opener="[")
+                if status_code == 200:
+                    parsed = _parse_batch_response(response_text, len(batch))
+        except Exception:
+            # Fall back to per-command analysis below
+            pass
+
+        for i, command in enumerate(batch):
+            results.append(parsed[i] if i in parsed else analyze_command(command, model))
+
+    return results
+
+
+def _classify_without_llm(command: str, cache: Optional[AnalysisCache], stages: List[ClassifierStage]) -> Optional[Tuple[str, str]]:
+    """Try the classifier stages and then the template cache. Returns None on a miss."""
+    for stage in stages:
+        name = getattr(stage, "name", type(stage).__name__)
+        result = stage(command)
+        if result is not None and result.confidence >= CLASSIFIER_MIN_CONFIDENCE:
+            if cache is not None:
+                cache.incr(f"{name}.hit")
+            return result.category, result.description
+        if cache is not None:
+            cache.incr(f"{name}.miss")
+
+    if cache is not None:
+        return cache.get(normalize_command(command))
+    return None
+
+
+def categorize_command(
+    command: str,
+    model: str = None,
+    cache: AnalysisCache = None,
+    stages: List[ClassifierStage] = None,
+) -> Tuple[str, str]:
+    """
+    Categorize a shell command, calling Ollama only when cheaper stages cannot.
+
+    The classifier stages (the rules table by default) run first and win when
+    they are confident enough. Next, cached analysis of the same command
+    template is reused. Only then is Ollama called, and its answer cached.
+    Failed analyses are not cached.
+    
+    Args:
+        command: The shell command to analyze
+        model: The Ollama model to use (default: from env or 'deepseek')
+        cache: Analysis cache to use (default: the shared cache, if enabled)
+        stages: Classifier stages to try first (default: get_classifier_stages())
+        
+    Returns:
+        Tuple containing (category, description)
+    """
+    return categorize_commands([command], model, cache, stages)[0]
+
+
+def categorize_commands(
+    commands: List[str],
+    model: str = None,
+    cache: AnalysisCache = None,
+    stages: List[ClassifierStage] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Categorize many commands, sending everything the stages and cache miss to Ollama in batches.
+
+    See categorize_command for the order in which classifiers are tried.
+
+    Returns:
+        List of (category, description) tuples, in the same order as commands
+    """
+    if cache is None:
+        cache = get_analysis_cache()
+    if stages is None:
+        stages = get_classifier_stages()
+
+    results: List[Optional[Tuple[str, str]]] = [_classify_without_llm(command, cache, stages) for command in commands]
+    pending = [i for i, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
+    if not get_circuit_breaker().allow():
+        # Ollama failed repeatedly; skip AI until the cool-down is over
+        if cache is not None:
+            cache.incr("llm.skipped", len(pending))
+        for i in pending:
+            results[i] = ("uncategorized", "AI analysis skipped: Ollama is unavailable")
+        return results
+
+    start = time.monotonic()
+    pending_commands = [commands[i] for i in pending]
+    if len(pending_commands) == 1:
+        analyzed = [analyze_command(pending_commands[0], model)]
+    else:
+        analyzed = analyze_commands(pending_commands, model)
+
+    if cache is not None:
+        cache.incr("llm.calls", len(pending))
+        cache.incr("llm.ms", int((time.monotonic() - start) * 1000))
+
+    for i, (category, description) in zip(pending, analyzed):
+        results[i] = (category, description)
+        if category == "uncategorized":
+            continue
+        if cache is not None:
+            cache.put(normalize_command(commands[i]), category, description)
+        # Let stages that track their accuracy compare with Ollama's answer
+        for stage in stages:
+            if hasattr(stage, "observe"):
+                stage.observe(commands[i], category, cache)
+    return results
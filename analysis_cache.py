@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of AI command analysis, keyed by command template.
+
+Commands such as `git status` or `ls -la <dir>` repeat constantly; once one
+of them has been categorized, later commands with the same template reuse the
+category and description instead of calling Ollama again. The cache is a
+small SQLite database so that every wrapper process and the ingestion daemon
+share it, with LRU eviction, a TTL and hit/miss counters.
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import get_bool, get_float, get_int, get_path
+
+DEFAULT_CACHE_ENABLED = get_bool("AI_CACHE_ENABLED", True)
+DEFAULT_CACHE_PATH = get_path("AI_CACHE_PATH", "~/.terminal_logger/analysis_cache.sqlite3")
+DEFAULT_CACHE_MAX_ENTRIES = get_int("AI_CACHE_MAX_ENTRIES", 10000)
+DEFAULT_CACHE_TTL_DAYS = get_float("AI_CACHE_TTL_DAYS", 30)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis (
+    template TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    description TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analysis_last_used ON analysis (last_used);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_shared_cache = None
+
+
+class AnalysisCache:
+    """SQLite-backed template -> (category, description) cache."""
+
+    def __init__(self, path: str = None, max_entries: int = None, ttl_days: float = None):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.max_entries = DEFAULT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl_seconds = (DEFAULT_CACHE_TTL_DAYS if ttl_days is None else ttl_days) * 86400
+        self._lock = threading.Lock()
+
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def get(self, template: str) -> Optional[Tuple[str, str]]:
+        """Return the cached (category, description) for a template, or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT category, description, created_at FROM analysis WHERE template = ?",
+                (template,),
+            ).fetchone()
+
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM analysis WHERE template = ?", (template,))
+                row = None
+
+            if row is None:
+                self._incr("cache.miss")
+                return None
+
+            self._conn.execute("UPDATE analysis SET last_used = ? WHERE template = ?", (now, template))
+            self._incr("cache.hit")
+            return row[0], row[1]
+
+    def put(self, template: str, category: str, description: str):
+        """Cache the analysis for a template, evicting least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis (template, category, description, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (template, category, description, now, now),
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM analysis WHERE template IN "
+                    "(SELECT template FROM analysis ORDER BY last_used LIMIT ?)",
+                    (overflow,),
+                )
+                self._incr("cache.evicted", overflow)
+
+    def incr(self, name: str, amount: int = 1):
+        """Increment a named counter."""
+        with self._lock:
+            self._incr(name, amount)
+
+    def _incr(self, name: str, amount: int = 1):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def counters(self) -> Dict[str, int]:
+        """Return all counters."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, value FROM counters ORDER BY name").fetchall())
+
+    def clear(self):
+        """Remove all cached entries and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis")
+            self._conn.execute("DELETE FROM counters")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def get_analysis_cache() -> Optional[AnalysisCache]:
+    """Return the process-wide cache, or None if caching is disabled or unavailable."""
+    global _shared_cache
+    if not DEFAULT_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        try:
+            _shared_cache = AnalysisCache()
+        except (OSError, sqlite3.Error) as e:
+            print(f"AI analysis cache unavailable: {e}", file=sys.stderr)
+            return None
+    return _shared_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the AI analysis cache")
+    parser.add_argument("--path", default=DEFAULT_CACHE_PATH, help=f"Cache database (default: {DEFAULT_CACHE_PATH} or $AI_CACHE_PATH)")
+    parser.add_argument("--clear", action="store_true", help="Remove all cached entries and reset the counters")
+
+    args = parser.parse_args()
+
+    cache = AnalysisCache(args.path)
+    if args.clear:
+        cache.clear()
+        print("Cache cleared")
+        return 0
+
+    counters = cache.counters()
+    print(f"Cache: {args.path}")
+    print(f"Entries: {len(cache)} (max {cache.max_entries})")
+    print(f"Evicted: {counters.get('cache.evicted', 0)}")
+
+    # Hit rates of the cache and of every classifier stage in front of Ollama
+    answered = 0
+    stages = sorted({name.rsplit(".", 1)[0] for name in counters if name.endswith((".hit", ".miss"))})
+    for stage in stages:
+        hits = counters.get(f"{stage}.hit", 0)
+        lookups = hits + counters.get(f"{stage}.miss", 0)
+        answered += hits
+        print(f"{stage}: {hits}/{lookups} hits ({hits / lookups:.1%})" if lookups else f"{stage}: no lookups")
+
+    # Agreement with Ollama of stages running in shadow mode
+    for stage in sorted({name.rsplit(".", 1)[0] for name in counters if name.endswith((".agree", ".disagree"))}):
+        agreed = counters.get(f"{stage}.agree", 0)
+        compared = agreed + counters.get(f"{stage}.disagree", 0)
+        print(f"{stage} agreement with Ollama: {agreed}/{compared} ({agreed / compared:.1%})")
+
+    llm_calls = counters.get("llm.calls", 0)
+    print(f"Commands sent to Ollama: {llm_calls}")
+    if counters.get("llm.skipped"):
+        print(f"Commands skipped while Ollama was unavailable: {counters['llm.skipped']}")
+    if llm_calls:
+        average_ms = counters.get("llm.ms", 0) / llm_calls
+        print(f"Average Ollama latency per command: {average_ms:.0f} ms")
+        print(f"Estimated Ollama time saved: {answered * average_ms / 1000:.1f} s")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
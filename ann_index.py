@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+On-disk inverted-file (IVF) index over command embeddings.
+
+Embeddings are clustered around `lists` k-means centroids. A query is only
+compared with the embeddings of its `nprobe` nearest clusters, so raising
+nprobe trades latency for recall; with nprobe equal to the number of lists
+the search is exact.
+
+The index keeps one append-only file per day, named like the day collection
+(YYYY_MM_DD.ivf). Each record holds the document _id, its cluster and its
+normalized float32 embedding, so inserting a command is a single append, and
+dropping a day is removing its file. Commands inserted before the index was
+trained have no cluster yet and are always scanned. Appends hold a shared
+lock on the index's lock file and a rebuild holds it exclusively, so a
+rebuild in another process cannot replace a file in the middle of an append.
+
+Build or rebuild the index from MongoDB with `vector-index build`.
+"""
+
+import argparse
+import array
+import contextlib
+import fcntl
+import json
+import math
+import os
+import struct
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+
+from config import get_env, get_int, get_path
+from embedding_storage import StoredEmbedding, embedding_to_list
+
+DEFAULT_VECTOR_INDEX = get_env("VECTOR_INDEX", "off").lower()
+DEFAULT_VECTOR_INDEX_PATH = get_path("VECTOR_INDEX_PATH", "~/.terminal_logger/vector_index")
+DEFAULT_VECTOR_INDEX_LISTS = get_int("VECTOR_INDEX_LISTS", 256)
+DEFAULT_VECTOR_INDEX_NPROBE = get_int("VECTOR_INDEX_NPROBE", 8)
+
+# Cluster of records added before the index was trained; always scanned
+UNASSIGNED = -1
+
+_indexes: Dict[str, "IVFIndex"] = {}
+_indexes_lock = threading.Lock()
+
+
+def vector_index_enabled() -> bool:
+    return DEFAULT_VECTOR_INDEX == "ivf"
+
+
+def record_dtype(dimensions: int):
+    """Return the numpy dtype of one index record."""
+    import numpy as np
+
+    return np.dtype([("id", "u1", (12,)), ("list", "<i4"), ("vector", "<f4", (dimensions,))])
+
+
+def train_centroids(vectors, lists: int, iterations: int = 10, seed: int = 0):
+    """
+    Cluster normalized vectors with spherical k-means.
+
+    Returns:
+        float32 array of shape (lists, dimensions) with unit-length rows
+    """
+    import numpy as np
+    from vector_engine import normalize_rows
+
+    rng = np.random.default_rng(seed)
+    lists = max(1, min(lists, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), lists, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        assignments = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = ~sums.any(axis=1)
+        # Restart empty clusters from random vectors
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_lists(vectors, centroids, chunk_size: int = 65536):
+    """Return the nearest centroid of each normalized vector."""
+    import numpy as np
+
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        assignments[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assignments
+
+
+class IVFIndex:
+    """IVF index of one database, stored in a directory of per-day files."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._meta = None
+        self._meta_mtime = None
+        self._centroids = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def meta(self) -> Optional[Dict[str, int]]:
+        """Return {'dimensions', 'lists'}, or None for an empty index."""
+        try:
+            mtime = os.stat(self._file("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        # Another process may have rebuilt the index since it was read
+        if mtime != self._meta_mtime:
+            with open(self._file("meta.json")) as fh:
+                self._meta = json.load(fh)
+            self._meta_mtime = mtime
+            self._centroids = None
+        return self._meta
+
+    def centroids(self):
+        """Return the centroid matrix, or None if the index is not trained."""
+        meta = self.meta()
+        if self._centroids is None and meta and meta["lists"]:
+            import numpy as np
+            self._centroids = np.load(self._file("centroids.npy"))
+        return self._centroids
+
+    def _write_meta(self, dimensions: int, lists: int, centroids=None):
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        if centroids is not None:
+            import numpy as np
+            tmp_path = self._file("centroids.tmp.npy")
+            np.save(tmp_path, centroids)
+            os.replace(tmp_path, self._file("centroids.npy"))
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as fh:
+            json.dump({"dimensions": dimensions, "lists": lists}, fh)
+        os.replace(tmp_path, self._file("meta.json"))
+        self._meta = {"dimensions": dimensions, "lists": lists}
+        self._meta_mtime = os.stat(self._file("meta.json")).st_mtime_ns
+        self._centroids = centroids
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool = False):
+        """Hold the thread lock and the index's file lock, shared by appends and exclusive for rebuilds."""
+        with self._lock:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+            fd = os.open(self._file("lock"), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                yield
+            finally:
+                os.close(fd)
+
+    def days(self) -> List[str]:
+        """Return the days in the index, oldest first."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.path) if name.endswith(".ivf"))
+
+    def add(self, day: str, record_id: ObjectId, vector: StoredEmbedding) -> bool:
+        """
+        Append one embedding, in either stored format, to a day's file.
+
+        Returns:
+            False if the embedding is empty or has another size than the index
+        """
+        vector = embedding_to_list(vector)
+        norm = math.sqrt(sum(x * x for x in vector)) if vector else 0.0
+        if not norm:
+            return False
+        with self._locked():
+            meta = self.meta()
+            if meta is None:
+                self._write_meta(len(vector), 0)
+                meta = self.meta()
+            if len(vector) != meta["dimensions"]:
+                return False
+
+            vector = array.array("f", (x / norm for x in vector))
+            centroids = self.centroids()
+            list_id = UNASSIGNED
+            if centroids is not None:
+                import numpy as np
+                list_id = int(np.argmax(centroids @ np.frombuffer(vector, dtype=np.float32)))
+
+            record = ObjectId(record_id).binary + struct.pack("<i", list_id) + vector.tobytes()
+            # One O_APPEND write per record, so concurrent writers do not interleave
+            fd = os.open(self._file(f"{day}.ivf"), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, record)
+            finally:
+                os.close(fd)
+        return True
+
+    def _read_day(self, day: str):
+        import numpy as np
+
+        dtype = record_dtype(self.meta()["dimensions"])
+        path = self._file(f"{day}.ivf")
+        # Ignore a partial record left by an interrupted write
+        count = os.path.getsize(path) // dtype.itemsize
+        if not count:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+    def search(
+        self, query: Sequence[float], k: int, nprobe: int = None, start_day: str = None
+    ) -> List[Tuple[str, ObjectId, float]]:
+        """
+        Return the k indexed embeddings most similar to the query, best first.
+
+        Args:
+            query: Query embedding
+            k: Number of results
+            nprobe: Clusters to scan (default: VECTOR_INDEX_NPROBE)
+            start_day: First day to search, as YYYY_MM_DD
+
+        Returns:
+            List of (day, _id, cosine similarity)
+        """
+        import numpy as np
+        from vector_engine import normalize, top_k
+
+        meta = self.meta()
+        query = normalize(query)
+        if meta is None or query is None or len(query) != meta["dimensions"]:
+            return []
+
+        centroids = self.centroids()
+        probes = None
+        if centroids is not None:
+            nprobe = DEFAULT_VECTOR_INDEX_NPROBE if nprobe is None else nprobe
+            probes = np.append(top_k(centroids @ query, nprobe), UNASSIGNED).astype(np.int32)
+
+        days, ids, scores = [], [], []
+        for day in self.days():
+            if start_day and day < start_day:
+                continue
+            records = self._read_day(day)
+            selected = records if probes is None else records[np.isin(records["list"], probes)]
+            if not len(selected):
+                continue
+            day_scores = np.asarray(selected["vector"]) @ query
+            best = top_k(day_scores, k)
+            days.extend([day] * len(best))
+            ids.extend(selected["id"][best])
+            scores.append(day_scores[best])
+
+        if not scores:
+            return []
+        scores = np.concatenate(scores)
+        return [(days[i], ObjectId(ids[i].tobytes()), float(scores[i])) for i in top_k(scores, k)]
+
+    def rebuild(
+        self,
+        days: Dict[str, Tuple[List[ObjectId], object]],
+        lists: int = None,
+        sample_size: int = 50000,
+        appended_since: datetime = None,
+    ):
+        """
+        Train new centroids and rewrite the given days.
+
+        Args:
+            days: Mapping of YYYY_MM_DD to (_ids, float32 matrix of normalized embeddings)
+            lists: Number of clusters (default: VECTOR_INDEX_LISTS, at most one per ~40 embeddings)
+            sample_size: Embeddings the centroids are trained on
+            appended_since: When `days` was read; records appended to the index
+                since then and missing from `days` are kept, assigned to the
+                new clusters
+        """
+        import numpy as np
+
+        matrices = [matrix for _, matrix in days.values() if len(matrix)]
+        if not matrices:
+            return
+        vectors = np.concatenate(matrices)
+        lists = lists or DEFAULT_VECTOR_INDEX_LISTS
+        lists = max(1, min(lists, len(vectors) // 40))
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)]
+        centroids = train_centroids(sample, lists)
+        dtype = record_dtype(vectors.shape[1])
+
+        with self._locked(exclusive=True):
+            appended = self._appended_records(days, dtype, appended_since)
+            for day in self.days():
+                if day not in days and day not in appended:
+                    os.remove(self._file(f"{day}.ivf"))
+            self._write_meta(vectors.shape[1], len(centroids), centroids)
+            for day in sorted(set(days) | set(appended)):
+                ids, matrix = days.get(day, ([], vectors[:0]))
+                records = np.empty(len(ids), dtype=dtype)
+                records["id"] = np.frombuffer(b"".join(ObjectId(record_id).binary for record_id in ids), dtype=np.uint8).reshape(-1, 12)
+                records["list"] = assign_lists(matrix, centroids) if len(ids) else []
+                records["vector"] = matrix
+                if day in appended:
+                    extra = appended[day]
+                    extra["list"] = assign_lists(extra["vector"], centroids)
+                    records = np.concatenate([records, extra])
+                tmp_path = self._file(f"{day}.ivf.tmp")
+                records.tofile(tmp_path)
+                os.replace(tmp_path, self._file(f"{day}.ivf"))
+
+    def _appended_records(self, days: Dict[str, Tuple[List[ObjectId], object]], dtype, since: Optional[datetime]):
+        """Return, per day, the indexed records created since `since` that `days` does not have."""
+        import numpy as np
+
+        meta = self.meta()
+        if since is None or meta is None or record_dtype(meta["dimensions"]) != dtype:
+            return {}
+        # ObjectIds hold whole seconds, so a record from the second the read started is kept too
+        cutoff = int(since.timestamp()) - 1
+        appended = {}
+        for day in self.days():
+            records = self._read_day(day)
+            if not len(records):
+                continue
+            created = np.ascontiguousarray(records["id"][:, :4]).view(">u4").ravel()
+            records = np.array(records[created >= cutoff])
+            known = {ObjectId(record_id).binary for record_id in days.get(day, ([], None))[0]}
+            records = records[np.array([row.tobytes() not in known for row in records["id"]], dtype=bool)]
+            if len(records):
+                appended[day] = records
+        return appended
+
+    def prune(self, cutoff_day: str) -> List[str]:
+        """Remove the days older than cutoff_day (YYYY_MM_DD); returns them."""
+        removed = [day for day in self.days() if day < cutoff_day]
+        for day in removed:
+            try:
+                os.remove(self._file(f"{day}.ivf"))
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        meta = self.meta() or {"dimensions": 0, "lists": 0}
+        days = self.days()
+        records = sum(len(self._read_day(day)) for day in days) if meta["dimensions"] else 0
+        return {**meta, "days": len(days), "records": records}
+
+
+def get_vector_index(db_name: str) -> IVFIndex:
+    """Return the shared index of a database."""
+    with _indexes_lock:
+        index = _indexes.get(db_name)
+        if index is None:
+            index = _indexes[db_name] = IVFIndex(os.path.join(DEFAULT_VECTOR_INDEX_PATH, db_name))
+        return index
+
+
+def build_index(db, days: int, lists: int = None) -> Dict[str, int]:
+    """Rebuild a database's index from the embeddings stored in MongoDB."""
+    from datetime import timedelta
+    from collection_catalog import day_of
+    from db import HISTORY_COLLECTION, date_range_filter, get_collections_in_date_range
+    from vector_engine import load_embeddings
+
+    read_at = datetime.now()
+    start_date = read_at - timedelta(days=days)
+    by_day: Dict[str, Tuple[list, object]] = {}
+    for collection_name in get_collections_in_date_range(db, start_date):
+        matrix = load_embeddings(db, [collection_name], date_range_filter(start_date))
+        if not len(matrix):
+            continue
+        if collection_name == HISTORY_COLLECTION:
+            # One collection for all days: split by the creation day of each _id
+            for i, (_, record_id) in enumerate(matrix.refs):
+                day = record_id.generation_time.astimezone().strftime("%Y_%m_%d")
+                ids, rows = by_day.setdefault(day, ([], []))
+                ids.append(record_id)
+                rows.append(i)
+            by_day = {day: (ids, matrix.matrix[rows]) for day, (ids, rows) in by_day.items()}
+        else:
+            by_day[day_of(collection_name)] = ([record_id for _, record_id in matrix.refs], matrix.matrix)
+
+    index = get_vector_index(db.name)
+    index.rebuild(by_day, lists, appended_since=read_at)
+    return index.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and inspect the on-disk vector index")
+    parser.add_argument("action", choices=["build", "stats"], help="Rebuild the index from MongoDB, or show its size")
+    parser.add_argument("--db", default=get_env("MONGODB_DB", "terminal_logger"), help="MongoDB database name (default: terminal_logger or $MONGODB_DB)")
+    parser.add_argument("--days", type=int, default=get_int("RETENTION_DAYS", 30), help="Days of history to index (default: 30 or $RETENTION_DAYS)")
+    parser.add_argument("--lists", type=int, default=DEFAULT_VECTOR_INDEX_LISTS, help=f"Clusters to partition embeddings into (default: {DEFAULT_VECTOR_INDEX_LISTS})")
+
+    args = parser.parse_args()
+
+    if args.action == "build":
+        from db import connect_to_mongodb
+        stats = build_index(connect_to_mongodb(db_name=args.db), args.days, args.lists)
+    else:
+        stats = get_vector_index(args.db).stats()
+
+    print(f"Index: {os.path.join(DEFAULT_VECTOR_INDEX_PATH, args.db)}")
+    print(f"Embeddings: {stats['records']} over {stats['days']} days")
+    print(f"Dimensions: {stats['dimensions']}, clusters: {stats['lists'] or 'not trained'}")
+    if not vector_index_enabled():
+        print("Set VECTOR_INDEX=ivf to use it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for Ollama command categorization.
+
+The same list of commands is analyzed once with one request per command
+(analyze_command) and once in batches (analyze_commands), and the number of
+commands analyzed per second is reported for both. Requires a running Ollama
+server; the analysis cache and rules are bypassed so every command reaches
+the model.
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ai_integration import DEFAULT_AI_MODEL, AI_BATCH_SIZE, analyze_command, analyze_commands
+
+SAMPLE_COMMANDS = [
+    "ls -la /var/log",
+    "git commit -m 'Fix typo'",
+    "docker ps -a",
+    "curl -s https://example.com/api/status",
+    "grep -rn TODO src/",
+    "tar -czf backup.tar.gz ~/projects",
+    "python -m pytest -q tests",
+    "kubectl get pods -n default",
+    "du -sh * | sort -h",
+    "ssh deploy@10.0.0.5 'systemctl restart app'",
+    "make -j8",
+    "psql -U postgres -c 'SELECT 1'",
+    "npm install --save-dev eslint",
+    "find . -name '*.pyc' -delete",
+    "ffmpeg -i input.mov -vcodec h264 output.mp4",
+    "openssl x509 -in cert.pem -noout -dates",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-command and batched Ollama categorization")
+    parser.add_argument("--model", default=DEFAULT_AI_MODEL, help=f"Ollama model (default: {DEFAULT_AI_MODEL})")
+    parser.add_argument("--count", type=int, default=40, help="Number of commands to analyze (default: 40)")
+    parser.add_argument("--batch-size", type=int, default=AI_BATCH_SIZE, help=f"Commands per batched request (default: {AI_BATCH_SIZE})")
+
+    args = parser.parse_args()
+
+    commands = list(itertools.islice(itertools.cycle(SAMPLE_COMMANDS), args.count))
+
+    start = time.perf_counter()
+    single = [analyze_command(command, args.model) for command in commands]
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = analyze_commands(commands, args.model, args.batch_size)
+    batched_seconds = time.perf_counter() - start
+
+    failed = sum(category == "uncategorized" for category, _ in single + batched)
+    agree = sum(a[0].lower() == b[0].lower() for a, b in zip(single, batched))
+
+    print(f"{'per-command':<14} {len(commands) / single_seconds:8.2f} commands/s  ({single_seconds:.1f} s)")
+    print(f"{'batched':<14} {len(commands) / batched_seconds:8.2f} commands/s  ({batched_seconds:.1f} s, batch size {args.batch_size})")
+    print(f"Speed-up: {single_seconds / batched_seconds:.1f}x")
+    print(f"Same category: {agree}/{len(commands)}, uncategorized results: {failed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
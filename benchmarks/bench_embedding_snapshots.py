@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Loading 30 days of embeddings: decoding MongoDB replies against memory-mapped snapshots.
+
+No database is needed. The MongoDB path is measured from the BSON replies a
+query would receive (binary float32 embeddings and their _ids), decoded and
+stacked as vector_search does; the network transfer itself comes on top of
+that and is not included. The snapshot path loads the same days from .npy
+files in a temporary directory, which after the first query are served from
+the page cache. Both are timed up to and including scoring one query.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import bson
+import numpy as np
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from embedding_snapshots import SnapshotStore
+from embedding_storage import embedding_length, encode_embedding, stack_embeddings
+from vector_engine import EmbeddingMatrix, search_matrices
+
+
+def measure(func, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def decode_replies(replies, query, limit):
+    """Decode each day's BSON reply into a matrix, as load_embeddings does, and search."""
+    matrices = []
+    for day, reply in replies:
+        docs = bson.decode_all(reply)
+        vectors = [doc["vector_embedding"] for doc in docs]
+        refs = [(day, doc["_id"]) for doc in docs]
+        matrices.append(EmbeddingMatrix.from_blocks([(stack_embeddings(vectors, embedding_length(vectors[0])), refs)]))
+    return search_matrices(matrices, query, limit)
+
+
+def map_snapshots(store, days, query, limit):
+    return search_matrices([store.load(day, day) for day in days], query, limit)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MongoDB replies against memory-mapped embedding snapshots")
+    parser.add_argument("--days", type=int, default=30, help="Days searched (default: 30)")
+    parser.add_argument("--per-day", type=int, default=2000, help="Commands per day (default: 2000)")
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding size (default: 384, as all-MiniLM-L6-v2)")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (default: 5)")
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=args.dimensions).astype(np.float32)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        store = SnapshotStore(tmp_dir)
+        replies, days = [], []
+        for n in range(args.days):
+            day = f"2023_01_{n + 1:02d}"
+            vectors = rng.normal(size=(args.per_day, args.dimensions)).astype(np.float32)
+            ids = [ObjectId() for _ in range(args.per_day)]
+            replies.append((day, b"".join(
+                bson.encode({"_id": record_id, "vector_embedding": encode_embedding(vector)})
+                for record_id, vector in zip(ids, vectors)
+            )))
+            store.save(day, EmbeddingMatrix.from_blocks([(vectors, [(day, record_id) for record_id in ids])]))
+            days.append(day)
+
+        reply_mb = sum(len(reply) for _, reply in replies) / 1024 / 1024
+        decode_ms = measure(lambda: decode_replies(replies, query, args.limit), args.runs)
+        map_snapshots(store, days, query, args.limit)  # Warm the page cache
+        mmap_ms = measure(lambda: map_snapshots(store, days, query, args.limit), args.runs)
+
+        print(f"{args.days} days x {args.per_day} commands, {reply_mb:.0f} MB of BSON replies")
+        print(f"{'decode replies':<16} {decode_ms:>9.1f} ms  (plus the transfer from MongoDB)")
+        print(f"{'snapshots':<16} {mmap_ms:>9.1f} ms  {decode_ms / mmap_ms:.1f}x faster")
+    finally:
+        shutil.rmtree(tmp_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
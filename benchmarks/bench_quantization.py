@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Recall, memory and latency of quantized vector search against the float path.
+
+Clustered random embeddings stand in for stored ones, so no database or
+model is needed. Each quantizer is trained on a sample, the full set is
+encoded, and queries near the data are answered with asymmetric scoring,
+with and without re-ranking the best `limit * rerank` candidates from the
+float rows. Recall@limit is measured against the exact float search.
+
+The default data is clusters with isotropic noise, which is the hard case
+for product quantization: neighbours inside a cluster differ only by noise
+spread evenly over every slice.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from quantization import QuantizedMatrix, train_quantizer
+from vector_engine import EmbeddingMatrix, normalize_rows
+
+
+def clustered(rng, count, centres, spread):
+    vectors = centres[rng.integers(len(centres), size=count)] + spread * rng.normal(size=(count, centres.shape[1]))
+    return normalize_rows(vectors.astype(np.float32))
+
+
+def evaluate(matrix, exact_results, queries, limit, runs):
+    for query in queries[:runs]:
+        matrix.search(query, limit)
+    timings, found = [], 0
+    for query, expected in zip(queries, exact_results):
+        start = time.perf_counter()
+        results = matrix.search(query, limit)
+        timings.append((time.perf_counter() - start) * 1000)
+        found += len(expected & {ref for ref, _ in results})
+    return found / (limit * len(queries)), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized against float embedding search")
+    parser.add_argument("--size", type=int, default=100_000, help="Stored vectors (default: 100000)")
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding size (default: 384, as all-MiniLM-L6-v2)")
+    parser.add_argument("--clusters", type=int, default=1000, help="Clusters the data is drawn around (default: 1000)")
+    parser.add_argument("--queries", type=int, default=50, help="Queries measured (default: 50)")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[4, 10], help="Candidates per result re-scored exactly (default: 4 10)")
+    parser.add_argument("--runs", type=int, default=3, help="Warm-up queries per variant (default: 3)")
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centres = rng.normal(size=(args.clusters, args.dimensions))
+    vectors = clustered(rng, args.size, centres, 0.5)
+    queries = clustered(rng, args.queries, centres, 0.5)
+    refs = list(range(args.size))
+
+    exact = EmbeddingMatrix(vectors, refs)
+    exact_results = [{ref for ref, _ in exact.search(query, args.limit)} for query in queries]
+    _, float_ms = evaluate(exact, exact_results, queries, args.limit, args.runs)
+    float_bytes = vectors.nbytes / args.size
+
+    print(f"{args.size} vectors x {args.dimensions} dimensions, recall@{args.limit} against the float search")
+    print(f"{'variant':<14} {'bytes/vec':>9} {'memory':>10} {'train':>9} {'recall':>7} {'query':>10}")
+    print(f"{'float32':<14} {float_bytes:>9.0f} {vectors.nbytes / 1024 / 1024:>7.1f} MB {'':>9} {1.0:>7.3f} {float_ms:>7.1f} ms")
+
+    sample = vectors[rng.choice(args.size, size=min(args.size, 100_000), replace=False)]
+    for kind in ("sq8", "pq"):
+        start = time.perf_counter()
+        quantizer = train_quantizer(kind, sample)
+        codes = quantizer.encode(vectors)
+        train_s = time.perf_counter() - start
+        code_bytes = codes.nbytes / args.size
+        for label, rerank in [(kind, 0)] + [(f"{kind}+rerank{r}", r) for r in args.rerank]:
+            matrix = QuantizedMatrix(codes, quantizer, refs, exact=vectors, rerank=rerank)
+            recall, query_ms = evaluate(matrix, exact_results, queries, args.limit, args.runs)
+            print(f"{label:<14} {code_bytes:>9.0f} {codes.nbytes / 1024 / 1024:>7.1f} MB {train_s:>7.1f} s {recall:>7.3f} {query_ms:>7.1f} ms")
+
+    print("Memory is what a search scans; re-ranking also reads limit x rerank float rows per query.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Latency of query_commands against the number of day collections.
+
+Creates synthetic command_history_YYYY_MM_DD collections in a scratch
+database, then times a selective query (which has to read every day) and an
+unfiltered one (answered by the newest days) for each fan-out strategy:
+the original one-collection-at-a-time loop, the threaded fan-out and the
+$unionWith aggregation. The scratch database is dropped afterwards.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db as db_module
+from db import connect_to_mongodb, query_commands
+
+COMMANDS = ["ls -la", "git status", "make", "pytest -q", "docker ps", "curl localhost:8080", "cat README.md"]
+
+
+def query_sequential(db, filters, limit, days_to_search):
+    """The original implementation: one round trip per collection, newest first."""
+    start_date_str = (datetime.now() - timedelta(days=days_to_search)).strftime("%Y_%m_%d")
+    names = sorted(
+        (c for c in db.list_collection_names() if c.startswith("command_history_") and c[16:] >= start_date_str),
+        reverse=True,
+    )
+    results = []
+    for name in names:
+        remaining = limit - len(results)
+        if remaining <= 0:
+            break
+        results.extend(db[name].find(filters).sort("timestamp", -1).limit(remaining))
+    results.sort(key=lambda x: x.get("timestamp", datetime.min), reverse=True)
+    return results[:limit]
+
+
+def populate(db, days: int, per_day: int):
+    """Create one collection per day with timestamp-indexed synthetic commands."""
+    now = datetime.now()
+    for day in range(days):
+        date = now - timedelta(days=day)
+        collection = db[f"command_history_{date.strftime('%Y_%m_%d')}"]
+        collection.insert_many([
+            {
+                "command": random.choice(COMMANDS),
+                "exit_code": 1 if random.random() < 0.01 else 0,
+                "timestamp": date.replace(hour=0, minute=0) + timedelta(seconds=random.randrange(86400)),
+                "execution_time_seconds": random.random(),
+            }
+            for _ in range(per_day)
+        ])
+        collection.create_index([("timestamp", -1)])
+        collection.create_index([("exit_code", 1), ("timestamp", -1)])
+
+
+def measure(func, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query_commands fan-out over day collections")
+    parser.add_argument("--db", default="terminal_logger_bench", help="Scratch database, dropped afterwards (default: terminal_logger_bench)")
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30, 90], help="Numbers of day collections to query (default: 1 7 30 90)")
+    parser.add_argument("--per-day", type=int, default=2000, help="Documents per day collection (default: 2000)")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (default: 5)")
+
+    args = parser.parse_args()
+
+    db = connect_to_mongodb(db_name=args.db)
+    db.client.drop_database(args.db)
+    try:
+        populate(db, max(args.days), args.per_day)
+
+        strategies = {
+            "sequential": lambda filters, days: query_sequential(db, filters, args.limit, days),
+            "threads": lambda filters, days: query_commands(db, filters, args.limit, days),
+            "union": lambda filters, days: query_commands(db, filters, args.limit, days),
+        }
+        queries = {"failed": {"exit_code": {"$ne": 0}, "command": "make"}, "latest": {}}
+
+        print(f"{'days':>5}  {'query':<8} " + " ".join(f"{name:>12}" for name in strategies))
+        for days in args.days:
+            for query_name, filters in queries.items():
+                timings = []
+                for name, func in strategies.items():
+                    with patch.object(db_module, "QUERY_FANOUT", name):
+                        timings.append(measure(lambda: func(filters, days), args.runs))
+                print(f"{days:>5}  {query_name:<8} " + " ".join(f"{ms:9.1f} ms" for ms in timings))
+    finally:
+        db.client.drop_database(args.db)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the terminal-logger console scripts.
+
+Each entry point listed in setup.py is started in a fresh interpreter with
+--help, which imports the module and builds its argument parser without
+touching MongoDB, Ollama or the embedding model. The script fails when the
+median start time of any entry point exceeds the budget, or when starting it
+imports one of the heavy optional modules.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Modules that must only be imported once they are actually needed
+HEAVY_MODULES = ("sentence_transformers", "torch", "numpy", "requests")
+
+PROBE = """
+import sys, runpy
+sys.argv = [{module!r}, "--help"]
+try:
+    runpy.run_module({module!r}, run_name="__main__")
+except SystemExit:
+    pass
+heavy = [m for m in {heavy!r} if m in sys.modules]
+sys.stderr.write("HEAVY:" + ",".join(heavy) + "\\n")
+"""
+
+
+def console_scripts() -> List[Tuple[str, str]]:
+    """Return (script name, module) pairs declared in setup.py."""
+    with open(os.path.join(ROOT, "setup.py"), "r", encoding="utf-8") as fh:
+        setup_py = fh.read()
+    return re.findall(r'"([\w-]+)=([\w.]+):\w+"', setup_py)
+
+
+def measure(module: str, runs: int) -> Tuple[float, List[str]]:
+    """Return the median start time in ms and any heavy modules imported."""
+    timings = []
+    heavy = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+        for line in proc.stderr.splitlines():
+            if line.startswith("HEAVY:") and line[6:]:
+                heavy = line[6:].split(",")
+    return statistics.median(timings), heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of terminal-logger entry points")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per entry point (default: 5)")
+    parser.add_argument("--budget-ms", type=float, default=float(os.environ.get("STARTUP_BUDGET_MS", 500)), help="Maximum median start time in milliseconds (default: 500 or $STARTUP_BUDGET_MS)")
+
+    args = parser.parse_args()
+
+    # Interpreter start-up alone, for reference
+    baseline, _ = measure("this", args.runs)
+    print(f"{'python (baseline)':<20} {baseline:8.1f} ms")
+
+    failures = []
+    for script, module in console_scripts():
+        median_ms, heavy = measure(module, args.runs)
+        status = "ok"
+        if median_ms > args.budget_ms:
+            status = "OVER BUDGET"
+            failures.append(script)
+        if heavy:
+            status = f"imports {', '.join(heavy)}"
+            failures.append(script)
+        print(f"{script:<20} {median_ms:8.1f} ms  {status}")
+
+    if failures:
+        print(f"\n{len(failures)} entry point(s) failed the {args.budget_ms:.0f} ms startup budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
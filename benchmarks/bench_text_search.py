@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Latency of --search: unanchored $regex against the text index.
+
+Fills the single command_history collection of a scratch database with
+synthetic commands and AI descriptions (1M by default), builds the history
+indexes, then times query_commands for a few search terms with the regex
+filter and with ranked $text search. The scratch database is dropped
+afterwards.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import db as db_module
+from db import build_query_filters, connect_to_mongodb, ensure_history_indexes, query_commands, HISTORY_COLLECTION
+
+PROGRAMS = {
+    "git": (["status", "push", "pull", "commit -m wip", "rebase main", "log --oneline"], "version control"),
+    "docker": (["ps", "build -t app .", "compose up -d", "logs web", "exec -it db sh"], "container management"),
+    "kubectl": (["get pods", "describe pod api", "apply -f deploy.yaml", "rollout restart deploy/api"], "kubernetes cluster"),
+    "pytest": (["-q", "-x tests", "-k parser", "--lf"], "run the test suite"),
+    "curl": (["localhost:8080/health", "-I https://example.com", "-X POST api/v1/jobs"], "http request"),
+    "ls": (["-la", "-lh /var/log", "src"], "list directory contents"),
+    "grep": (["-rn TODO .", "-i error app.log", "-c import *.py"], "search file contents"),
+    "make": (["", "test", "clean", "install"], "build the project"),
+}
+SEARCHES = ["rebase", "compose", "deploy", "health"]
+
+
+def populate(db, count: int, batch_size: int = 10000):
+    """Insert count synthetic commands spread over the last 30 days."""
+    now = datetime.now()
+    programs = list(PROGRAMS)
+    collection = db[HISTORY_COLLECTION]
+    for offset in range(0, count, batch_size):
+        batch = []
+        for _ in range(min(batch_size, count - offset)):
+            program = random.choice(programs)
+            args, description = PROGRAMS[program]
+            batch.append({
+                "command": f"{program} {random.choice(args)}".strip(),
+                "ai_category": description.split()[0],
+                "ai_description": description,
+                "exit_code": 1 if random.random() < 0.05 else 0,
+                "timestamp": now - timedelta(seconds=random.randrange(30 * 86400)),
+                "execution_time_seconds": random.random(),
+            })
+        collection.insert_many(batch, ordered=False)
+
+
+def measure(func, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark regex against text-index search")
+    parser.add_argument("--db", default="terminal_logger_bench", help="Scratch database, dropped afterwards (default: terminal_logger_bench)")
+    parser.add_argument("--count", type=int, default=1_000_000, help="Synthetic commands to insert (default: 1000000)")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (default: 5)")
+
+    args = parser.parse_args()
+
+    db = connect_to_mongodb(db_name=args.db)
+    db.client.drop_database(args.db)
+    try:
+        start = time.perf_counter()
+        populate(db, args.count)
+        print(f"Inserted {args.count} commands in {time.perf_counter() - start:.1f} s")
+        start = time.perf_counter()
+        ensure_history_indexes(db)
+        print(f"Built indexes in {time.perf_counter() - start:.1f} s")
+
+        print(f"{'search':<10} {'regex':>12} {'text':>12}")
+        with patch.object(db_module, "STORAGE_LAYOUT", "single"):
+            for search in SEARCHES:
+                timings = []
+                for text_search in (False, True):
+                    filters = build_query_filters(search, text_search=text_search)
+                    timings.append(measure(lambda: query_commands(db, filters, args.limit, 30), args.runs))
+                print(f"{search:<10} " + " ".join(f"{ms:9.1f} ms" for ms in timings))
+    finally:
+        db.client.drop_database(args.db)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Scoring latency of vector search: pairwise cosine_similarity against the matrix engine.
+
+Random embeddings stand in for stored ones, so no database or model is
+needed. The original path converts every stored list and recomputes its norm
+per pair, then sorts all scores; it is timed on a sample and extrapolated to
+larger sizes, which would otherwise take minutes and tens of GB as Python
+lists. The matrix engine is timed on the full size, both building the
+normalized float32 matrix and answering a query.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from vector_engine import EmbeddingMatrix
+from vector_search import cosine_similarity
+
+
+def measure(func, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def pairwise_search(vectors, query, limit):
+    """The original scoring loop of vector_search."""
+    scored = [(i, cosine_similarity(query, vector)) for i, vector in enumerate(vectors)]
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return scored[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pairwise against vectorized embedding search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000], help="Numbers of stored vectors (default: 100000 1000000)")
+    parser.add_argument("--dimensions", type=int, default=384, help="Embedding size (default: 384, as all-MiniLM-L6-v2)")
+    parser.add_argument("--sample", type=int, default=20_000, help="Vectors the pairwise loop is timed on (default: 20000)")
+    parser.add_argument("--limit", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per measurement (default: 5)")
+
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=args.dimensions).astype(np.float32)
+
+    sample = rng.normal(size=(args.sample, args.dimensions)).astype(np.float32).tolist()
+    query_list = query.tolist()
+    pairwise_ms = measure(lambda: pairwise_search(sample, query_list, args.limit), 1)
+    per_vector_ms = pairwise_ms / args.sample
+
+    print(f"{'vectors':>10} {'pairwise':>14} {'build':>12} {'query':>12} {'speed-up':>9}")
+    for size in args.sizes:
+        raw = rng.normal(size=(size, args.dimensions)).astype(np.float32)
+        refs = [("bench", i) for i in range(size)]
+        start = time.perf_counter()
+        matrix = EmbeddingMatrix.from_blocks([(raw, refs)])
+        build_ms = (time.perf_counter() - start) * 1000
+        del raw
+
+        query_ms = measure(lambda: matrix.search(query, args.limit), args.runs)
+        estimated = per_vector_ms * size
+        marker = "*" if size > args.sample else " "
+        print(f"{size:>10} {estimated:>11.0f} ms{marker} {build_ms:>9.0f} ms {query_ms:>9.1f} ms {estimated / query_ms:>8.0f}x")
+
+    print(f"* extrapolated from {args.sample} vectors")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""Circuit breaker for calls to a flaky local service."""
+
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+
+class CircuitBreaker:
+    """
+    Stops calling a service for a cool-down period after repeated failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    allow() returns False until `cooldown_seconds` have passed. The next call
+    is then let through as a trial: success closes the circuit, failure opens
+    it again for another cool-down.
+
+    With a state_path, the state is kept in a small JSON file so that
+    short-lived processes (every wrapped command in sync mode) share it.
+    """
+
+    def __init__(self, failure_threshold: int, cooldown_seconds: float, state_path: Optional[str] = None):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.state_path = state_path
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not self.state_path:
+            return
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as fh:
+                state = json.load(fh)
+            self.failures = int(state.get("failures", 0))
+            self.open_until = float(state.get("open_until", 0))
+        except (OSError, ValueError):
+            # Missing or unreadable state means a closed circuit
+            self.failures = 0
+            self.open_until = 0.0
+
+    def _save(self):
+        if not self.state_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_path), mode=0o700, exist_ok=True)
+            tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"failures": self.failures, "open_until": self.open_until}, fh)
+            os.replace(tmp_path, self.state_path)
+        except OSError:
+            pass
+
+    def allow(self) -> bool:
+        """Return True if a call may be made now."""
+        with self._lock:
+            self._load()
+            return time.time() >= self.open_until
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a trial call through (0 if closed)."""
+        with self._lock:
+            self._load()
+            return max(0.0, self.open_until - time.time())
+
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        with self._lock:
+            self._load()
+            if self.failures or self.open_until:
+                self.failures = 0
+                self.open_until = 0.0
+                self._save()
+
+    def record_failure(self):
+        """Count a failed call, opening the circuit once the threshold is reached."""
+        with self._lock:
+            self._load()
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.open_until = time.time() + self.cooldown_seconds
+            self._save()
@@ -0,0 +1,122 @@
+"""Cached, date-sorted catalog of the command history collections."""
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Set
+
+from pymongo.database import Database
+
+from config import get_float
+
+DEFAULT_CATALOG_TTL_SECONDS = get_float("CATALOG_TTL_SECONDS", 60)
+
+HISTORY_PREFIX = "command_history_"
+
+# Databases compare equal by client and name, so every handle on the same
+# database shares one catalog
+_catalogs: Dict[Database, "CollectionCatalog"] = {}
+_catalogs_lock = threading.Lock()
+
+
+def day_of(collection_name: str) -> str:
+    """Return the YYYY_MM_DD part of a day collection name."""
+    return collection_name[len(HISTORY_PREFIX):]
+
+
+class CollectionCatalog:
+    """
+    Collection names of one database, listed once and cached for a short TTL.
+
+    Day collections are kept sorted by date, so selecting a date range is a
+    bisect rather than a scan. Collections this process creates or drops are
+    applied to the cached copy directly instead of listing them again.
+    """
+
+    def __init__(self, db: Database, ttl_seconds: float = None):
+        self.db = db
+        self.ttl_seconds = DEFAULT_CATALOG_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._names: Set[str] = set()
+        self._days: List[str] = []
+
+    def _refresh(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return
+        names = set(self.db.list_collection_names())
+        self._names = names
+        self._days = sorted(day_of(name) for name in names if name.startswith(HISTORY_PREFIX))
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Forget the cached listing; the next lookup lists the collections again."""
+        with self._lock:
+            self._loaded_at = None
+
+    def names(self) -> Set[str]:
+        """Return the names of all collections in the database."""
+        with self._lock:
+            self._refresh()
+            return set(self._names)
+
+    def __contains__(self, collection_name: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return collection_name in self._names
+
+    def history_collections(self) -> List[str]:
+        """Return all day collections, oldest first."""
+        with self._lock:
+            self._refresh()
+            return [HISTORY_PREFIX + day for day in self._days]
+
+    def in_range(self, start_day: str, end_day: str = None) -> List[str]:
+        """
+        Return the day collections from start_day to end_day inclusive, newest first.
+
+        Args:
+            start_day: First day as YYYY_MM_DD
+            end_day: Last day as YYYY_MM_DD (default: no upper bound)
+        """
+        with self._lock:
+            self._refresh()
+            lo = bisect.bisect_left(self._days, start_day)
+            hi = len(self._days) if end_day is None else bisect.bisect_right(self._days, end_day)
+            return [HISTORY_PREFIX + day for day in reversed(self._days[lo:hi])]
+
+    def before(self, cutoff_day: str) -> List[str]:
+        """Return the day collections older than cutoff_day (YYYY_MM_DD), oldest first."""
+        with self._lock:
+            self._refresh()
+            return [HISTORY_PREFIX + day for day in self._days[:bisect.bisect_left(self._days, cutoff_day)]]
+
+    def add(self, collection_name: str):
+        """Record a collection created by this process."""
+        with self._lock:
+            if self._loaded_at is None or collection_name in self._names:
+                return
+            self._names.add(collection_name)
+            if collection_name.startswith(HISTORY_PREFIX):
+                bisect.insort(self._days, day_of(collection_name))
+
+    def discard(self, collection_name: str):
+        """Record a collection dropped by this process."""
+        with self._lock:
+            if collection_name not in self._names:
+                return
+            self._names.discard(collection_name)
+            if collection_name.startswith(HISTORY_PREFIX):
+                day = day_of(collection_name)
+                i = bisect.bisect_left(self._days, day)
+                if i < len(self._days) and self._days[i] == day:
+                    del self._days[i]
+
+
+def get_catalog(db: Database) -> CollectionCatalog:
+    """Return the shared catalog of a database."""
+    with _catalogs_lock:
+        catalog = _catalogs.get(db)
+        if catalog is None:
+            catalog = _catalogs[db] = CollectionCatalog(db)
+        return catalog
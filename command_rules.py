@@ -0,0 +1,175 @@
+"""Rule-based command classification ahead of the Ollama call."""
+
+import json
+import os
+import shlex
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from config import get_float, get_path
+
+DEFAULT_RULES_PATH = get_path("CLASSIFIER_RULES_PATH", "~/.terminal_logger/classifier_rules.json")
+DEFAULT_RULE_CONFIDENCE = get_float("CLASSIFIER_RULE_CONFIDENCE", 0.9)
+
+# Wrappers that run another command; their own options are skipped
+COMMAND_PREFIXES = {"sudo", "env", "time", "nice", "nohup", "exec", "command", "builtin", "doas", "xargs"}
+# Prefix options that take a value, e.g. `sudo -u root` or `nice -n 10`
+PREFIX_OPTIONS_WITH_VALUE = {"-u", "-g", "-n", "-C", "-D", "-h", "-p", "-r", "-t", "-U", "-I", "-L", "-P", "-S"}
+SEGMENT_SEPARATORS = {"|", "||", "&&", ";", "&", "|&"}
+
+# Default rules table. "filter" marks commands that usually post-process another
+# command's output in a pipeline; they only decide the category on their own.
+DEFAULT_RULES: List[Dict[str, Any]] = [
+    {"command": ["git", "hg", "svn"], "category": "version control"},
+    {"command": "git", "subcommand": "status", "category": "version control", "description": "Shows the state of the working tree and staging area."},
+    {"command": "git", "subcommand": "commit", "category": "version control", "description": "Records staged changes as a new commit."},
+    {"command": "git", "subcommand": ["push", "pull", "fetch"], "category": "version control", "description": "Synchronizes commits with a remote repository."},
+    {"command": "git", "subcommand": ["log", "show", "diff"], "category": "version control", "description": "Inspects commit history or changes."},
+    {"command": "git", "subcommand": ["checkout", "switch", "branch", "merge", "rebase"], "category": "version control", "description": "Works with branches in a Git repository."},
+    {"command": ["docker", "podman", "docker-compose"], "category": "containers"},
+    {"command": ["docker", "podman"], "subcommand": ["ps", "images"], "category": "containers", "description": "Lists containers or images."},
+    {"command": ["docker", "podman"], "subcommand": ["run", "exec"], "category": "containers", "description": "Runs a command in a container."},
+    {"command": ["docker", "podman"], "subcommand": "build", "category": "containers", "description": "Builds a container image."},
+    {"command": ["kubectl", "helm", "k9s", "minikube", "kind"], "category": "container orchestration"},
+    {"command": "kubectl", "subcommand": ["get", "describe"], "category": "container orchestration", "description": "Inspects Kubernetes resources."},
+    {"command": "kubectl", "subcommand": ["apply", "create", "delete", "edit", "patch"], "category": "container orchestration", "description": "Changes Kubernetes resources."},
+    {"command": "kubectl", "subcommand": "logs", "category": "container orchestration", "description": "Shows logs from a Kubernetes pod."},
+    {"command": ["rm", "rmdir"], "category": "file management", "description": "Removes files or directories."},
+    {"command": ["cp", "mv", "rsync"], "category": "file management", "description": "Copies or moves files."},
+    {"command": ["mkdir", "touch", "ln", "chmod", "chown", "ls", "find", "tree", "cd", "pwd", "stat", "file", "du"], "category": "file management"},
+    {"command": ["tar", "zip", "unzip", "gzip", "gunzip", "zstd", "xz"], "category": "file management", "description": "Creates or extracts archives."},
+    {"command": ["curl", "wget", "http"], "category": "network", "description": "Transfers data to or from a URL."},
+    {"command": ["ping", "dig", "nslookup", "host", "traceroute", "netstat", "ss", "nc", "ip", "ifconfig"], "category": "network"},
+    {"command": ["ssh", "scp", "sftp", "mosh"], "category": "network", "description": "Connects to or copies files from a remote host."},
+    {"command": ["ps", "top", "htop", "pgrep", "lsof"], "category": "process management", "description": "Inspects running processes."},
+    {"command": ["kill", "killall", "pkill"], "category": "process management", "description": "Sends a signal to running processes."},
+    {"command": ["systemctl", "service", "journalctl", "mount", "umount", "df", "free", "uptime", "shutdown", "reboot", "crontab"], "category": "system administration"},
+    {"command": ["apt", "apt-get", "dnf", "yum", "brew", "pacman", "pip", "pip3", "npm", "yarn", "pnpm", "cargo", "gem"], "category": "package management"},
+    {"command": ["grep", "rg", "sed", "awk", "sort", "uniq", "wc", "head", "tail", "cut", "tr", "jq", "tee", "less", "more", "cat"], "category": "data processing", "filter": True},
+]
+
+
+class Classification(NamedTuple):
+    """Result of a classifier stage."""
+    category: str
+    description: str
+    confidence: float
+    source: str
+
+
+def _as_list(value) -> List[str]:
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def split_segments(command: str) -> List[List[str]]:
+    """Split a command line into the token lists of its pipeline and list segments."""
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+
+    segments = [[]]
+    try:
+        for token in lexer:
+            if token in SEGMENT_SEPARATORS:
+                segments.append([])
+            else:
+                segments[-1].append(token)
+    except ValueError:
+        # Unbalanced quotes; fall back to whitespace splitting
+        segments = [command.split()]
+    return [segment for segment in segments if segment]
+
+
+def strip_prefixes(tokens: List[str]) -> List[str]:
+    """Drop `sudo`/`env`-style wrappers and VAR=value assignments in front of a command."""
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if "=" in token and not token.startswith("-") and token.split("=", 1)[0].replace("_", "").isalnum():
+            i += 1
+        elif os.path.basename(token) in COMMAND_PREFIXES:
+            i += 1
+            while i < len(tokens) and tokens[i].startswith("-"):
+                i += 2 if tokens[i] in PREFIX_OPTIONS_WITH_VALUE else 1
+        else:
+            break
+    return tokens[i:]
+
+
+def command_and_subcommand(tokens: List[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Return the binary name and its first non-option argument."""
+    tokens = strip_prefixes(tokens)
+    if not tokens:
+        return None, None
+    binary = os.path.basename(tokens[0])
+    subcommand = next((token for token in tokens[1:] if not token.startswith("-")), None)
+    return binary, subcommand
+
+
+class RuleClassifier:
+    """Classifies commands from a table of binary/subcommand rules."""
+
+    name = "rules"
+
+    def __init__(self, rules: List[Dict[str, Any]] = None, confidence: float = None):
+        self.confidence = DEFAULT_RULE_CONFIDENCE if confidence is None else confidence
+        self._binaries: Dict[str, Dict[str, Any]] = {}
+        self._subcommands: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self.add_rules(DEFAULT_RULES if rules is None else rules)
+
+    @classmethod
+    def from_config(cls, path: str = None) -> "RuleClassifier":
+        """Build a classifier from the default rules plus the user's rules file, if any."""
+        classifier = cls()
+        path = path or DEFAULT_RULES_PATH
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+            classifier.add_rules(data.get("rules", []) if isinstance(data, dict) else data)
+        return classifier
+
+    def add_rules(self, rules: List[Dict[str, Any]]):
+        """Add rules to the table; later rules override earlier ones."""
+        for rule in rules:
+            subcommands = _as_list(rule.get("subcommand"))
+            for binary in _as_list(rule["command"]):
+                if subcommands:
+                    for subcommand in subcommands:
+                        self._subcommands[(binary, subcommand)] = rule
+                else:
+                    self._binaries[binary] = rule
+
+    def match(self, tokens: List[str]) -> Optional[Tuple[Dict[str, Any], str, Optional[str]]]:
+        """Return the matching rule for one segment with its binary and subcommand."""
+        binary, subcommand = command_and_subcommand(tokens)
+        if binary is None:
+            return None
+        rule = self._subcommands.get((binary, subcommand)) or self._binaries.get(binary)
+        if rule is None:
+            return None
+        return rule, binary, subcommand
+
+    def __call__(self, command: str) -> Optional[Classification]:
+        """
+        Classify a command, or return None if no rule applies.
+
+        Every segment must match a rule: in `./deploy.sh | grep ERROR` the
+        unknown main command decides what the pipeline does, so it is left to
+        the LLM rather than categorized by its filter.
+        """
+        matches = [self.match(segment) for segment in split_segments(command)]
+        if not matches or not all(matches):
+            return None
+
+        # Pipelines are categorized by their main commands, not by output filters
+        main_matches = [m for m in matches if not m[0].get("filter")] or matches
+        rule, binary, _ = main_matches[0]
+
+        confidence = rule.get("confidence", self.confidence)
+        if len({m[0]["category"] for m in main_matches}) > 1:
+            confidence *= 0.5
+
+        description = rule.get("description") or f"Runs `{binary}` ({rule['category']})."
+
+        return Classification(rule["category"], description, confidence, self.name)
@@ -0,0 +1,44 @@
+"""Normalization of shell commands into reusable templates."""
+
+import re
+
+# Substitutions applied in order; earlier patterns win over later ones
+_SUBSTITUTIONS = [
+    # Quoted strings, honouring backslash escapes inside double quotes
+    (re.compile(r'"(?:[^"\\]|\\.)*"|\'[^\']*\''), "<str>"),
+    # URLs
+    (re.compile(r"\b[a-zA-Z][\w+.-]*://\S+"), "<url>"),
+    # Environment-style assignments keep their name but not their value
+    (re.compile(r"(?<![\w<])([A-Z_][A-Z0-9_]*)=\S+"), r"\1=<val>"),
+    # Paths: anything with a slash, or starting with ~ or a dot
+    (re.compile(r"(?<![\w<>=-])(?:~|\.{1,2})?[\w.@%+-]*/[\w./@%+:~-]*"), "<path>"),
+    (re.compile(r"(?<![\w<>-])~[\w.-]*"), "<path>"),
+    # File names with an extension, e.g. main.py or archive.tar.gz
+    (re.compile(r"(?<![\w<>./-])[\w-]+(?:\.[A-Za-z][\w]{0,7})+\b(?![(/])"), "<path>"),
+    # Hex hashes and IDs (git SHAs, container IDs, digests)
+    (re.compile(r"\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{7,64}\b"), "<hash>"),
+    # Numbers, including versions, sizes and ports
+    (re.compile(r"(?<![\w<-])\d+(?:[.:]\d+)*[kKmMgG]?\b"), "<num>"),
+]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_command(command: str) -> str:
+    """
+    Reduce a shell command to a template shared by similar invocations.
+
+    Quoted strings, URLs, paths, file names, hashes and numbers are replaced
+    with placeholders, so `ls -la /tmp/build` and `ls -la ~/src` both become
+    `ls -la <path>`. Flags and subcommands are kept as-is.
+
+    Args:
+        command: The shell command to normalize
+
+    Returns:
+        The command template
+    """
+    template = command.strip()
+    for pattern, replacement in _SUBSTITUTIONS:
+        template = pattern.sub(replacement, template)
+    return _WHITESPACE.sub(" ", template)
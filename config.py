@@ -0,0 +1,47 @@
+"""Shared configuration loading for terminal logger."""
+
+import os
+
+from dotenv import load_dotenv
+
+_loaded = False
+
+
+def load_config():
+    """Load environment variables from the .env file, once per process."""
+    global _loaded
+    if not _loaded:
+        load_dotenv()
+        _loaded = True
+
+
+def get_env(name: str, default: str = None) -> str:
+    """Return a configuration value as a string."""
+    load_config()
+    return os.environ.get(name, default)
+
+
+def get_int(name: str, default: int) -> int:
+    """Return a configuration value as an integer."""
+    return int(get_env(name, str(default)))
+
+
+def get_float(name: str, default: float) -> float:
+    """Return a configuration value as a float."""
+    return float(get_env(name, str(default)))
+
+
+def get_bool(name: str, default: bool) -> bool:
+    """Return a configuration value as a boolean (1/true/yes/on are true)."""
+    value = get_env(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_path(name: str, default: str) -> str:
+    """Return a configuration value as a path with ~ expanded."""
+    return os.path.expanduser(get_env(name, default))
+
+
+load_config()
@@ -1,29 +1,127 @@
 """Database connection and operations for terminal logger."""
 
+import atexit
+import base64
+import heapq
+import itertools
 import sys
+import threading
 import time
-from typing import Dict, Any, List
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple, Union
+from datetime import datetime, timedelta, timezone
 
-from pymongo import MongoClient
+import bson
+from bson import ObjectId
+from bson.errors import InvalidBSON
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
 from pymongo.database import Database
 from pymongo.collection import Collection
-import os
-from dotenv import load_dotenv
+from pymongo.errors import OperationFailure
 
-# Load environment variables from .env file
-load_dotenv()
+from ann_index import get_vector_index, vector_index_enabled
+from collection_catalog import day_of, get_catalog
+from config import get_env, get_int
+from embedding_snapshots import get_snapshot_store
+from embedding_storage import encode_embedding, get_subtype
+from index_manager import TEXT_INDEX, day_collection_name, index_key, index_options, provision_day_collections
+from output_storage import prepare_result_for_storage, remove_output_files, OUTPUT_BUCKET, OUTPUT_FIELDS, PREVIEW_LENGTH
 
 # Get MongoDB connection details from environment variables
-DEFAULT_MONGODB_HOST = os.environ.get("MONGODB_HOST", "localhost")
-DEFAULT_MONGODB_PORT = int(os.environ.get("MONGODB_PORT", "27017"))
-DEFAULT_MONGODB_DB = os.environ.get("MONGODB_DB", "terminal_logger")
-DEFAULT_MONGODB_USERNAME = os.environ.get("MONGODB_USERNAME", "admin")
-DEFAULT_MONGODB_PASSWORD = os.environ.get("MONGODB_PASSWORD", "admin")
+DEFAULT_MONGODB_HOST = get_env("MONGODB_HOST", "localhost")
+DEFAULT_MONGODB_PORT = get_int("MONGODB_PORT", 27017)
+DEFAULT_MONGODB_DB = get_env("MONGODB_DB", "terminal_logger")
+DEFAULT_MONGODB_USERNAME = get_env("MONGODB_USERNAME", "admin")
+DEFAULT_MONGODB_PASSWORD = get_env("MONGODB_PASSWORD", "admin")
+
+# Client settings shared by every connection
+MONGODB_MAX_POOL_SIZE = get_int("MONGODB_MAX_POOL_SIZE", 10)
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = get_int("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000)
+MONGODB_COMPRESSORS = get_env("MONGODB_COMPRESSORS", "")
+MONGODB_READ_PREFERENCE = get_env("MONGODB_READ_PREFERENCE", "primary")
+DEFAULT_RETENTION_DAYS = get_int("RETENTION_DAYS", 30)
+
+# "daily" stores each day in its own command_history_YYYY_MM_DD collection;
+# "single" stores everything in one command_history collection with a TTL index
+STORAGE_LAYOUT = get_env("STORAGE_LAYOUT", "daily").lower()
+HISTORY_COLLECTION = "command_history"
+
+# Indexes of the single history collection
+HISTORY_INDEXES = [
+    [("timestamp", DESCENDING)],
+    [("exit_code", ASCENDING), ("timestamp", DESCENDING)],
+    [("ai_category", ASCENDING), ("timestamp", DESCENDING)],
+    [("timestamp", DESCENDING), ("_id", DESCENDING)],
+    TEXT_INDEX,
+]
+
+# TTL index that expires documents after the retention period. `timestamp` is
+# naive local time, which BSON stores as if it were UTC, so expiry keys on
+# `created_at`, the UTC time the document was stored.
+HISTORY_TTL_INDEX = [("created_at", ASCENDING)]
+
+# How query_commands reads several day collections: "threads" queries them
+# concurrently in waves, "union" sends one $unionWith aggregation
+QUERY_FANOUT = get_env("QUERY_FANOUT", "threads").lower()
+QUERY_WORKERS = get_int("QUERY_WORKERS", 8)
+
+# Collections dropped or measured at the same time by maintenance
+MAINTENANCE_WORKERS = get_int("MAINTENANCE_WORKERS", 4)
+
+# How --search matches commands: "text" uses the text index and ranks by
+# relevance, "regex" is the unindexed case-insensitive substring match
+SEARCH_MODE = get_env("SEARCH_MODE", "text").lower()
+TEXT_SCORE = {"$meta": "textScore"}
+
+# Total order used for paging; the _id breaks ties between equal timestamps
+KEYSET_SORT = [("timestamp", DESCENDING), ("_id", DESCENDING)]
+
+# Fields the history listing shows; stdout/stderr are reduced to a preview
+LIST_FIELDS = ["command", "timestamp", "exit_code", "execution_time_seconds", "ai_category", "ai_description", "dir"]
+
+_clients: Dict[str, MongoClient] = {}
+_clients_lock = threading.Lock()
+_indexed_databases = set()
+_query_executor = None
+_query_executor_lock = threading.Lock()
+
+
+def get_mongodb_client(uri: str) -> MongoClient:
+    """
+    Return the process-wide client for a URI, creating it on first use.
+
+    Clients are created with connect=False, so server discovery happens on
+    the first operation instead of when the client is built.
+    """
+    with _clients_lock:
+        client = _clients.get(uri)
+        if client is None:
+            options = {
+                "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+                "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                "readPreference": MONGODB_READ_PREFERENCE,
+                "connect": False,
+            }
+            if MONGODB_COMPRESSORS:
+                options["compressors"] = MONGODB_COMPRESSORS
+            client = _clients[uri] = MongoClient(uri, **options)
+        return client
+
+
+def close_mongodb_clients():
+    """Close every client created by get_mongodb_client. Registered to run at exit."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+atexit.register(close_mongodb_clients)
 
 
 def connect_to_mongodb(host: str = None, port: int = None, db_name: str = None) -> Database:
-    """Connect to MongoDB and return the database instance."""
+    """Return the database instance, sharing one client per connection URI."""
     try:
         mongodb_host = host or DEFAULT_MONGODB_HOST
         mongodb_port = port or DEFAULT_MONGODB_PORT
@@ -34,27 +132,81 @@ def connect_to_mongodb(host: str = None, port: int = None, db_name: str = None)
         # Create connection with authentication if username is provided
         if mongodb_username:
             uri = f"mongodb://{mongodb_username}:{mongodb_password}@{mongodb_host}:{mongodb_port}/{mongodb_db}?authSource=admin"
-            client = MongoClient(uri)
         else:
             # Use simple connection without authentication
-            client = MongoClient(mongodb_host, mongodb_port)
+            uri = f"mongodb://{mongodb_host}:{mongodb_port}/"
             
-        return client[mongodb_db]
+        return get_mongodb_client(uri)[mongodb_db]
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
         sys.exit(1)
 
 
+def uses_single_collection() -> bool:
+    """Return True if history is stored in one collection instead of one per day."""
+    return STORAGE_LAYOUT == "single"
+
+
+def ensure_history_indexes(db: Database, retention_days: int = None) -> Collection:
+    """
+    Create the indexes of the single history collection and return it.
+
+    The TTL of the created_at index is updated in place if the retention
+    period has changed. When the TTL index is first created, documents
+    stored without created_at get it from their _id, and a TTL on timestamp
+    left by earlier versions is replaced by a plain index.
+    """
+    retention_days = retention_days or DEFAULT_RETENTION_DAYS
+    expire_after = retention_days * 86400
+    collection = db[HISTORY_COLLECTION]
+
+    existing = {tuple(tuple(key) for key in info["key"]): info for info in collection.index_information().values()}
+    ttl_index = existing.get(index_key(HISTORY_TTL_INDEX))
+    if ttl_index is None:
+        # ObjectIds carry their UTC creation time
+        collection.update_many({"created_at": {"$exists": False}}, [{"$set": {"created_at": {"$toDate": "$_id"}}}])
+        collection.create_index(HISTORY_TTL_INDEX, expireAfterSeconds=expire_after)
+    elif ttl_index.get("expireAfterSeconds") != expire_after:
+        db.command("collMod", HISTORY_COLLECTION, index={"keyPattern": dict(HISTORY_TTL_INDEX), "expireAfterSeconds": expire_after})
+
+    for keys in HISTORY_INDEXES:
+        if "expireAfterSeconds" in existing.get(index_key(keys), {}):
+            collection.drop_index(keys)
+            del existing[index_key(keys)]
+        if index_key(keys) not in existing:
+            collection.create_index(keys, **index_options(keys))
+    return collection
+
+
 def get_collection_for_today(db: Database) -> Collection:
     """Get or create the collection for today's date."""
+    if uses_single_collection():
+        # Indexes are checked once per database and process
+        if db.name not in _indexed_databases:
+            ensure_history_indexes(db)
+            _indexed_databases.add(db.name)
+        return db[HISTORY_COLLECTION]
+
     today = datetime.now().strftime("%Y_%m_%d")
     collection_name = f"command_history_{today}"
     return db[collection_name]
 
 
+def date_range_filter(start_date: datetime) -> Dict[str, Any]:
+    """
+    Return the filter that restricts a history collection to a date range.
+
+    Day collections are selected by name, so they need no filter; the single
+    collection is filtered on timestamp.
+    """
+    if uses_single_collection():
+        return {"timestamp": {"$gte": start_date}}
+    return {}
+
+
 def collection_exists(db: Database, collection_name: str) -> bool:
     """Check if a collection exists in the database."""
-    return collection_name in db.list_collection_names()
+    return collection_name in get_catalog(db)
 
 
 def clean_old_collections(db: Database, retention_days: int = 30) -> List[str]:
@@ -69,47 +221,189 @@ def clean_old_collections(db: Database, retention_days: int = 30) -> List[str]:
         List of removed collection names
     """
     removed_collections = []
-    
-    # Get all collections
-    all_collections = db.list_collection_names()
-    
-    # Filter command history collections
-    history_collections = [c for c in all_collections if c.startswith("command_history_")]
+    catalog = get_catalog(db)
     
     # Calculate the cutoff date
     cutoff_date = datetime.now() - timedelta(days=retention_days)
     cutoff_str = cutoff_date.strftime("%Y_%m_%d")
     
-    # Remove old collections
-    for collection_name in history_collections:
-        # Extract date from collection name
-        try:
-            # Format is command_history_YYYY_MM_DD
-            date_part = collection_name[16:]  # Extract YYYY_MM_DD part
-            
-            # Compare with cutoff date
-            if date_part < cutoff_str:
-                db.drop_collection(collection_name)
-                removed_collections.append(collection_name)
-        except Exception:
-            # Skip collections that don't match the expected format
-            continue
+    # Remove old collections; the catalog is sorted, so they are a prefix of it
+    expired = catalog.before(cutoff_str)
+    with ThreadPoolExecutor(max_workers=MAINTENANCE_WORKERS) as executor:
+        for collection_name, _ in zip(expired, executor.map(db.drop_collection, expired)):
+            catalog.discard(collection_name)
+            removed_collections.append(collection_name)
+    
+    # The single collection expires documents through its TTL index
+    if HISTORY_COLLECTION in catalog:
+        ensure_history_indexes(db, retention_days)
+
+    # Remove output spilled to GridFS for the dropped days
+    if f"{OUTPUT_BUCKET}.files" in catalog:
+        remove_output_files(db, cutoff_str)
+
+    # And the dropped days' part of the vector index and embedding snapshots
+    get_vector_index(db.name).prune(cutoff_str)
+    get_snapshot_store(db.name).prune(cutoff_str)
     
     return removed_collections
 
 
+def collection_stats(db: Database, collection_names: List[str]) -> Dict[str, Dict[str, int]]:
+    """
+    Return the document count and sizes of collections from their metadata.
+
+    Uses collStats, which reads the counts and sizes the storage engine keeps
+    rather than scanning documents, for up to MAINTENANCE_WORKERS collections
+    at a time.
+
+    Returns:
+        Dictionary mapping each collection name to its 'count', 'size' (bytes
+        of uncompressed documents), 'storage_size' and 'index_size' (bytes on disk)
+    """
+    def stats(collection_name: str) -> Dict[str, int]:
+        try:
+            result = db.command("collStats", collection_name)
+        except OperationFailure:
+            # Servers without collStats still keep the document count
+            return {"count": db[collection_name].estimated_document_count(), "size": 0, "storage_size": 0, "index_size": 0}
+        return {
+            "count": result.get("count", 0),
+            "size": result.get("size", 0),
+            "storage_size": result.get("storageSize", 0),
+            "index_size": result.get("totalIndexSize", 0),
+        }
+
+    with ThreadPoolExecutor(max_workers=MAINTENANCE_WORKERS) as executor:
+        return dict(zip(collection_names, executor.map(stats, collection_names)))
+
+
+def migrate_embeddings(db: Database, dtype: str = None, dry_run: bool = False, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Convert embeddings stored as lists of doubles to the binary format.
+
+    Collections are converted on up to MAINTENANCE_WORKERS threads, with one
+    unordered bulk write per batch_size documents.
+
+    Args:
+        db: MongoDB database instance
+        dtype: 'float32' or 'float16' (default: EMBEDDING_DTYPE)
+        dry_run: Only count the embeddings that would be converted
+
+    Returns:
+        Dictionary mapping each collection with legacy embeddings to how many
+        were (or would be) converted
+    """
+    get_subtype(dtype)  # Fail before touching any collection
+    legacy = {"vector_embedding": {"$type": "array"}}
+    collection_names = [HISTORY_COLLECTION] if uses_single_collection() else get_catalog(db).history_collections()
+
+    def migrate(collection_name: str) -> int:
+        collection = db[collection_name]
+        if dry_run:
+            return collection.count_documents(legacy)
+        converted = 0
+        cursor = collection.find(legacy, {"vector_embedding": 1}, batch_size=batch_size)
+        for batch in iter(lambda: list(itertools.islice(cursor, batch_size)), []):
+            collection.bulk_write([
+                UpdateOne({"_id": doc["_id"], **legacy}, {"$set": {"vector_embedding": encode_embedding(doc["vector_embedding"], dtype)}})
+                for doc in batch
+            ], ordered=False)
+            converted += len(batch)
+        return converted
+
+    with ThreadPoolExecutor(max_workers=MAINTENANCE_WORKERS) as executor:
+        counts = dict(zip(collection_names, executor.map(migrate, collection_names)))
+    return {name: count for name, count in counts.items() if count}
+
+
 def store_command_result(db: Database, result: Dict[str, Any]) -> str:
     """Store the command result in MongoDB and return the inserted ID."""
     collection = get_collection_for_today(db)
-    inserted = collection.insert_one(result)
+    catalog = get_catalog(db)
+    if not uses_single_collection() and collection.name not in catalog:
+        # Nobody provisioned today's collection ahead of time; index it before the first insert
+        provision_day_collections(db)
+    document = prepare_result_for_storage(db, result, collection.name)
+    if uses_single_collection():
+        document["created_at"] = datetime.now(timezone.utc)  # Keyed on by the TTL index
+    inserted = collection.insert_one(document)
+    catalog.add(collection.name)
+
+    if vector_index_enabled() and result.get("vector_embedding"):
+        day = datetime.now().strftime("%Y_%m_%d") if uses_single_collection() else day_of(collection.name)
+        try:
+            get_vector_index(db.name).add(day, inserted.inserted_id, result["vector_embedding"])
+        except OSError as e:
+            # The command is stored; `vector-index build` picks it up later
+            print(f"Error adding to vector index: {e}", file=sys.stderr)
     return str(inserted.inserted_id)
 
 
+def list_projection(preview_length: int = PREVIEW_LENGTH) -> Dict[str, Any]:
+    """
+    Return a projection with the listing fields and a preview of each output.
+
+    The preview is cut server-side with $substrCP from plain-text output, or
+    taken from the stored preview of encoded output, so neither the full
+    output nor the embedding leaves the server. `stdout_length` and
+    `stderr_length` hold the full length of each output.
+    """
+    projection: Dict[str, Any] = {field: 1 for field in LIST_FIELDS}
+    for field in OUTPUT_FIELDS:
+        is_text = {"$eq": [{"$type": f"${field}"}, "string"]}
+        projection[field] = {
+            "$substrCP": [{"$cond": [is_text, f"${field}", {"$ifNull": [f"${field}.preview", ""]}]}, 0, preview_length]
+        }
+        projection[f"{field}_length"] = {
+            "$cond": [is_text, {"$strLenCP": f"${field}"}, {"$ifNull": [f"${field}.length", 0]}]
+        }
+    return projection
+
+
+def list_commands(
+    db: Database,
+    filters: Dict[str, Any] = None,
+    limit: int = 10,
+    days_to_search: int = 30
+) -> List[Dict[str, Any]]:
+    """List command history with metadata and output previews only (see list_projection)."""
+    return query_commands(db, filters, limit, days_to_search, projection=list_projection())
+
+
+def get_command(db: Database, record_id: Union[str, ObjectId]) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the full record of one command by its _id.
+
+    ObjectIds carry their creation time, which names the day collection the
+    record was inserted into; the neighbouring days and then the remaining
+    collections are only tried if it is not there.
+
+    Raises:
+        bson.errors.InvalidId: If record_id is not a valid ObjectId
+    """
+    object_id = ObjectId(record_id)
+    if uses_single_collection():
+        return db[HISTORY_COLLECTION].find_one({"_id": object_id})
+
+    created = object_id.generation_time.astimezone().replace(tzinfo=None)
+    likely = [day_collection_name(created + timedelta(days=offset)) for offset in (0, -1, 1)]
+    catalog = get_catalog(db)
+    candidates = likely + [name for name in reversed(catalog.history_collections()) if name not in likely]
+    for collection_name in candidates:
+        if collection_name in catalog:
+            document = db[collection_name].find_one({"_id": object_id})
+            if document is not None:
+                return document
+    return None
+
+
 def query_commands(
     db: Database, 
     filters: Dict[str, Any] = None, 
     limit: int = 10, 
-    days_to_search: int = 30
+    days_to_search: int = 30,
+    projection: Dict[str, Any] = None
 ) -> List[Dict[str, Any]]:
     """
     Query command history based on filters.
@@ -119,9 +413,11 @@ def query_commands(
         filters: Query filters to apply
         limit: Maximum number of results to return
         days_to_search: Number of days to search back (default: 30)
+        projection: Fields to return (default: whole documents)
         
     Returns:
-        List of command history records
+        List of command history records, newest first, or by relevance
+        (in each record's 'score') for a $text search
     """
     if filters is None:
         filters = {}
@@ -129,52 +425,314 @@ def query_commands(
     # Calculate the start date for the search
     start_date = datetime.now() - timedelta(days=days_to_search)
     start_date_str = start_date.strftime("%Y_%m_%d")
+
+    if "$text" in filters:
+        return _query_ranked(db, get_collections_in_date_range(db, start_date), filters, limit, projection, start_date)
+
+    if uses_single_collection():
+        # One indexed cursor covers the whole date range
+        query = {**filters, **date_range_filter(start_date)}
+        return list(db[HISTORY_COLLECTION].find(query, projection).sort("timestamp", -1).limit(limit))
     
-    # Get all collections
-    all_collections = db.list_collection_names()
-    
-    # Filter command history collections within the date range
-    history_collections = [
-        c for c in all_collections 
-        if c.startswith("command_history_") and c[16:] >= start_date_str
-    ]
-    
-    # Sort collections by date (newest first)
-    history_collections.sort(reverse=True)
-    
-    results = []
-    remaining_limit = limit
-    
-    # Query each collection
-    for collection_name in history_collections:
-        if remaining_limit <= 0:
-            break
-            
-        collection = db[collection_name]
-        collection_results = list(collection.find(filters).sort("timestamp", -1).limit(remaining_limit))
-        
-        results.extend(collection_results)
-        remaining_limit = limit - len(results)
-    
-    # Sort results by timestamp (newest first)
-    results.sort(key=lambda x: x.get("timestamp", datetime.min), reverse=True)
+    # Day collections within the date range, newest first
+    history_collections = get_catalog(db).in_range(start_date_str)
     
-    # Limit to the requested number
+    if QUERY_FANOUT == "union":
+        return _query_union(db, history_collections, filters, limit, projection)
+    return _query_threaded(db, history_collections, filters, limit, projection)
+
+
+def _get_query_executor() -> ThreadPoolExecutor:
+    global _query_executor
+    with _query_executor_lock:
+        if _query_executor is None:
+            _query_executor = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="query")
+    return _query_executor
+
+
+def _timestamp_key(document: Dict[str, Any]) -> datetime:
+    return document.get("timestamp", datetime.min)
+
+
+def _query_threaded(
+    db: Database, collection_names: List[str], filters: Dict[str, Any], limit: int, projection: Dict[str, Any] = None
+) -> List[Dict[str, Any]]:
+    """
+    Query day collections concurrently, newest first, and concatenate them.
+
+    Every day is submitted to the shared executor, which runs QUERY_WORKERS
+    at a time, and the results are taken in day order. Once the newer days
+    hold enough matches, the days not started yet are cancelled or skipped.
+    Each day comes back sorted, so a k-way merge orders the few commands
+    that started before midnight and were stored in the next day.
+    """
+    days: List[List[Dict[str, Any]]] = []
+    found = 0
+    stop = threading.Event()
+
+    def fetch(collection_name: str) -> List[Dict[str, Any]]:
+        if stop.is_set():
+            return []
+        # Only newer days have been taken, so this is enough for this day
+        remaining = limit - found
+        # batch_size lets each query return in a single round trip
+        cursor = db[collection_name].find(filters, projection, batch_size=remaining)
+        return list(cursor.sort("timestamp", -1).limit(remaining))
+
+    executor = _get_query_executor()
+    futures = [executor.submit(fetch, collection_name) for collection_name in collection_names]
+    try:
+        for future in futures:
+            days.append(future.result())
+            found += len(days[-1])
+            if found >= limit:
+                break
+    finally:
+        stop.set()
+        for future in futures:
+            future.cancel()
+    return list(itertools.islice(heapq.merge(*days, key=_timestamp_key, reverse=True), limit))
+
+
+def _query_ranked(
+    db: Database,
+    collection_names: List[str],
+    filters: Dict[str, Any],
+    limit: int,
+    projection: Dict[str, Any] = None,
+    start_date: datetime = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run a $text search over the collections and merge them by relevance.
+
+    Relevance is not ordered by day, so every collection in range is queried
+    (concurrently), each returning at most its own top `limit` matches.
+    """
+    projection = {**(projection or {}), "score": TEXT_SCORE}
+    query = {**filters, **date_range_filter(start_date)} if start_date else filters
+
+    def fetch(collection_name: str) -> List[Dict[str, Any]]:
+        cursor = db[collection_name].find(query, projection, batch_size=limit)
+        return list(cursor.sort([("score", TEXT_SCORE), ("timestamp", DESCENDING)]).limit(limit))
+
+    results: List[Dict[str, Any]] = []
+    for matches in _get_query_executor().map(fetch, collection_names):
+        results.extend(matches)
+    results.sort(key=lambda result: (result.get("score", 0), _timestamp_key(result)), reverse=True)
     return results[:limit]
 
 
+def _query_union(
+    db: Database, collection_names: List[str], filters: Dict[str, Any], limit: int, projection: Dict[str, Any] = None
+) -> List[Dict[str, Any]]:
+    """Query all day collections with a single $unionWith aggregation (MongoDB 4.4+)."""
+    if not collection_names:
+        return []
+
+    per_collection = [{"$match": filters}, {"$sort": {"timestamp": -1}}, {"$limit": limit}]
+    if projection:
+        per_collection.append({"$project": projection})
+    pipeline = list(per_collection)
+    for collection_name in collection_names[1:]:
+        pipeline.append({"$unionWith": {"coll": collection_name, "pipeline": per_collection}})
+    pipeline += [{"$sort": {"timestamp": -1}}, {"$limit": limit}]
+
+    return list(db[collection_names[0]].aggregate(pipeline))
+
+
+def _keyset_key(document: Dict[str, Any]) -> Tuple[datetime, ObjectId]:
+    return document.get("timestamp", datetime.min), document["_id"]
+
+
+def _day_end(collection_name: str) -> datetime:
+    """Return the first moment after the day a day collection holds."""
+    return datetime.strptime(day_of(collection_name), "%Y_%m_%d") + timedelta(days=1)
+
+
+def _merge_day_cursors(
+    open_cursor: Callable[[str], Iterator[Dict[str, Any]]], collection_names: List[str]
+) -> Iterator[Dict[str, Any]]:
+    """
+    Merge the cursors of day collections (newest first) in keyset order.
+
+    A day collection holds the commands ingested on that day, so none of its
+    timestamps is later than the end of the day. A collection is only opened
+    once the merge reaches that bound, which keeps one or two cursors open
+    however many days are in range.
+    """
+    pending = list(reversed(collection_names))
+    heads: List[list] = []
+
+    def open_next():
+        cursor = open_cursor(pending.pop())
+        document = next(cursor, None)
+        if document is not None:
+            heads.append([document, cursor])
+
+    while heads or pending:
+        if not heads:
+            open_next()
+            continue
+        head = max(heads, key=lambda item: _keyset_key(item[0]))
+        # An older day can still hold commands as new as this one if they were ingested late
+        if pending and _day_end(pending[-1]) > head[0].get("timestamp", datetime.min):
+            open_next()
+            continue
+        yield head[0]
+        following = next(head[1], None)
+        if following is None:
+            heads.remove(head)
+        else:
+            head[0] = following
+
+
+def iter_commands(
+    db: Database,
+    filters: Dict[str, Any] = None,
+    days_to_search: int = 30,
+    projection: Dict[str, Any] = None,
+    after: Tuple[datetime, ObjectId] = None,
+    batch_size: int = 100
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream command history newest first, in (timestamp, _id) order.
+
+    Documents are read in batches from server-side cursors, so memory does
+    not grow with the number of results. A projection must keep timestamp.
+
+    Args:
+        db: MongoDB database instance
+        filters: Query filters to apply
+        days_to_search: Number of days to search back (default: 30)
+        projection: Fields to return (default: whole documents)
+        after: (timestamp, _id) of the last document already seen; streaming
+            continues with the next older one
+        batch_size: Documents fetched per round trip
+
+    Yields:
+        Command history records
+    """
+    start_date = datetime.now() - timedelta(days=days_to_search)
+    query = dict(filters or {})
+    if after is not None:
+        timestamp, record_id = after
+        keyset = {"$or": [{"timestamp": {"$lt": timestamp}}, {"timestamp": timestamp, "_id": {"$lt": record_id}}]}
+        query = {"$and": [query, keyset]} if query else keyset
+
+    def open_cursor(collection_name: str) -> Iterator[Dict[str, Any]]:
+        return iter(db[collection_name].find(query, projection, batch_size=batch_size).sort(KEYSET_SORT))
+
+    if uses_single_collection():
+        query = {**query, **date_range_filter(start_date)}
+        yield from open_cursor(HISTORY_COLLECTION)
+        return
+
+    # Commands ingested a day after they ran are the latest a day collection holds
+    end_day = (after[0] + timedelta(days=1)).strftime("%Y_%m_%d") if after is not None else None
+    collection_names = get_catalog(db).in_range(start_date.strftime("%Y_%m_%d"), end_day)
+    yield from _merge_day_cursors(open_cursor, collection_names)
+
+
+def encode_page_token(document: Dict[str, Any]) -> str:
+    """Return the opaque token that continues a listing after this document."""
+    token = bson.encode({"timestamp": document["timestamp"], "_id": document["_id"]})
+    return base64.urlsafe_b64encode(token).decode("ascii").rstrip("=")
+
+
+def decode_page_token(token: str) -> Tuple[datetime, ObjectId]:
+    """
+    Return the (timestamp, _id) a page token continues after.
+
+    Raises:
+        ValueError: If the token is not one returned by encode_page_token
+    """
+    try:
+        data = bson.decode(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return data["timestamp"], data["_id"]
+    except (ValueError, KeyError, InvalidBSON) as e:
+        raise ValueError(f"Invalid page token: {token}") from e
+
+
+def page_commands(
+    db: Database,
+    filters: Dict[str, Any] = None,
+    page_size: int = 10,
+    days_to_search: int = 30,
+    projection: Dict[str, Any] = None,
+    after: str = None,
+    page: int = 1
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Return one page of command history, newest first, and the next page's token.
+
+    Args:
+        db: MongoDB database instance
+        filters: Query filters to apply
+        page_size: Results per page
+        days_to_search: Number of days to search back (default: 30)
+        projection: Fields to return (default: whole documents)
+        after: Token from a previous page to continue from
+        page: Page to return, counted from `after` (or the newest command);
+            earlier pages are streamed past with only their keys fetched
+
+    Returns:
+        Tuple of the page's records and the token of the next page, which
+        is None on the last page
+
+    Raises:
+        ValueError: If `after` is not a valid page token
+    """
+    start = decode_page_token(after) if after else None
+
+    if page > 1:
+        skipped = None
+        keys = iter_commands(db, filters, days_to_search, {"timestamp": 1}, start, batch_size=1000)
+        for skipped in itertools.islice(keys, (page - 1) * page_size):
+            pass
+        if skipped is None:
+            return [], None
+        start = _keyset_key(skipped)
+
+    # One extra document tells whether there is a next page
+    documents = iter_commands(db, filters, days_to_search, projection, start, batch_size=page_size + 1)
+    results = list(itertools.islice(documents, page_size + 1))
+    next_token = encode_page_token(results[page_size - 1]) if len(results) > page_size else None
+    return results[:page_size], next_token
+
+
+def text_search_terms(search: str) -> str:
+    """
+    Turn user input into a $text search string that matches it literally.
+
+    $text reads a leading '-' as negation and double quotes as a required
+    phrase, so `rm -rf` would exclude documents containing "rf". Both are
+    removed; the text index drops them from the indexed words anyway.
+    """
+    return " ".join(term.lstrip("-") for term in search.replace('"', " ").split() if term.lstrip("-"))
+
+
 def build_query_filters(
     search: str = None, 
     days: int = None, 
     success: bool = False, 
     failed: bool = False,
-    category: str = None
+    category: str = None,
+    text_search: bool = False
 ) -> Dict[str, Any]:
-    """Build MongoDB query filters based on input parameters."""
+    """
+    Build MongoDB query filters based on input parameters.
+
+    With text_search the search terms go through the text index on command
+    and ai_description (query_commands then ranks by relevance); otherwise
+    they are an unindexed case-insensitive substring match on the command.
+    """
     filters = {}
     
     if search:
-        filters["command"] = {"$regex": search, "$options": "i"}
+        if text_search:
+            filters["$text"] = {"$search": text_search_terms(search)}
+        else:
+            filters["command"] = {"$regex": search, "$options": "i"}
     
     # Note: days filter is handled by query_commands function now
     
@@ -192,16 +750,14 @@ def build_query_filters(
 # Add this new function to your existing db.py
 
 def get_collections_in_date_range(db: Database, start_date: datetime) -> List[str]:
-    """Get command history collection names within a date range."""
-    all_collections = db.list_collection_names()
-    start_date_str = start_date.strftime("%Y_%m_%d")
-    
-    # Filter collections by date format
-    history_collections = [
-        c for c in all_collections 
-        if c.startswith("command_history_") and c[16:] >= start_date_str
-    ]
-    
-    # Sort collections by date (newest first)
-    history_collections.sort(reverse=True)
-    return history_collections
+    """
+    Get command history collection names within a date range.
+
+    With the single-collection layout this is just that collection; combine
+    queries on it with date_range_filter(start_date).
+    """
+    if uses_single_collection():
+        return [HISTORY_COLLECTION]
+
+    # Day collections within the date range, newest first
+    return get_catalog(db).in_range(start_date.strftime("%Y_%m_%d"))
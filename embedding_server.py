@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Persistent embedding server for terminal-logger.
+
+Keeps the sentence-transformers model loaded in one long-lived process and
+serves embeddings over a Unix socket, so wrapper processes do not each load
+the model just to embed a single string. Requests that arrive together are
+batched into a single model.encode call.
+"""
+
+import argparse
+import json
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from typing import List, Optional
+
+from config import get_float, get_int, get_path
+from local_socket import bind_unix_server, close_unix_server, send_request
+
+DEFAULT_EMBEDDING_SOCKET = get_path("EMBEDDING_SOCKET", "~/.terminal_logger/embedding.sock")
+DEFAULT_EMBEDDING_TIMEOUT = get_float("EMBEDDING_TIMEOUT", 5.0)
+DEFAULT_BATCH_SIZE = get_int("EMBEDDING_BATCH_SIZE", 64)
+DEFAULT_BATCH_WAIT_MS = get_float("EMBEDDING_BATCH_WAIT_MS", 5.0)
+
+
+def fetch_embeddings(texts: List[str], socket_path: str = None, timeout: float = None) -> Optional[List[List[float]]]:
+    """
+    Ask the embedding server to embed the given texts.
+
+    Returns:
+        One embedding per text, or None if the server is not available
+    """
+    socket_path = socket_path or DEFAULT_EMBEDDING_SOCKET
+    timeout = DEFAULT_EMBEDDING_TIMEOUT if timeout is None else timeout
+
+    if not os.path.exists(socket_path):
+        return None
+
+    try:
+        reply = send_request(socket_path, json.dumps({"texts": texts}).encode("utf-8"), timeout)
+        embeddings = json.loads(reply.decode("utf-8"))["embeddings"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if len(embeddings) != len(texts):
+        return None
+    return embeddings
+
+
+class _PendingRequest:
+    """Texts from one client waiting to be encoded."""
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.embeddings = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EmbeddingServer:
+    """Serves embeddings from a warm model, batching concurrent requests."""
+
+    def __init__(
+        self,
+        model=None,
+        socket_path: str = None,
+        batch_size: int = None,
+        batch_wait_ms: float = None,
+        request_timeout: float = None,
+    ):
+        if model is None:
+            from vector_search import get_model
+            model = get_model()
+        self.model = model
+        self.socket_path = socket_path or DEFAULT_EMBEDDING_SOCKET
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.batch_wait = (DEFAULT_BATCH_WAIT_MS if batch_wait_ms is None else batch_wait_ms) / 1000.0
+        # Clients give up after EMBEDDING_TIMEOUT, so waiting longer for a batch helps nobody
+        self.request_timeout = DEFAULT_EMBEDDING_TIMEOUT if request_timeout is None else request_timeout
+        self.batches_encoded = 0
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._server = None
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Queue texts for the next batch and wait for their embeddings.
+
+        Raises:
+            TimeoutError: If the batch is not encoded within request_timeout
+                seconds, for example because the model hangs
+        """
+        request = _PendingRequest(texts)
+        self._queue.put(request)
+        if not request.done.wait(self.request_timeout):
+            raise TimeoutError(f"no embeddings after {self.request_timeout:g}s")
+        if request.error is not None:
+            raise request.error
+        return request.embeddings
+
+    def _collect_batch(self) -> List[_PendingRequest]:
+        """Wait for one request, then gather more until the batch is full or the wait expires."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.batch_wait
+        while size < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _encode_batch(self, batch: List[_PendingRequest]):
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = self.model.encode(texts).tolist()
+            self.batches_encoded += 1
+        except Exception as e:
+            for request in batch:
+                request.error = e
+                request.done.set()
+            return
+
+        offset = 0
+        for request in batch:
+            request.embeddings = vectors[offset:offset + len(request.texts)]
+            offset += len(request.texts)
+            request.done.set()
+
+    def _batcher(self):
+        while not self._stop.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._encode_batch(batch)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    request = json.loads(self.rfile.readline().decode("utf-8"))
+                    response = {"embeddings": server.embed(list(request["texts"]))}
+                except Exception as e:
+                    response = {"error": str(e)}
+                self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+        return Handler
+
+    def start(self):
+        """Bind the socket and start the batching thread."""
+        self._server = bind_unix_server(self.socket_path, self._handler_class())
+        for target in (self._batcher, self._server.serve_forever):
+            threading.Thread(target=target, daemon=True).start()
+
+    def stop(self):
+        """Stop serving and remove the socket."""
+        self._stop.set()
+        if self._server is not None:
+            close_unix_server(self._server, self.socket_path)
+            self._server = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings for terminal-logger from a warm model")
+    parser.add_argument("--socket", default=DEFAULT_EMBEDDING_SOCKET, help=f"Unix socket to listen on (default: {DEFAULT_EMBEDDING_SOCKET} or $EMBEDDING_SOCKET)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Maximum texts per model.encode call (default: {DEFAULT_BATCH_SIZE} or $EMBEDDING_BATCH_SIZE)")
+    parser.add_argument("--batch-wait-ms", type=float, default=DEFAULT_BATCH_WAIT_MS, help=f"How long to wait for more requests before encoding a batch (default: {DEFAULT_BATCH_WAIT_MS} or $EMBEDDING_BATCH_WAIT_MS)")
+
+    args = parser.parse_args()
+
+    print("Loading embedding model...", file=sys.stderr)
+    server = EmbeddingServer(socket_path=args.socket, batch_size=args.batch_size, batch_wait_ms=args.batch_wait_ms)
+
+    try:
+        server.start()
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    print(f"Embedding server listening on {args.socket}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""
+Memory-mapped embedding snapshots of closed days.
+
+A day's commands do not change once the day is over, so `maintain_db.py`
+exports the embeddings of each closed day to two .npy files: the normalized
+float32 matrix (YYYY_MM_DD.npy) and the 12-byte _id of each row
+(YYYY_MM_DD.ids.npy). vector_search memory-maps these instead of downloading
+the same embeddings from MongoDB on every query, so past days are served from
+the page cache and only days without a snapshot (normally just today) are
+read from the database.
+
+With VECTOR_QUANTIZATION=sq8 or pq, each snapshot also gets a file of
+compressed codes (YYYY_MM_DD.sq8.npy or .pq.npy, see quantization) from a
+quantizer trained per database, and searches score those instead. The
+quantizer is retrained when the snapshots have grown QUANTIZER_RETRAIN_GROWTH
+times past the rows it was trained from, or on `maintain_db.py --retrain-quantizer`.
+
+With STORAGE_LAYOUT=single a day is the range of _ids created on it.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.database import Database
+
+from config import get_bool, get_path
+from quantization import (
+    DEFAULT_VECTOR_QUANTIZATION, QUANTIZERS, QuantizedMatrix, load_quantizer, save_quantizer, train_quantizer,
+)
+from vector_engine import EmbeddingMatrix, load_embeddings
+
+DEFAULT_EMBEDDING_SNAPSHOTS = get_bool("EMBEDDING_SNAPSHOTS", True)
+DEFAULT_SNAPSHOT_PATH = get_path("EMBEDDING_SNAPSHOT_PATH", "~/.terminal_logger/embedding_snapshots")
+
+DAY_FORMAT = "%Y_%m_%d"
+
+# Rows a quantizer is trained on, sampled across the snapshots
+QUANTIZER_SAMPLE_SIZE = 100_000
+
+# Growth of the snapshot rows since training that triggers retraining
+QUANTIZER_RETRAIN_GROWTH = 4
+
+_stores: Dict[str, "SnapshotStore"] = {}
+_stores_lock = threading.Lock()
+
+
+class SnapshotRefs:
+    """Row references of a snapshot; ObjectIds are only built for the rows returned."""
+
+    def __init__(self, collection_name: str, ids):
+        self.collection_name = collection_name
+        self.ids = ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, i) -> Tuple[str, ObjectId]:
+        return self.collection_name, ObjectId(self.ids[i].tobytes())
+
+
+class SnapshotStore:
+    """Embedding snapshots of one database, one pair of .npy files per day."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._quantizers: Dict[str, Tuple[int, Any]] = {}
+
+    def _file(self, day: str, suffix: str) -> str:
+        return os.path.join(self.path, f"{day}{suffix}")
+
+    def days(self) -> List[str]:
+        """Return the days with a complete snapshot, oldest first."""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name[:-len(".ids.npy")] for name in os.listdir(self.path) if name.endswith(".ids.npy"))
+
+    def save(self, day: str, matrix: EmbeddingMatrix):
+        """Write a day's normalized embeddings and their _ids."""
+        import numpy as np
+
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        ids = np.frombuffer(b"".join(record_id.binary for _, record_id in matrix.refs), dtype=np.uint8).reshape(len(matrix), 12)
+        # The _id file is written last, so its presence marks a complete snapshot
+        for suffix, array in ((".npy", matrix.matrix), (".ids.npy", ids)):
+            tmp_path = self._file(day, suffix + ".tmp")
+            with open(tmp_path, "wb") as fh:
+                np.save(fh, array)
+            os.replace(tmp_path, self._file(day, suffix))
+
+    def load(
+        self, day: str, collection_name: str, since: datetime = None, quantization: str = None, rerank: int = None
+    ):
+        """
+        Memory-map a day's snapshot.
+
+        Args:
+            day: Day as YYYY_MM_DD
+            collection_name: Collection the rows are returned as coming from
+            since: Only keep rows whose _id was created at or after this time
+            quantization: 'sq8' or 'pq' to search the day's codes when it has
+                them, re-ranked from the float rows as described by `rerank`
+            rerank: Candidates re-scored exactly per result; 0 or 1 to keep
+                the approximate scores (default: VECTOR_RERANK_FACTOR)
+
+        Returns:
+            An EmbeddingMatrix, a QuantizedMatrix, or None if the snapshot is
+            missing or damaged
+        """
+        import numpy as np
+
+        try:
+            ids = np.load(self._file(day, ".ids.npy"), mmap_mode="r")
+            matrix = np.load(self._file(day, ".npy"), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if len(ids) != len(matrix):
+            return None
+
+        codes = quantizer = None
+        if quantization in QUANTIZERS:
+            quantizer = self.quantizer(quantization)
+            try:
+                codes = np.load(self._file(day, f".{quantization}.npy"), mmap_mode="r") if quantizer else None
+            except (OSError, ValueError):
+                codes = None
+            # Codes left from a quantizer of another embedding model are searched as floats
+            if codes is not None and (
+                len(codes) != len(ids) or codes.shape[1:] != (quantizer.code_width,) or matrix.shape[1] != quantizer.dimensions
+            ):
+                codes = None
+
+        if since is not None and len(ids):
+            # The first four bytes of an ObjectId are its creation time in big-endian seconds
+            created = np.ascontiguousarray(ids[:, :4]).view(">u4").ravel()
+            keep = created >= int(since.timestamp())
+            ids, matrix = ids[keep], matrix[keep]
+            codes = codes[keep] if codes is not None else None
+
+        refs = SnapshotRefs(collection_name, ids)
+        if codes is not None:
+            return QuantizedMatrix(codes, quantizer, refs, exact=matrix, rerank=rerank)
+        return EmbeddingMatrix(matrix, refs)
+
+    def quantizer(self, kind: str):
+        """Return the trained quantizer of a kind, or None."""
+        path = os.path.join(self.path, f"{kind}.npz")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._quantizers.get(kind)
+        if cached is None or cached[0] != mtime:
+            cached = self._quantizers[kind] = (mtime, load_quantizer(kind, path))
+        return cached[1]
+
+    def quantize(self, kind: str, retrain: bool = False) -> List[str]:
+        """
+        Write the codes of every snapshot that has none.
+
+        The quantizer is trained first if there is none, if `retrain`, if the
+        embedding size has changed or if the snapshots now hold
+        QUANTIZER_RETRAIN_GROWTH times the rows it was trained from. It is
+        trained on up to QUANTIZER_SAMPLE_SIZE rows sampled across the
+        snapshots of the most recent embedding size; all snapshots are then
+        re-encoded.
+
+        Returns:
+            The days encoded
+        """
+        import numpy as np
+
+        days = self.days()
+        matrices = {day: np.load(self._file(day, ".npy"), mmap_mode="r") for day in days}
+        matrices = {day: matrix for day, matrix in matrices.items() if len(matrix)}
+        if not matrices:
+            return []
+
+        dimensions = matrices[max(matrices)].shape[1]
+        sources = [matrix for matrix in matrices.values() if matrix.shape[1] == dimensions]
+        total = sum(len(matrix) for matrix in sources)
+
+        quantizer = None if retrain else self.quantizer(kind)
+        if quantizer is not None and (
+            quantizer.dimensions != dimensions or total >= QUANTIZER_RETRAIN_GROWTH * quantizer.trained_rows
+        ):
+            quantizer = None
+        if quantizer is None:
+            rng = np.random.default_rng(0)
+            sample = np.concatenate([
+                matrix[np.sort(rng.choice(len(matrix), size=max(1, len(matrix) * QUANTIZER_SAMPLE_SIZE // total), replace=False))]
+                if total > QUANTIZER_SAMPLE_SIZE else matrix
+                for matrix in sources
+            ])
+            quantizer = train_quantizer(kind, np.asarray(sample, dtype=np.float32))
+            quantizer.trained_rows = total
+            save_quantizer(quantizer, os.path.join(self.path, f"{kind}.npz"))
+            pending = list(matrices)
+        else:
+            pending = [day for day in matrices if not os.path.exists(self._file(day, f".{kind}.npy"))]
+
+        encoded = []
+        for day in pending:
+            if matrices[day].shape[1] != quantizer.dimensions:
+                # From another embedding model; searched as floats, so codes of an older quantizer must go
+                try:
+                    os.remove(self._file(day, f".{kind}.npy"))
+                except FileNotFoundError:
+                    pass
+                continue
+            tmp_path = self._file(day, f".{kind}.npy.tmp")
+            with open(tmp_path, "wb") as fh:
+                np.save(fh, quantizer.encode(matrices[day]))
+            os.replace(tmp_path, self._file(day, f".{kind}.npy"))
+            encoded.append(day)
+        return encoded
+
+    def prune(self, cutoff_day: str) -> List[str]:
+        """Delete the snapshots of days before cutoff_day. Returns the removed days."""
+        removed = [day for day in self.days() if day < cutoff_day]
+        for day in removed:
+            for suffix in (".ids.npy", ".npy") + tuple(f".{kind}.npy" for kind in QUANTIZERS):
+                try:
+                    os.remove(self._file(day, suffix))
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+def get_snapshot_store(db_name: str) -> SnapshotStore:
+    """Return the shared snapshot store of a database."""
+    with _stores_lock:
+        store = _stores.get(db_name)
+        if store is None:
+            store = _stores[db_name] = SnapshotStore(os.path.join(DEFAULT_SNAPSHOT_PATH, db_name))
+        return store
+
+
+def id_range(first_day: str, end_day: str = None) -> Dict[str, Any]:
+    """Return the filter on _ids created from the start of first_day up to the start of end_day."""
+    start = datetime.strptime(first_day, DAY_FORMAT).astimezone()
+    bounds = {"$gte": ObjectId.from_datetime(start)}
+    if end_day is not None:
+        bounds["$lt"] = ObjectId.from_datetime(datetime.strptime(end_day, DAY_FORMAT).astimezone())
+    return {"_id": bounds}
+
+
+def day_source(day: str) -> Tuple[str, Dict[str, Any]]:
+    """Return the collection and filter holding a day's commands."""
+    from db import HISTORY_COLLECTION, uses_single_collection
+    from index_manager import day_collection_name
+
+    if uses_single_collection():
+        next_day = (datetime.strptime(day, DAY_FORMAT) + timedelta(days=1)).strftime(DAY_FORMAT)
+        return HISTORY_COLLECTION, id_range(day, next_day)
+    return day_collection_name(datetime.strptime(day, DAY_FORMAT)), {}
+
+
+def export_closed_days(db: Database, retention_days: int, dry_run: bool = False) -> List[str]:
+    """
+    Snapshot every closed day within the retention period that has no snapshot yet.
+
+    Days without embeddings get an empty snapshot, so they are not read again.
+
+    Returns:
+        The days exported (or that would be exported)
+    """
+    from collection_catalog import day_of, get_catalog
+    from db import uses_single_collection
+
+    now = datetime.now()
+    today = now.strftime(DAY_FORMAT)
+    cutoff = (now - timedelta(days=retention_days)).strftime(DAY_FORMAT)
+    if uses_single_collection():
+        days = [(now - timedelta(days=n)).strftime(DAY_FORMAT) for n in range(retention_days, 0, -1)]
+    else:
+        days = [day_of(name) for name in get_catalog(db).history_collections()]
+
+    store = get_snapshot_store(db.name)
+    existing = set(store.days())
+    pending = [day for day in days if cutoff <= day < today and day not in existing]
+    if not dry_run:
+        for day in pending:
+            collection_name, query = day_source(day)
+            store.save(day, load_embeddings(db, [collection_name], query))
+    return pending
+
+
+def quantize_snapshots(db: Database, kind: str = None, retrain: bool = False) -> List[str]:
+    """Encode the snapshots of a database with VECTOR_QUANTIZATION. Returns the days encoded."""
+    kind = kind or DEFAULT_VECTOR_QUANTIZATION
+    if kind not in QUANTIZERS:
+        raise ValueError(f"Unsupported vector quantization: {kind}")
+    return get_snapshot_store(db.name).quantize(kind, retrain=retrain)
+
+
+def load_recent_embeddings(
+    db: Database, start_date: datetime, dimensions: int = None, quantization: str = None, rerank: int = None
+) -> List[EmbeddingMatrix]:
+    """
+    Return the embeddings of commands since start_date, as one matrix per source.
+
+    Days with a snapshot are memory-mapped, and searched through their codes
+    with `quantization` (see SnapshotStore.load); the rest are read from MongoDB.
+    With the single collection, snapshots are only used for the unbroken run
+    of days from start_date, so the remaining query is one _id range.
+    """
+    from collection_catalog import day_of
+    from db import HISTORY_COLLECTION, date_range_filter, get_collections_in_date_range, uses_single_collection
+
+    start_day = start_date.strftime(DAY_FORMAT)
+    store = get_snapshot_store(db.name)
+    snapshot_days = [day for day in store.days() if day >= start_day] if DEFAULT_EMBEDDING_SNAPSHOTS else []
+
+    if uses_single_collection():
+        covered, day = [], start_day
+        while day in snapshot_days:
+            covered.append(day)
+            day = (datetime.strptime(day, DAY_FORMAT) + timedelta(days=1)).strftime(DAY_FORMAT)
+        snapshot_days = covered
+
+    matrices, loaded = [], set()
+    for day in snapshot_days:
+        collection_name, _ = day_source(day)
+        # Day collections are read whole; the single collection from start_date
+        since = start_date if uses_single_collection() and day == start_day else None
+        matrix = store.load(day, collection_name, since=since, quantization=quantization, rerank=rerank)
+        if matrix is None:
+            if uses_single_collection():
+                break
+            continue
+        matrices.append(matrix)
+        loaded.add(day)
+
+    if uses_single_collection():
+        collections = [HISTORY_COLLECTION]
+        if loaded:
+            end_day = (datetime.strptime(max(loaded), DAY_FORMAT) + timedelta(days=1)).strftime(DAY_FORMAT)
+            query = id_range(end_day)
+        else:
+            query = date_range_filter(start_date)
+    else:
+        collections = [name for name in get_collections_in_date_range(db, start_date) if day_of(name) not in loaded]
+        query = {}
+    matrices.append(load_embeddings(db, collections, query, dimensions))
+    return matrices
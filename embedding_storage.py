@@ -0,0 +1,101 @@
+"""
+Compact binary storage of command embeddings.
+
+Embeddings used to be stored as lists of BSON doubles, which costs a type tag
+and an index key per element. They are now stored as one BSON binary of
+little-endian float32, or float16 with EMBEDDING_DTYPE=float16, which numpy
+reads without copying. Readers accept both formats, so days stored before the
+change keep working until `maintain_db.py --migrate-embeddings` converts them.
+"""
+
+import struct
+from typing import Any, List, Sequence, Union
+
+from bson.binary import Binary
+
+from config import get_env
+
+DEFAULT_EMBEDDING_DTYPE = get_env("EMBEDDING_DTYPE", "float32").lower()
+
+# User-defined BSON binary subtypes, one per element type
+FLOAT32_SUBTYPE = 0x80
+FLOAT16_SUBTYPE = 0x81
+
+# subtype -> (struct format character, numpy dtype)
+_FORMATS = {FLOAT32_SUBTYPE: ("f", "<f4"), FLOAT16_SUBTYPE: ("e", "<f2")}
+_SUBTYPES = {"float32": FLOAT32_SUBTYPE, "float16": FLOAT16_SUBTYPE}
+
+# A stored embedding: legacy list of floats or a binary of one of the subtypes above
+StoredEmbedding = Union[List[float], Binary]
+
+
+def get_subtype(dtype: str = None) -> int:
+    """Resolve the configured element type to its binary subtype."""
+    dtype = (dtype or DEFAULT_EMBEDDING_DTYPE).lower()
+    if dtype not in _SUBTYPES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    return _SUBTYPES[dtype]
+
+
+def is_binary_embedding(value: Any) -> bool:
+    """Return True if the value is an embedding in the binary format."""
+    return isinstance(value, Binary) and value.subtype in _FORMATS
+
+
+def encode_embedding(vector: Sequence[float], dtype: str = None) -> Binary:
+    """
+    Pack an embedding into a binary for storage.
+
+    Accepts lists and numpy arrays without importing numpy, so embedding a
+    command does not slow down the CLI.
+    """
+    subtype = get_subtype(dtype)
+    if is_binary_embedding(vector) and vector.subtype == subtype:
+        return vector
+    values = embedding_to_list(vector)
+    return Binary(struct.pack(f"<{len(values)}{_FORMATS[subtype][0]}", *values), subtype)
+
+
+def embedding_length(value: StoredEmbedding) -> int:
+    """Return the number of dimensions of a stored embedding without decoding it."""
+    if is_binary_embedding(value):
+        return len(value) // struct.calcsize(_FORMATS[value.subtype][0])
+    return len(value) if value else 0
+
+
+def embedding_to_list(value: StoredEmbedding) -> List[float]:
+    """Decode a stored embedding into a list of floats."""
+    if is_binary_embedding(value):
+        fmt = _FORMATS[value.subtype][0]
+        return list(struct.unpack(f"<{embedding_length(value)}{fmt}", value))
+    return [float(x) for x in value] if value is not None else []
+
+
+def decode_embedding(value: StoredEmbedding):
+    """
+    Decode a stored embedding into a float32 numpy array.
+
+    float32 binaries are returned as a read-only view of the stored bytes.
+    """
+    import numpy as np
+
+    if is_binary_embedding(value):
+        vector = np.frombuffer(value, dtype=_FORMATS[value.subtype][1])
+        return vector if value.subtype == FLOAT32_SUBTYPE else vector.astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def stack_embeddings(values: List[StoredEmbedding], dimensions: int):
+    """
+    Decode stored embeddings of the same size into one writable float32 matrix.
+
+    When every embedding is a float32 binary, the bytes are joined and read
+    as the matrix in one step instead of being decoded one by one.
+    """
+    import numpy as np
+
+    if not values:
+        return np.empty((0, dimensions), dtype=np.float32)
+    if all(is_binary_embedding(value) and value.subtype == FLOAT32_SUBTYPE for value in values):
+        return np.frombuffer(bytearray().join(values), dtype="<f4").reshape(len(values), dimensions)
+    return np.stack([decode_embedding(value) for value in values])
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Command history analytics computed with MongoDB aggregation pipelines.
+
+Every day is summarized by two $group pipelines into command counts,
+failures, commands per hour and a latency histogram per command template and
+category. maintain-db stores the summary of each closed day in the
+command_rollups collection, so reports over months read one small document per
+day; only today and days without a rollup are aggregated from raw history. A
+closed day that has gained commands since it was rolled up (late ingestion,
+imports) is rolled up again on the next run.
+"""
+
+import argparse
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Tuple
+
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from collection_catalog import get_catalog
+from command_templates import normalize_command
+from config import get_env, get_int
+from db import connect_to_mongodb, uses_single_collection, HISTORY_COLLECTION
+from index_manager import day_collection_name
+
+DEFAULT_ROLLUP_RETENTION_DAYS = get_int("ROLLUP_RETENTION_DAYS", 365)
+
+ROLLUP_COLLECTION = "command_rollups"
+
+# Upper bounds in seconds of the latency histogram buckets; a last bucket
+# holds everything slower
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900]
+
+Summary = Dict[str, Any]
+
+
+def _day_start(day: datetime) -> datetime:
+    return day.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def day_summary_pipeline(match: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """
+    Return the pipeline that groups the matching commands.
+
+    Commands are grouped by exact command line, category and latency bucket,
+    which the server can do; folding command lines into templates happens
+    afterwards in summarize(). The groups come back through a cursor, so a
+    day with many distinct command lines is not bound by the 16 MB limit of
+    a single result document.
+    """
+    seconds = {"$ifNull": ["$execution_time_seconds", 0]}
+    bucket = {
+        "$switch": {
+            "branches": [{"case": {"$lt": [seconds, bound]}, "then": i} for i, bound in enumerate(LATENCY_BUCKETS)],
+            "default": len(LATENCY_BUCKETS),
+        }
+    }
+    return [
+        {"$match": match or {}},
+        {"$group": {
+            "_id": {"command": "$command", "category": {"$ifNull": ["$ai_category", "uncategorized"]}, "bucket": bucket},
+            "count": {"$sum": 1},
+            "failures": {"$sum": {"$cond": [{"$ne": ["$exit_code", 0]}, 1, 0]}},
+            "seconds": {"$sum": seconds},
+        }},
+    ]
+
+
+def day_hours_pipeline(match: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """Return the pipeline that counts the matching commands per hour of day."""
+    return [
+        {"$match": match or {}},
+        {"$group": {"_id": {"$hour": "$timestamp"}, "count": {"$sum": 1}}},
+    ]
+
+
+def summarize(rows: Dict[str, Iterable[Dict[str, Any]]]) -> Summary:
+    """
+    Fold the output of the day pipelines into a summary keyed by command template.
+
+    Args:
+        rows: The rows of day_summary_pipeline under 'groups' and of
+            day_hours_pipeline under 'hours'; cursors are read once
+    """
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    for row in rows.get("groups", []):
+        key = (normalize_command(row["_id"].get("command") or ""), row["_id"]["category"])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "template": key[0], "category": key[1], "count": 0, "failures": 0, "seconds": 0.0,
+                "histogram": [0] * (len(LATENCY_BUCKETS) + 1),
+            }
+        group["count"] += row["count"]
+        group["failures"] += row["failures"]
+        group["seconds"] += row["seconds"]
+        group["histogram"][row["_id"]["bucket"]] += row["count"]
+
+    hours = [0] * 24
+    for row in rows.get("hours", []):
+        if row["_id"] is not None:
+            hours[row["_id"]] += row["count"]
+
+    summary_groups = list(groups.values())
+    return {
+        "total": sum(group["count"] for group in summary_groups),
+        "failures": sum(group["failures"] for group in summary_groups),
+        "hours": hours,
+        "groups": summary_groups,
+    }
+
+
+def merge_summaries(summaries: List[Summary]) -> Summary:
+    """Add up summaries of several days."""
+    merged = summarize({})
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    for summary in summaries:
+        merged["total"] += summary["total"]
+        merged["failures"] += summary["failures"]
+        merged["hours"] = [a + b for a, b in zip(merged["hours"], summary["hours"])]
+        for group in summary["groups"]:
+            key = (group["template"], group["category"])
+            target = groups.get(key)
+            if target is None:
+                groups[key] = {**group, "histogram": list(group["histogram"])}
+                continue
+            target["count"] += group["count"]
+            target["failures"] += group["failures"]
+            target["seconds"] += group["seconds"]
+            target["histogram"] = [a + b for a, b in zip(target["histogram"], group["histogram"])]
+    merged["groups"] = list(groups.values())
+    return merged
+
+
+def _day_source(db: Database, day: datetime) -> Tuple[Collection, Dict[str, Any]]:
+    """Return the collection holding a day's raw history and the filter selecting it."""
+    if uses_single_collection():
+        start = _day_start(day)
+        return db[HISTORY_COLLECTION], {"timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}}
+    return db[day_collection_name(day)], {}
+
+
+def summarize_day(db: Database, day: datetime) -> Summary:
+    """Aggregate one day of raw command history, spilling large groupings to disk."""
+    collection, match = _day_source(db, day)
+    return summarize({
+        "groups": collection.aggregate(day_summary_pipeline(match), allowDiskUse=True),
+        "hours": collection.aggregate(day_hours_pipeline(match), allowDiskUse=True),
+    })
+
+
+def count_day(db: Database, day: datetime) -> int:
+    """Return how many commands a day's raw history holds."""
+    collection, match = _day_source(db, day)
+    return collection.count_documents(match) if match else collection.estimated_document_count()
+
+
+def histogram_percentile(histogram: List[int], fraction: float) -> float:
+    """
+    Estimate a latency percentile from a histogram.
+
+    The value is interpolated linearly within its bucket; for the open-ended
+    last bucket its lower bound is returned.
+    """
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    rank = fraction * total
+    cumulative = 0
+    for i, count in enumerate(histogram):
+        if count and cumulative + count >= rank:
+            lower = LATENCY_BUCKETS[i - 1] if i else 0.0
+            if i == len(LATENCY_BUCKETS):
+                return lower
+            return lower + (LATENCY_BUCKETS[i] - lower) * (rank - cumulative) / count
+        cumulative += count
+    return LATENCY_BUCKETS[-1]
+
+
+def _days_between(start: datetime, end: datetime) -> List[datetime]:
+    """Return the days from start up to, but excluding, end's day."""
+    days = []
+    day = _day_start(start)
+    while day < _day_start(end):
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def _has_history(db: Database, day: datetime) -> bool:
+    """Return whether raw history for the day may still exist."""
+    return uses_single_collection() or day_collection_name(day) in get_catalog(db)
+
+
+def rollup_closed_days(db: Database, days: int, now: datetime = None, dry_run: bool = False) -> List[str]:
+    """
+    Store the summary of every closed day of the last `days` days that has none yet.
+
+    A day that already has a rollup is summarized again if its history now
+    holds more commands than the rollup counted, which happens when commands
+    are ingested late or imported. Fewer commands only mean that retention
+    has started removing the day, so the rollup is kept. Run before old
+    history is dropped, so the rollups outlive it.
+
+    Returns:
+        The days rolled up (or that would be, with dry_run), as YYYY_MM_DD
+    """
+    now = now or datetime.now()
+    rollups = db[ROLLUP_COLLECTION]
+    start = now - timedelta(days=days)
+    existing = {
+        doc["_id"]: doc.get("total", 0)
+        for doc in rollups.find({"_id": {"$gte": start.strftime("%Y_%m_%d")}}, {"total": 1})
+    }
+
+    rolled_up = []
+    for day in _days_between(start, now):
+        key = day.strftime("%Y_%m_%d")
+        if not _has_history(db, day) or (key in existing and count_day(db, day) <= existing[key]):
+            continue
+        if not dry_run:
+            summary = summarize_day(db, day)
+            rollups.replace_one({"_id": key}, {"_id": key, "day": day, **summary, "created_at": now}, upsert=True)
+        rolled_up.append(key)
+    return rolled_up
+
+
+def prune_rollups(db: Database, retention_days: int = None, now: datetime = None) -> int:
+    """Delete rollups older than the rollup retention period; returns how many."""
+    retention_days = DEFAULT_ROLLUP_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = ((now or datetime.now()) - timedelta(days=retention_days)).strftime("%Y_%m_%d")
+    return db[ROLLUP_COLLECTION].delete_many({"_id": {"$lt": cutoff}}).deleted_count
+
+
+def collect_summary(db: Database, days: int, raw: bool = False, now: datetime = None) -> Dict[str, Any]:
+    """
+    Summarize the last `days` days, from rollups where they exist.
+
+    Returns:
+        Dictionary with the merged 'summary' and the numbers of days read
+        from 'rollups' and aggregated from 'raw' history
+    """
+    now = now or datetime.now()
+    start = now - timedelta(days=days - 1)
+    rollups = {}
+    if not raw:
+        rollups = {doc["_id"]: doc for doc in db[ROLLUP_COLLECTION].find({"_id": {"$gte": start.strftime("%Y_%m_%d")}})}
+
+    summaries = []
+    raw_days = 0
+    for day in _days_between(start, now) + [_day_start(now)]:
+        rollup = rollups.get(day.strftime("%Y_%m_%d"))
+        if rollup is not None:
+            summaries.append(rollup)
+        elif _has_history(db, day):
+            summaries.append(summarize_day(db, day))
+            raw_days += 1
+    return {"summary": merge_summaries(summaries), "rollups": len(summaries) - raw_days, "raw": raw_days}
+
+
+def print_failures(summary: Summary, top: int):
+    templates: Dict[str, List[int]] = {}
+    for group in summary["groups"]:
+        counts = templates.setdefault(group["template"], [0, 0])
+        counts[0] += group["count"]
+        counts[1] += group["failures"]
+    ranked = sorted(((f, n, t) for t, (n, f) in templates.items() if f), reverse=True)[:top]
+
+    print("Most failing commands:")
+    if not ranked:
+        print("  (none)")
+    for failures, count, template in ranked:
+        print(f"  {failures:>7} / {count:<7} ({failures / count:6.1%})  {template}")
+
+
+def print_latency(summary: Summary, top: int):
+    categories: Dict[str, Dict[str, Any]] = {}
+    for group in summary["groups"]:
+        stats = categories.setdefault(group["category"], {"count": 0, "seconds": 0.0, "histogram": [0] * len(group["histogram"])})
+        stats["count"] += group["count"]
+        stats["seconds"] += group["seconds"]
+        stats["histogram"] = [a + b for a, b in zip(stats["histogram"], group["histogram"])]
+    ranked = sorted(categories.items(), key=lambda item: item[1]["count"], reverse=True)[:top]
+
+    print("Latency per category (seconds; percentiles estimated from histograms):")
+    print(f"  {'category':<24} {'runs':>8} {'mean':>8} {'p50':>8} {'p95':>8}")
+    for category, stats in ranked:
+        mean = stats["seconds"] / stats["count"] if stats["count"] else 0.0
+        p50 = histogram_percentile(stats["histogram"], 0.5)
+        p95 = histogram_percentile(stats["histogram"], 0.95)
+        print(f"  {category[:24]:<24} {stats['count']:>8} {mean:>8.2f} {p50:>8.2f} {p95:>8.2f}")
+
+
+def print_hourly(summary: Summary):
+    peak = max(summary["hours"]) or 1
+    print("Commands per hour of day:")
+    for hour, count in enumerate(summary["hours"]):
+        print(f"  {hour:02d}:00 {count:>8} {'#' * round(40 * count / peak)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report command history statistics")
+    parser.add_argument("--host", default=get_env("MONGODB_HOST", "localhost"), help="MongoDB host (default: localhost or $MONGODB_HOST)")
+    parser.add_argument("--port", type=int, default=get_int("MONGODB_PORT", 27017), help="MongoDB port (default: 27017 or $MONGODB_PORT)")
+    parser.add_argument("--db", default=get_env("MONGODB_DB", "terminal_logger"), help="MongoDB database name (default: terminal_logger or $MONGODB_DB)")
+    parser.add_argument("--days", type=int, default=30, help="Report on the last N days, today included (default: 30)")
+    parser.add_argument("--top", type=int, default=10, help="Rows per report (default: 10)")
+    parser.add_argument("--report", choices=["all", "failures", "latency", "hourly"], default="all", help="Report to print (default: all)")
+    parser.add_argument("--raw", action="store_true", help="Aggregate raw history even for days that have a rollup")
+
+    args = parser.parse_args()
+
+    db = connect_to_mongodb(args.host, args.port, args.db)
+    collected = collect_summary(db, args.days, raw=args.raw)
+    summary = collected["summary"]
+
+    rate = summary["failures"] / summary["total"] if summary["total"] else 0.0
+    print(f"Last {args.days} days: {summary['total']} commands, {summary['failures']} failed ({rate:.1%})")
+    print(f"Read {collected['rollups']} days from rollups, aggregated {collected['raw']} from raw history")
+    for name, report in (
+        ("failures", lambda: print_failures(summary, args.top)),
+        ("latency", lambda: print_latency(summary, args.top)),
+        ("hourly", lambda: print_hourly(summary)),
+    ):
+        if args.report in ("all", name):
+            print()
+            report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
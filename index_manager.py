@@ -0,0 +1,123 @@
+"""Index provisioning for the per-day command history collections."""
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+from collection_catalog import HISTORY_PREFIX, get_catalog
+from config import get_float
+
+DEFAULT_INDEX_PROVISION_INTERVAL = get_float("INDEX_PROVISION_INTERVAL", 3600)
+
+IndexKeys = List[Tuple[str, int]]
+
+# Full-text index behind the ranked --search; a match in the command
+# outweighs one in the AI description
+TEXT_INDEX: IndexKeys = [("command", TEXT), ("ai_description", TEXT)]
+TEXT_INDEX_WEIGHTS = {"command": 10, "ai_description": 1}
+
+# Indexes every day collection gets: timestamp-sorted listing and paging
+# (with _id as tie-break), the --failed, --category and per-directory
+# filters, and text search
+DAY_INDEXES: List[IndexKeys] = [
+    [("timestamp", DESCENDING), ("_id", DESCENDING)],
+    [("exit_code", ASCENDING), ("timestamp", DESCENDING)],
+    [("ai_category", ASCENDING), ("timestamp", DESCENDING)],
+    [("dir", ASCENDING), ("timestamp", DESCENDING)],
+    TEXT_INDEX,
+]
+
+
+def is_text_index(keys: IndexKeys) -> bool:
+    """Return whether the keys describe a text index."""
+    return any(direction == TEXT for _, direction in keys)
+
+
+def index_key(keys: IndexKeys) -> Tuple:
+    """Return the key of an index as index_information() reports it."""
+    if is_text_index(keys):
+        # Text indexes are reported by their internal key, whatever the fields
+        return (("_fts", "text"), ("_ftsx", 1))
+    return tuple(tuple(key) for key in keys)
+
+
+def index_options(keys: IndexKeys) -> Dict:
+    """Return the options an index is created with."""
+    return {"weights": TEXT_INDEX_WEIGHTS} if is_text_index(keys) else {}
+
+
+def index_model(keys: IndexKeys) -> IndexModel:
+    """Return the IndexModel for the keys, with their options."""
+    return IndexModel(keys, **index_options(keys))
+
+
+def day_collection_name(day: datetime) -> str:
+    """Return the name of the collection holding the given day."""
+    return f"{HISTORY_PREFIX}{day.strftime('%Y_%m_%d')}"
+
+
+def missing_indexes(collection: Collection, indexes: List[IndexKeys] = None) -> List[IndexKeys]:
+    """Return the indexes from the list that the collection does not have."""
+    indexes = DAY_INDEXES if indexes is None else indexes
+    existing = {tuple(tuple(key) for key in info["key"]) for info in collection.index_information().values()}
+    return [keys for keys in indexes if index_key(keys) not in existing]
+
+
+def ensure_indexes(collection: Collection, indexes: List[IndexKeys] = None) -> List[str]:
+    """
+    Create any missing indexes on a collection, creating the collection if needed.
+
+    Returns:
+        Names of the indexes that were created
+    """
+    missing = missing_indexes(collection, indexes)
+    if not missing:
+        return []
+    return collection.create_indexes([index_model(keys) for keys in missing])
+
+
+def provision_day_collections(db: Database, days_ahead: int = 1, now: datetime = None) -> Dict[str, List[str]]:
+    """
+    Create today's collection and the next days' ahead of time, with their indexes.
+
+    Run well before midnight (the ingestion daemon does so every
+    INDEX_PROVISION_INTERVAL seconds), so the first command of a new day is
+    written into an already indexed collection.
+
+    Returns:
+        Dictionary mapping each collection name to the indexes created on it
+    """
+    now = now or datetime.now()
+    catalog = get_catalog(db)
+    created = {}
+    for offset in range(days_ahead + 1):
+        collection_name = day_collection_name(now + timedelta(days=offset))
+        created[collection_name] = ensure_indexes(db[collection_name])
+        catalog.add(collection_name)
+    return created
+
+
+def check_day_collections(db: Database, repair: bool = False) -> Dict[str, List[IndexKeys]]:
+    """
+    Find day collections with missing indexes, optionally creating them.
+
+    Returns:
+        Dictionary mapping each collection that lacked indexes to the missing ones
+    """
+    report = {}
+    for collection_name in get_catalog(db).history_collections():
+        collection = db[collection_name]
+        missing = missing_indexes(collection)
+        if missing:
+            report[collection_name] = missing
+            if repair:
+                collection.create_indexes([index_model(keys) for keys in missing])
+    return report
+
+
+def format_index(keys: IndexKeys) -> str:
+    """Return a short description such as 'exit_code+timestamp'."""
+    return "+".join(field for field, _ in keys)
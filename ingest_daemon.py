@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Background ingestion daemon for terminal-logger.
+
+The wrapper hands the raw execute_command result to this daemon over a Unix
+socket and exits straight away; AI analysis, embedding and the MongoDB insert
+happen here. When the daemon is not running, the wrapper writes the result to
+an on-disk spool directory instead, and the daemon drains it on its next start.
+
+A payload that cannot be ingested stays in the spool and is retried with an
+increasing delay for as long as it takes, so an outage of MongoDB, Ollama or
+the embedding server loses nothing. Only payloads that cannot be decoded are
+moved aside to the spool's failed/ directory.
+"""
+
+import argparse
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, Any, List
+
+from bson import json_util
+
+from config import get_float, get_int, get_path
+from local_socket import bind_unix_server, close_unix_server, send_request
+
+DEFAULT_INGEST_SOCKET = get_path("INGEST_SOCKET", "~/.terminal_logger/ingest.sock")
+DEFAULT_SPOOL_DIR = get_path("INGEST_SPOOL_DIR", "~/.terminal_logger/spool")
+DEFAULT_INGEST_TIMEOUT = get_float("INGEST_TIMEOUT", 0.5)
+DEFAULT_SCAN_INTERVAL = get_float("INGEST_SCAN_INTERVAL", 5)
+DEFAULT_BATCH_SIZE = get_int("INGEST_BATCH_SIZE", 20)
+# Delay before retrying a payload that failed, doubled per failure up to the maximum
+RETRY_BACKOFF_SECONDS = 5
+MAX_RETRY_BACKOFF_SECONDS = 300
+
+
+def encode_payload(result: Dict[str, Any], ai_model: str = None, no_ai: bool = False) -> bytes:
+    """Serialize a command result and its analysis options for the daemon."""
+    payload = {
+        "result": result,
+        "options": {"ai_model": ai_model, "no_ai": no_ai},
+    }
+    return json_util.dumps(payload).encode("utf-8")
+
+
+def decode_payload(data: bytes) -> Dict[str, Any]:
+    """
+    Deserialize a payload produced by encode_payload.
+
+    Raises:
+        ValueError: If the data is not an encoded payload
+    """
+    payload = json_util.loads(data.decode("utf-8"))
+    if not isinstance(payload, dict) or not isinstance(payload.get("result"), dict):
+        raise ValueError("not a command result payload")
+    return payload
+
+
+def spool_payload(data: bytes, spool_dir: str = None) -> str:
+    """
+    Durably write an encoded payload into the spool directory.
+
+    The payload is written to a hidden temporary file first and renamed into
+    place, so readers never see a partially written record.
+
+    Returns:
+        Path of the spooled file
+    """
+    spool_dir = spool_dir or DEFAULT_SPOOL_DIR
+    os.makedirs(spool_dir, mode=0o700, exist_ok=True)
+
+    name = f"{time.time_ns()}-{uuid.uuid4().hex}.json"
+    tmp_path = os.path.join(spool_dir, f".{name}.tmp")
+    final_path = os.path.join(spool_dir, name)
+
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.rename(tmp_path, final_path)
+    return final_path
+
+
+def list_spool(spool_dir: str = None) -> List[str]:
+    """Return spooled payload paths, oldest first."""
+    spool_dir = spool_dir or DEFAULT_SPOOL_DIR
+    try:
+        names = os.listdir(spool_dir)
+    except FileNotFoundError:
+        return []
+    return [
+        os.path.join(spool_dir, name)
+        for name in sorted(names)
+        if name.endswith(".json") and not name.startswith(".")
+    ]
+
+
+def submit_result(
+    result: Dict[str, Any],
+    ai_model: str = None,
+    no_ai: bool = False,
+    socket_path: str = None,
+    spool_dir: str = None,
+    timeout: float = None,
+) -> str:
+    """
+    Hand a command result to the ingestion daemon.
+
+    Falls back to the on-disk spool when the daemon cannot be reached.
+
+    Returns:
+        "daemon" if the daemon accepted the result, "spool" otherwise
+    """
+    data = encode_payload(result, ai_model, no_ai)
+    socket_path = socket_path or DEFAULT_INGEST_SOCKET
+    timeout = DEFAULT_INGEST_TIMEOUT if timeout is None else timeout
+
+    try:
+        if send_request(socket_path, data, timeout).strip() == b"ok":
+            return "daemon"
+    except OSError:
+        pass
+
+    spool_payload(data, spool_dir)
+    return "spool"
+
+
+def annotate_payloads(payloads: List[Dict[str, Any]]):
+    """
+    Categorize the commands of several payloads together.
+
+    Commands that need Ollama are sent in batched requests, one per model.
+    The category and description are written into each payload's result, so
+    process_payload does not analyze them again.
+    """
+    from ai_integration import categorize_commands
+
+    by_model: Dict[str, List[Dict[str, Any]]] = {}
+    for payload in payloads:
+        options = payload.get("options", {})
+        if not options.get("no_ai") and "ai_category" not in payload["result"]:
+            by_model.setdefault(options.get("ai_model") or None, []).append(payload["result"])
+
+    for model, results in by_model.items():
+        analyses = categorize_commands([result["command"] for result in results], model)
+        for result, (category, description) in zip(results, analyses):
+            result["ai_category"] = category
+            result["ai_description"] = description
+
+
+def process_payload(db, payload: Dict[str, Any]) -> str:
+    """Analyze, embed and store a single payload. Returns the inserted ID."""
+    # Imported here so that the client side of this module stays cheap to import
+    from ai_integration import categorize_command
+    from db import store_command_result
+    from vector_search import add_vector_to_result
+
+    result = payload["result"]
+    options = payload.get("options", {})
+
+    if "ai_category" in result:
+        # Already categorized by annotate_payloads
+        pass
+    elif not options.get("no_ai"):
+        try:
+            category, description = categorize_command(result["command"], options.get("ai_model") or None)
+            result["ai_category"] = category
+            result["ai_description"] = description
+        except Exception as e:
+            result["ai_category"] = "error"
+            result["ai_description"] = f"AI analysis failed: {str(e)}"
+    else:
+        result["ai_category"] = "uncategorized"
+        result["ai_description"] = "AI analysis skipped"
+
+    result = add_vector_to_result(result)
+    return store_command_result(db, result)
+
+
+class IngestDaemon:
+    """Accepts results over a Unix socket and ingests them from the spool."""
+
+    def __init__(self, db, socket_path: str = None, spool_dir: str = None, scan_interval: float = None, batch_size: int = None):
+        self.db = db
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.socket_path = socket_path or DEFAULT_INGEST_SOCKET
+        self.spool_dir = spool_dir or DEFAULT_SPOOL_DIR
+        self.scan_interval = DEFAULT_SCAN_INTERVAL if scan_interval is None else scan_interval
+        self._queue = queue.Queue()
+        self._pending = set()
+        # Failures and monotonic retry time of payloads that could not be ingested
+        self._attempts = {}
+        self._retry_at = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+
+    def enqueue(self, path: str):
+        """Queue a spooled payload unless it is already queued."""
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+        self._queue.put(path)
+
+    def scan_spool(self) -> int:
+        """Queue every payload in the spool that is not waiting to be retried. Returns the number queued."""
+        now = time.monotonic()
+        paths = [path for path in list_spool(self.spool_dir) if self._retry_at.get(path, 0) <= now]
+        for path in paths:
+            self.enqueue(path)
+        return len(paths)
+
+    def accept(self, data: bytes):
+        """Spool a payload received over the socket and queue it for ingestion."""
+        self.enqueue(spool_payload(data, self.spool_dir))
+
+    def ingest(self, path: str, payload: Dict[str, Any] = None) -> bool:
+        """Ingest one spooled payload, removing it on success."""
+        try:
+            if payload is None:
+                with open(path, "rb") as fh:
+                    data = fh.read()
+                try:
+                    payload = decode_payload(data)
+                except ValueError as e:
+                    print(f"Cannot decode {os.path.basename(path)}, moving it to failed/: {e}", file=sys.stderr)
+                    self._quarantine(path)
+                    return False
+            process_payload(self.db, payload)
+            os.remove(path)
+            self._attempts.pop(path, None)
+            self._retry_at.pop(path, None)
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            delay = self._record_failure(path)
+            print(f"Failed to ingest {os.path.basename(path)}, retrying in {delay:.0f}s: {e}", file=sys.stderr)
+            return False
+        finally:
+            with self._lock:
+                self._pending.discard(path)
+
+    def _record_failure(self, path: str) -> float:
+        """Schedule the retry of a payload that failed; returns the delay in seconds."""
+        attempts = self._attempts.get(path, 0) + 1
+        self._attempts[path] = attempts
+        delay = min(MAX_RETRY_BACKOFF_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+        self._retry_at[path] = time.monotonic() + delay
+        return delay
+
+    def _quarantine(self, path: str):
+        """Move a payload that cannot be decoded out of the spool."""
+        failed_dir = os.path.join(self.spool_dir, "failed")
+        os.makedirs(failed_dir, mode=0o700, exist_ok=True)
+        os.rename(path, os.path.join(failed_dir, os.path.basename(path)))
+        self._attempts.pop(path, None)
+        self._retry_at.pop(path, None)
+
+    def ingest_batch(self, paths: List[str]) -> int:
+        """Ingest several spooled payloads, categorizing their commands together."""
+        payloads = {}
+        for path in paths:
+            try:
+                with open(path, "rb") as fh:
+                    payloads[path] = decode_payload(fh.read())
+            except (OSError, ValueError):
+                # ingest() retries unreadable payloads and sets undecodable ones aside
+                pass
+
+        try:
+            annotate_payloads(list(payloads.values()))
+        except Exception as e:
+            print(f"Batch analysis failed, analyzing individually: {e}", file=sys.stderr)
+
+        return sum(1 for path in paths if self.ingest(path, payloads.get(path)))
+
+    def _next_batch(self, timeout: float = None) -> List[str]:
+        """Take up to batch_size queued paths, waiting up to timeout for the first."""
+        try:
+            if timeout is None:
+                paths = [self._queue.get_nowait()]
+            else:
+                paths = [self._queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+
+        while len(paths) < self.batch_size:
+            try:
+                paths.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return paths
+
+    def drain(self) -> int:
+        """Synchronously ingest everything in the spool. Returns the number ingested."""
+        self.scan_spool()
+        ingested = 0
+        while True:
+            paths = self._next_batch()
+            if not paths:
+                return ingested
+            ingested += self.ingest_batch(paths)
+
+    def _worker(self):
+        while not self._stop.is_set():
+            paths = self._next_batch(timeout=0.5)
+            if paths:
+                self.ingest_batch(paths)
+
+    def _scanner(self):
+        while not self._stop.wait(self.scan_interval):
+            self.scan_spool()
+
+    def _provisioner(self):
+        # Keep today's and tomorrow's collections indexed across midnight
+        from db import uses_single_collection
+        from index_manager import DEFAULT_INDEX_PROVISION_INTERVAL, provision_day_collections
+
+        if uses_single_collection():
+            return
+        while True:
+            try:
+                provision_day_collections(self.db)
+            except Exception as e:
+                print(f"Failed to provision day collections: {e}", file=sys.stderr)
+            if self._stop.wait(DEFAULT_INDEX_PROVISION_INTERVAL):
+                break
+
+    def _handler_class(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                data = self.rfile.readline().strip()
+                if not data:
+                    return
+                try:
+                    daemon.accept(data)
+                    self.wfile.write(b"ok\n")
+                except Exception as e:
+                    print(f"Failed to accept payload: {e}", file=sys.stderr)
+                    self.wfile.write(b"error\n")
+
+        return Handler
+
+    def start(self):
+        """Bind the socket and start the worker and spool scanner threads."""
+        self._server = bind_unix_server(self.socket_path, self._handler_class())
+
+        self.scan_spool()
+        for target in (self._worker, self._scanner, self._provisioner, self._server.serve_forever):
+            threading.Thread(target=target, daemon=True).start()
+
+    def stop(self):
+        """Stop accepting results and remove the socket."""
+        self._stop.set()
+        if self._server is not None:
+            close_unix_server(self._server, self.socket_path)
+            self._server = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background ingestion daemon for terminal-logger")
+    parser.add_argument("--socket", default=DEFAULT_INGEST_SOCKET, help=f"Unix socket to listen on (default: {DEFAULT_INGEST_SOCKET} or $INGEST_SOCKET)")
+    parser.add_argument("--spool-dir", default=DEFAULT_SPOOL_DIR, help=f"Spool directory for pending results (default: {DEFAULT_SPOOL_DIR} or $INGEST_SPOOL_DIR)")
+    parser.add_argument("--once", action="store_true", help="Drain the spool once and exit instead of running as a daemon")
+
+    args = parser.parse_args()
+
+    from db import close_mongodb_clients, connect_to_mongodb
+    from neighbour_classifier import install_neighbour_classifier
+
+    db = connect_to_mongodb()
+    install_neighbour_classifier(db)
+    daemon = IngestDaemon(db, args.socket, args.spool_dir)
+
+    if args.once:
+        ingested = daemon.drain()
+        print(f"Ingested {ingested} spooled results")
+        return 0
+
+    try:
+        daemon.start()
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    print(f"Ingestion daemon listening on {args.socket}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+        close_mongodb_clients()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Helpers for the line-oriented Unix socket services used by terminal logger."""
+
+import os
+import socket
+import socketserver
+
+
+def socket_is_live(socket_path: str, timeout: float = 0.5) -> bool:
+    """Check whether something is accepting connections on a Unix socket."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def bind_unix_server(socket_path: str, handler_class) -> socketserver.ThreadingUnixStreamServer:
+    """
+    Bind a threading server to a Unix socket only the current user can reach.
+
+    A socket file left behind by a crashed process is removed first.
+
+    Raises:
+        RuntimeError: If another process is already serving on the socket
+    """
+    os.makedirs(os.path.dirname(socket_path), mode=0o700, exist_ok=True)
+    if os.path.exists(socket_path):
+        if socket_is_live(socket_path):
+            raise RuntimeError(f"Another server is already running on {socket_path}")
+        os.remove(socket_path)
+
+    server = socketserver.ThreadingUnixStreamServer(socket_path, handler_class)
+    server.daemon_threads = True
+    os.chmod(socket_path, 0o600)
+    return server
+
+
+def close_unix_server(server: socketserver.ThreadingUnixStreamServer, socket_path: str):
+    """Stop a server started with bind_unix_server and remove its socket."""
+    server.shutdown()
+    server.server_close()
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+
+def send_request(socket_path: str, data: bytes, timeout: float) -> bytes:
+    """
+    Send one request line and return the reply.
+
+    Raises:
+        OSError: If the server cannot be reached or does not reply in time
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(data + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b"".join(chunks)
@@ -5,26 +5,55 @@ This script can be run as a cron job to clean up old collections.
 """
 
 import argparse
+import bisect
 import sys
-from datetime import datetime
-import os
-from dotenv import load_dotenv
+from datetime import datetime, timedelta
 
-from db import connect_to_mongodb, clean_old_collections
+from collection_catalog import HISTORY_PREFIX, get_catalog
+from config import get_env, get_int
+from db import connect_to_mongodb, clean_old_collections, collection_stats, migrate_embeddings, uses_single_collection
+from embedding_snapshots import DEFAULT_EMBEDDING_SNAPSHOTS, export_closed_days, quantize_snapshots
+from history_stats import prune_rollups, rollup_closed_days
+from index_manager import check_day_collections, format_index, provision_day_collections
+from quantization import DEFAULT_VECTOR_QUANTIZATION, QUANTIZERS
 
-# Load environment variables from .env file
-load_dotenv()
+
+def format_bytes(size: float) -> str:
+    """Return a size such as '1.5 MB'."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def describe_collection(name: str, stats: dict) -> str:
+    """Return the report line of a collection with its document count and sizes."""
+    return (f"  - {name}: {stats['count']} documents, {format_bytes(stats['size'])} "
+            f"({format_bytes(stats['storage_size'] + stats['index_size'])} on disk)")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Maintain terminal-logger database")
-    parser.add_argument("--host", default=os.environ.get("MONGODB_HOST", "localhost"), help="MongoDB host (default: localhost or $MONGODB_HOST)")
-    parser.add_argument("--port", type=int, default=int(os.environ.get("MONGODB_PORT", 27017)), help="MongoDB port (default: 27017 or $MONGODB_PORT)")
-    parser.add_argument("--db", default=os.environ.get("MONGODB_DB", "terminal_logger"), help="MongoDB database name (default: terminal_logger or $MONGODB_DB)")
-    parser.add_argument("--retention", type=int, default=int(os.environ.get("RETENTION_DAYS", 30)), help="Number of days to retain command history (default: 30 or $RETENTION_DAYS)")
+    parser.add_argument("--host", default=get_env("MONGODB_HOST", "localhost"), help="MongoDB host (default: localhost or $MONGODB_HOST)")
+    parser.add_argument("--port", type=int, default=get_int("MONGODB_PORT", 27017), help="MongoDB port (default: 27017 or $MONGODB_PORT)")
+    parser.add_argument("--db", default=get_env("MONGODB_DB", "terminal_logger"), help="MongoDB database name (default: terminal_logger or $MONGODB_DB)")
+    parser.add_argument("--retention", type=int, default=get_int("RETENTION_DAYS", 30), help="Number of days to retain command history (default: 30 or $RETENTION_DAYS)")
     parser.add_argument("--dry-run", action="store_true", help="Show what would be done without actually removing collections")
+    parser.add_argument("--check-indexes", action="store_true", help="Report day collections with missing indexes")
+    parser.add_argument("--repair-indexes", action="store_true", help="Create missing indexes on existing day collections")
+    parser.add_argument("--migrate-embeddings", action="store_true", help="Convert embeddings stored as lists to the binary format of $EMBEDDING_DTYPE")
+    parser.add_argument("--retrain-quantizer", action="store_true", help="Retrain the $VECTOR_QUANTIZATION quantizer and re-encode every snapshot")
     
     args = parser.parse_args()
+
+    # Checked before anything is removed, so a typo does not stop maintenance halfway
+    if DEFAULT_VECTOR_QUANTIZATION not in ("off",) + QUANTIZERS:
+        print(f"Error: unsupported VECTOR_QUANTIZATION '{DEFAULT_VECTOR_QUANTIZATION}' "
+              f"(use {', '.join(QUANTIZERS)} or off)", file=sys.stderr)
+        return 1
+    if args.retrain_quantizer and (DEFAULT_VECTOR_QUANTIZATION == "off" or not DEFAULT_EMBEDDING_SNAPSHOTS):
+        print("Error: --retrain-quantizer needs EMBEDDING_SNAPSHOTS and VECTOR_QUANTIZATION set", file=sys.stderr)
+        return 1
     
     # Connect to MongoDB
     db = connect_to_mongodb(args.host, args.port, args.db)
@@ -36,36 +65,70 @@ def main():
     print("---")
     
     if args.dry_run:
-        # Get all collections
-        all_collections = db.list_collection_names()
-        
-        # Filter command history collections
-        history_collections = [c for c in all_collections if c.startswith("command_history_")]
-        history_collections.sort()
+        # Command history collections, oldest first, measured from metadata in one round
+        history_collections = get_catalog(db).history_collections()
+        stats = collection_stats(db, history_collections)
         
         print(f"Found {len(history_collections)} command history collections:")
         for collection in history_collections:
-            count = db[collection].count_documents({})
-            print(f"  - {collection}: {count} documents")
+            print(describe_collection(collection, stats[collection]))
         
-        # Calculate which would be removed
-        from datetime import datetime, timedelta
+        # Calculate which would be removed; the names are sorted by date, so they are a prefix
         cutoff_date = datetime.now() - timedelta(days=args.retention)
         cutoff_str = cutoff_date.strftime("%Y_%m_%d")
         
-        would_remove = [c for c in history_collections if c[16:] < cutoff_str]
-        would_remove.sort()
+        would_remove = history_collections[:bisect.bisect_left(history_collections, HISTORY_PREFIX + cutoff_str)]
+        freed = sum(stats[c]["storage_size"] + stats[c]["index_size"] for c in would_remove)
         
-        print(f"\nWould remove {len(would_remove)} collections:")
+        print(f"\nWould remove {len(would_remove)} collections, freeing {format_bytes(freed)}:")
         for collection in would_remove:
-            count = db[collection].count_documents({})
-            print(f"  - {collection}: {count} documents")
+            print(describe_collection(collection, stats[collection]))
+
+        pending = rollup_closed_days(db, args.retention, dry_run=True)
+        print(f"\nWould roll up {len(pending)} days{': ' + ', '.join(pending) if pending else ''}")
+        if DEFAULT_EMBEDDING_SNAPSHOTS:
+            pending = export_closed_days(db, args.retention, dry_run=True)
+            print(f"Would snapshot the embeddings of {len(pending)} days{': ' + ', '.join(pending) if pending else ''}")
     else:
+        # Summarize closed days before their history can be removed
+        rolled_up = rollup_closed_days(db, args.retention)
+        print(f"Rolled up {len(rolled_up)} days{': ' + ', '.join(rolled_up) if rolled_up else ''}")
+        pruned = prune_rollups(db)
+        if pruned:
+            print(f"Removed {pruned} rollups past ROLLUP_RETENTION_DAYS")
+
         # Actually remove old collections
         removed = clean_old_collections(db, args.retention)
         print(f"Removed {len(removed)} old collections:")
         for collection in sorted(removed):
             print(f"  - {collection}")
+
+        # Closed days no longer change; vector search memory-maps their embeddings
+        if DEFAULT_EMBEDDING_SNAPSHOTS:
+            exported = export_closed_days(db, args.retention)
+            print(f"Snapshotted the embeddings of {len(exported)} days{': ' + ', '.join(exported) if exported else ''}")
+            if DEFAULT_VECTOR_QUANTIZATION != "off":
+                quantized = quantize_snapshots(db, retrain=args.retrain_quantizer)
+                print(f"Quantized ({DEFAULT_VECTOR_QUANTIZATION}) the embeddings of {len(quantized)} days")
+        
+        # Index today's and tomorrow's collections ahead of the first insert
+        if not uses_single_collection():
+            for collection, created in provision_day_collections(db).items():
+                if created:
+                    print(f"Created {len(created)} indexes on {collection}")
+    
+    if args.check_indexes or args.repair_indexes:
+        repair = args.repair_indexes and not args.dry_run
+        report = check_day_collections(db, repair=repair)
+        print(f"\n{len(report)} collections with missing indexes{' (repaired)' if repair and report else ''}:")
+        for collection, missing in report.items():
+            print(f"  - {collection}: {', '.join(format_index(keys) for keys in missing)}")
+    
+    if args.migrate_embeddings:
+        converted = migrate_embeddings(db, dry_run=args.dry_run)
+        print(f"\n{'Would convert' if args.dry_run else 'Converted'} {sum(converted.values())} list embeddings to binary:")
+        for collection, count in converted.items():
+            print(f"  - {collection}: {count}")
     
     return 0
 
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Copy per-day command_history_YYYY_MM_DD collections into the single
+command_history collection used by STORAGE_LAYOUT=single.
+
+Documents keep their _id, so the migration can be interrupted and run again:
+documents that were already copied are skipped. Indexes are created after the
+copy, which is faster than maintaining them during the bulk inserts.
+"""
+
+import argparse
+import sys
+from typing import Dict
+
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from collection_catalog import get_catalog
+from config import get_env, get_int
+from db import connect_to_mongodb, ensure_history_indexes, HISTORY_COLLECTION
+
+DEFAULT_MIGRATION_BATCH_SIZE = 1000
+
+# Server error code for duplicate keys
+DUPLICATE_KEY = 11000
+
+
+def copy_collection(db: Database, source_name: str, batch_size: int = DEFAULT_MIGRATION_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Copy one day collection into the history collection with unordered bulk inserts.
+
+    Returns:
+        Dictionary with the number of documents 'copied' and 'skipped' (already present)
+    """
+    target = db[HISTORY_COLLECTION]
+    copied = skipped = 0
+
+    def flush(batch):
+        nonlocal copied, skipped
+        try:
+            copied += len(target.insert_many(batch, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            duplicates = sum(1 for error in errors if error.get("code") == DUPLICATE_KEY)
+            if duplicates != len(errors):
+                raise
+            copied += e.details.get("nInserted", 0)
+            skipped += duplicates
+
+    batch = []
+    for document in db[source_name].find({}, batch_size=batch_size):
+        # The TTL index expires documents by the UTC time they were stored
+        document.setdefault("created_at", document["_id"].generation_time)
+        batch.append(document)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    return {"copied": copied, "skipped": skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy per-day history collections into the single command_history collection")
+    parser.add_argument("--host", default=get_env("MONGODB_HOST", "localhost"), help="MongoDB host (default: localhost or $MONGODB_HOST)")
+    parser.add_argument("--port", type=int, default=get_int("MONGODB_PORT", 27017), help="MongoDB port (default: 27017 or $MONGODB_PORT)")
+    parser.add_argument("--db", default=get_env("MONGODB_DB", "terminal_logger"), help="MongoDB database name (default: terminal_logger or $MONGODB_DB)")
+    parser.add_argument("--retention", type=int, default=get_int("RETENTION_DAYS", 30), help="Days before documents expire (default: 30 or $RETENTION_DAYS)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_MIGRATION_BATCH_SIZE, help=f"Documents per bulk insert (default: {DEFAULT_MIGRATION_BATCH_SIZE})")
+    parser.add_argument("--drop-source", action="store_true", help="Drop each day collection after it has been copied")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be copied without copying")
+
+    args = parser.parse_args()
+
+    db = connect_to_mongodb(args.host, args.port, args.db)
+
+    catalog = get_catalog(db)
+    day_collections = catalog.history_collections()
+    print(f"Found {len(day_collections)} day collections")
+
+    total_copied = total_skipped = 0
+    for collection_name in day_collections:
+        if args.dry_run:
+            print(f"  - {collection_name}: {db[collection_name].estimated_document_count()} documents")
+            continue
+
+        counts = copy_collection(db, collection_name, args.batch_size)
+        total_copied += counts["copied"]
+        total_skipped += counts["skipped"]
+        print(f"  - {collection_name}: copied {counts['copied']}, already present {counts['skipped']}")
+
+        if args.drop_source:
+            db.drop_collection(collection_name)
+            catalog.discard(collection_name)
+
+    if args.dry_run:
+        return 0
+
+    ensure_history_indexes(db, args.retention)
+    print(f"Copied {total_copied} documents into {HISTORY_COLLECTION} ({total_skipped} already present)")
+    print("Set STORAGE_LAYOUT=single to use it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Category inference from the nearest labelled commands in recent history.
+
+Every stored command has a `vector_embedding` and an `ai_category`. A new
+command is embedded and compared with the most recent labelled commands; the
+top-k neighbours vote for a category, weighted by similarity. When the vote
+is confident enough the classifier answers and Ollama is not called.
+
+The classifier runs in one of three modes (CLASSIFIER_NEIGHBOURS):
+- off: not used (default)
+- shadow: predicts but never answers; the prediction is compared with the
+  category returned by Ollama and counted as an agreement or disagreement
+- on: answers whenever the vote is confident enough
+"""
+
+import argparse
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from command_rules import Classification
+from config import get_env, get_float, get_int
+
+DEFAULT_NEIGHBOURS_MODE = get_env("CLASSIFIER_NEIGHBOURS", "off").lower()
+DEFAULT_NEIGHBOURS_K = get_int("CLASSIFIER_NEIGHBOURS_K", 10)
+DEFAULT_NEIGHBOURS_DAYS = get_int("CLASSIFIER_NEIGHBOURS_DAYS", 14)
+DEFAULT_NEIGHBOURS_MAX_CANDIDATES = get_int("CLASSIFIER_NEIGHBOURS_MAX_CANDIDATES", 5000)
+DEFAULT_NEIGHBOURS_MIN_SIMILARITY = get_float("CLASSIFIER_NEIGHBOURS_MIN_SIMILARITY", 0.6)
+DEFAULT_NEIGHBOURS_REFRESH_SECONDS = get_float("CLASSIFIER_NEIGHBOURS_REFRESH_SECONDS", 300)
+
+# Labels that say nothing about the command and never vote
+UNLABELLED = ["uncategorized", "error"]
+
+# Commands embedded per request while evaluating
+EVALUATE_BATCH = 256
+
+
+def _category_key(category: str) -> str:
+    """Fold spelling variants such as 'File_Management' and 'file management' together."""
+    return " ".join(category.lower().replace("_", " ").split())
+
+
+class NeighbourClassifier:
+    """Classifies commands by a similarity-weighted vote of their nearest labelled neighbours."""
+
+    name = "neighbours"
+
+    def __init__(
+        self,
+        db,
+        k: int = None,
+        days: int = None,
+        max_candidates: int = None,
+        min_similarity: float = None,
+        refresh_seconds: float = None,
+        shadow: bool = False,
+    ):
+        self.db = db
+        self.k = k or DEFAULT_NEIGHBOURS_K
+        self.days = days or DEFAULT_NEIGHBOURS_DAYS
+        self.max_candidates = max_candidates or DEFAULT_NEIGHBOURS_MAX_CANDIDATES
+        self.min_similarity = DEFAULT_NEIGHBOURS_MIN_SIMILARITY if min_similarity is None else min_similarity
+        self.refresh_seconds = DEFAULT_NEIGHBOURS_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.shadow = shadow
+
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._labels: List[Dict[str, Any]] = []
+        self._matrix = None
+        # Last prediction per command, compared with Ollama's answer in observe()
+        self._predictions: Dict[str, Classification] = {}
+
+    def load_candidates(self) -> List[Dict[str, Any]]:
+        """Fetch the most recent labelled commands that have an embedding."""
+        from db import date_range_filter, get_collections_in_date_range
+
+        start_date = datetime.now() - timedelta(days=self.days)
+        query = {
+            "ai_category": {"$exists": True, "$nin": UNLABELLED},
+            "vector_embedding": {"$exists": True},
+            **date_range_filter(start_date),
+        }
+        projection = {"command": 1, "ai_category": 1, "ai_description": 1, "vector_embedding": 1}
+
+        candidates = []
+        for collection_name in get_collections_in_date_range(self.db, start_date):
+            remaining = self.max_candidates - len(candidates)
+            if remaining <= 0:
+                break
+            cursor = self.db[collection_name].find(query, projection).sort("timestamp", -1).limit(remaining)
+            candidates.extend(cursor)
+        return candidates
+
+    def set_candidates(self, candidates: List[Dict[str, Any]]):
+        """Replace the labelled neighbours with the given documents."""
+        from embedding_storage import embedding_length, stack_embeddings
+        from vector_engine import normalize_rows
+
+        candidates = [doc for doc in candidates if embedding_length(doc.get("vector_embedding"))]
+        if candidates:
+            dimensions = embedding_length(candidates[0]["vector_embedding"])
+            candidates = [doc for doc in candidates if embedding_length(doc["vector_embedding"]) == dimensions]
+            vectors = stack_embeddings([doc["vector_embedding"] for doc in candidates], dimensions)
+            matrix = normalize_rows(vectors)
+        else:
+            matrix = None
+
+        with self._lock:
+            self._labels = [
+                {"category": doc["ai_category"], "description": doc.get("ai_description", ""), "command": doc.get("command", "")}
+                for doc in candidates
+            ]
+            self._matrix = matrix
+            self._loaded_at = time.monotonic()
+
+    def _refresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.set_candidates(self.load_candidates())
+
+    def predict(self, command: str, vector: List[float] = None) -> Optional[Classification]:
+        """
+        Vote on a category for a command.
+
+        Stored neighbours were embedded from the command and its description,
+        but a new command has no description yet, so it is embedded alone.
+
+        Args:
+            command: The shell command to classify
+            vector: Embedding of the command alone (default: embed it now)
+
+        Returns:
+            The winning Classification, whose confidence is the winner's share
+            of the total similarity, or None if no neighbour is similar enough
+        """
+        from vector_engine import normalize
+
+        self._refresh()
+        with self._lock:
+            matrix, labels = self._matrix, self._labels
+        if matrix is None:
+            return None
+
+        if vector is None:
+            from vector_search import create_command_vector
+            vector = create_command_vector(command)
+        query = normalize(vector)
+        if query is None:
+            return None
+        return self._vote(matrix @ query, labels)
+
+    def _vote(self, similarities, labels: List[Dict[str, Any]]) -> Optional[Classification]:
+        """Return the similarity-weighted vote of the top-k neighbours, or None."""
+        from vector_engine import top_k
+
+        top = top_k(similarities, self.k)
+        if similarities[top[0]] < self.min_similarity:
+            return None
+
+        votes: Dict[str, float] = {}
+        best: Dict[str, Dict[str, Any]] = {}
+        for i in top:
+            similarity = float(similarities[i])
+            if similarity <= 0:
+                continue
+            key = _category_key(labels[i]["category"])
+            votes[key] = votes.get(key, 0.0) + similarity
+            # Neighbours are in order of similarity, so the first one per category is its closest
+            best.setdefault(key, labels[i])
+
+        winner = max(votes, key=votes.get)
+        confidence = votes[winner] / sum(votes.values())
+        neighbour = best[winner]
+        description = neighbour["description"] or f"Similar to `{neighbour['command']}`."
+        return Classification(neighbour["category"], description, confidence, self.name)
+
+    def __call__(self, command: str) -> Optional[Classification]:
+        """Classify a command; in shadow mode the prediction is only recorded."""
+        try:
+            prediction = self.predict(command)
+        except Exception as e:
+            print(f"Neighbour classification failed: {e}", file=sys.stderr)
+            return None
+
+        if not self.shadow:
+            return prediction
+        if prediction is not None:
+            with self._lock:
+                self._predictions[command] = prediction
+                if len(self._predictions) > 1000:
+                    self._predictions.pop(next(iter(self._predictions)))
+        return None
+
+    def observe(self, command: str, category: str, cache=None):
+        """Compare the recorded prediction for a command with the category Ollama returned."""
+        from ai_integration import CLASSIFIER_MIN_CONFIDENCE
+
+        with self._lock:
+            prediction = self._predictions.pop(command, None)
+        if prediction is None or prediction.confidence < CLASSIFIER_MIN_CONFIDENCE or cache is None:
+            return
+        agreed = _category_key(prediction.category) == _category_key(category)
+        cache.incr(f"{self.name}.agree" if agreed else f"{self.name}.disagree")
+
+
+def install_neighbour_classifier(db, mode: str = None) -> Optional[NeighbourClassifier]:
+    """Register the neighbour classifier as a classifier stage unless its mode is 'off'."""
+    from ai_integration import register_classifier_stage
+
+    mode = (mode or DEFAULT_NEIGHBOURS_MODE).lower()
+    if mode not in ("on", "shadow"):
+        return None
+    classifier = NeighbourClassifier(db, shadow=mode == "shadow")
+    register_classifier_stage(classifier)
+    return classifier
+
+
+def evaluate(classifier: NeighbourClassifier, min_confidence: float) -> Dict[str, Any]:
+    """
+    Leave-one-out evaluation against the stored (Ollama) categories.
+
+    Each labelled command is embedded alone, as predict() sees a new command,
+    and classified from all the others; its own row is masked out of the
+    similarities. The result is compared with its stored category.
+    """
+    import numpy as np
+    from vector_engine import normalize_rows
+    from vector_search import generate_embeddings
+
+    classifier.set_candidates(classifier.load_candidates())
+    with classifier._lock:
+        matrix, labels = classifier._matrix, classifier._labels
+
+    answered = agreed = 0
+    for start in range(0, len(labels), EVALUATE_BATCH):
+        batch = labels[start:start + EVALUATE_BATCH]
+        queries = normalize_rows(np.asarray(generate_embeddings([label["command"] for label in batch]), dtype=np.float32))
+        for i, (label, similarities) in enumerate(zip(batch, queries @ matrix.T), start):
+            similarities[i] = -np.inf
+            prediction = classifier._vote(similarities, labels)
+            if prediction is None or prediction.confidence < min_confidence:
+                continue
+            answered += 1
+            agreed += _category_key(prediction.category) == _category_key(label["category"])
+
+    return {"total": len(labels), "answered": answered, "agreed": agreed}
+
+
+def main():
+    from ai_integration import CLASSIFIER_MIN_CONFIDENCE
+
+    parser = argparse.ArgumentParser(description="Evaluate nearest-neighbour categorization against stored AI categories")
+    parser.add_argument("--days", type=int, default=DEFAULT_NEIGHBOURS_DAYS, help=f"Days of history to use (default: {DEFAULT_NEIGHBOURS_DAYS})")
+    parser.add_argument("--k", type=int, default=DEFAULT_NEIGHBOURS_K, help=f"Neighbours that vote (default: {DEFAULT_NEIGHBOURS_K})")
+    parser.add_argument("--max-candidates", type=int, default=1000, help="Labelled commands to evaluate (default: 1000)")
+    parser.add_argument("--min-confidence", type=float, default=CLASSIFIER_MIN_CONFIDENCE, help=f"Vote share needed to answer (default: {CLASSIFIER_MIN_CONFIDENCE})")
+
+    args = parser.parse_args()
+
+    from db import connect_to_mongodb
+
+    db = connect_to_mongodb()
+    classifier = NeighbourClassifier(db, k=args.k, days=args.days, max_candidates=args.max_candidates)
+    report = evaluate(classifier, args.min_confidence)
+
+    total, answered, agreed = report["total"], report["answered"], report["agreed"]
+    print(f"Labelled commands: {total}")
+    if not total:
+        return 0
+    print(f"Answered without Ollama: {answered}/{total} ({answered / total:.1%})")
+    if answered:
+        print(f"Agreement with Ollama: {agreed}/{answered} ({agreed / answered:.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
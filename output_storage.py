@@ -0,0 +1,170 @@
+"""Bounded, compressed storage of command output."""
+
+import gzip
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple, Union
+
+from bson.binary import Binary
+from gridfs import GridFSBucket
+from pymongo.database import Database
+
+try:
+    import zstandard
+except ImportError:  # zstd support is optional
+    zstandard = None
+
+from config import get_env, get_int
+
+DEFAULT_OUTPUT_HEAD_BYTES = get_int("OUTPUT_HEAD_BYTES", 4 * 1024 * 1024)
+DEFAULT_OUTPUT_TAIL_BYTES = get_int("OUTPUT_TAIL_BYTES", 1024 * 1024)
+DEFAULT_OUTPUT_COMPRESSION = get_env("OUTPUT_COMPRESSION", "auto").lower()
+DEFAULT_COMPRESS_MIN_BYTES = get_int("OUTPUT_COMPRESS_MIN_BYTES", 1024)
+DEFAULT_GRIDFS_THRESHOLD = get_int("OUTPUT_GRIDFS_THRESHOLD", 1024 * 1024)
+
+OUTPUT_BUCKET = "command_output"
+OUTPUT_FIELDS = ("stdout", "stderr")
+PREVIEW_LENGTH = 100
+
+
+def get_codec(name: str = None) -> Optional[str]:
+    """Resolve the configured compression codec, or None for no compression."""
+    name = (name or DEFAULT_OUTPUT_COMPRESSION).lower()
+    if name == "auto":
+        return "zstd" if zstandard is not None else "gzip"
+    if name == "none":
+        return None
+    if name == "zstd" and zstandard is None:
+        # Fall back rather than failing to store the command
+        return "gzip"
+    if name not in ("zstd", "gzip"):
+        raise ValueError(f"Unsupported output compression: {name}")
+    return name
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    """Compress bytes with the given codec."""
+    if codec == "zstd":
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    """Decompress bytes produced by compress()."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed output")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def truncate_output(text: str, head_bytes: int = None, tail_bytes: int = None) -> str:
+    """Keep the first and last bytes of the output, marking what was dropped."""
+    head_bytes = DEFAULT_OUTPUT_HEAD_BYTES if head_bytes is None else head_bytes
+    tail_bytes = DEFAULT_OUTPUT_TAIL_BYTES if tail_bytes is None else tail_bytes
+
+    data = text.encode("utf-8")
+    dropped = len(data) - head_bytes - tail_bytes
+    if dropped <= 0:
+        return text
+
+    head = data[:head_bytes].decode("utf-8", errors="replace")
+    tail = data[len(data) - tail_bytes:].decode("utf-8", errors="replace") if tail_bytes else ""
+    return f"{head}\n... [{dropped} bytes truncated] ...\n{tail}"
+
+
+def encode_output(db: Database, text: str, collection_name: str = None) -> Union[str, Dict[str, Any]]:
+    """
+    Prepare a stdout/stderr value for storage.
+
+    Short output is stored as a plain string. Longer output is truncated and
+    compressed into an inline binary, or written to GridFS when the compressed
+    size is still above the threshold.
+
+    Args:
+        db: MongoDB database instance
+        text: Output to store
+        collection_name: Collection the owning document is stored in
+
+    Returns:
+        A plain string or an encoded output document
+    """
+    if not text:
+        return text
+
+    text = truncate_output(text)
+    data = text.encode("utf-8")
+    codec = get_codec()
+    if codec is None or len(data) < DEFAULT_COMPRESS_MIN_BYTES:
+        return text
+
+    compressed = compress(data, codec)
+    encoded = {
+        "encoding": codec,
+        "length": len(text),
+        "size": len(data),
+        "preview": text[:PREVIEW_LENGTH],
+    }
+
+    if len(compressed) > DEFAULT_GRIDFS_THRESHOLD:
+        bucket = GridFSBucket(db, bucket_name=OUTPUT_BUCKET)
+        if collection_name and collection_name.startswith("command_history_"):
+            day = collection_name[16:]
+        else:
+            day = datetime.now().strftime("%Y_%m_%d")
+        encoded["gridfs_id"] = bucket.upload_from_stream(
+            f"{collection_name or 'command_history'}.output",
+            compressed,
+            metadata={"collection": collection_name, "day": day, "encoding": codec},
+        )
+    else:
+        encoded["data"] = Binary(compressed)
+
+    return encoded
+
+
+def decode_output(value: Union[str, Dict[str, Any], None], db: Database = None) -> str:
+    """Return the full text of a stored stdout/stderr value."""
+    if not isinstance(value, dict):
+        return value or ""
+
+    if "gridfs_id" in value:
+        if db is None:
+            return value.get("preview", "")
+        bucket = GridFSBucket(db, bucket_name=OUTPUT_BUCKET)
+        compressed = bucket.open_download_stream(value["gridfs_id"]).read()
+    else:
+        compressed = bytes(value["data"])
+
+    return decompress(compressed, value["encoding"]).decode("utf-8", errors="replace")
+
+
+def output_preview(value: Union[str, Dict[str, Any], None], length: int = PREVIEW_LENGTH) -> Tuple[str, bool]:
+    """
+    Return the start of a stored output value without decompressing it.
+
+    Returns:
+        Tuple of (preview text, whether the output is longer than the preview)
+    """
+    if isinstance(value, dict):
+        return value.get("preview", "")[:length], value.get("length", 0) > length
+    value = value or ""
+    return value[:length], len(value) > length
+
+
+def prepare_result_for_storage(db: Database, result: Dict[str, Any], collection_name: str = None) -> Dict[str, Any]:
+    """Return a copy of the result with its output fields encoded for storage."""
+    prepared = dict(result)
+    for field in OUTPUT_FIELDS:
+        if isinstance(prepared.get(field), str):
+            prepared[field] = encode_output(db, prepared[field], collection_name)
+    return prepared
+
+
+def remove_output_files(db: Database, cutoff_str: str) -> int:
+    """Delete GridFS output files belonging to days before the cutoff (YYYY_MM_DD)."""
+    bucket = GridFSBucket(db, bucket_name=OUTPUT_BUCKET)
+    removed = 0
+    for grid_out in bucket.find({"metadata.day": {"$lt": cutoff_str}}):
+        bucket.delete(grid_out._id)
+        removed += 1
+    return removed
@@ -0,0 +1,259 @@
+"""
+Compressed embeddings for vector search.
+
+Two quantizers shrink the normalized float32 embeddings of past days:
+
+- sq8: int8 scalar quantization, one byte per dimension (4x smaller). Each
+  dimension is mapped linearly from its trained range onto -127..127.
+- pq: product quantization. The vector is cut into `subspaces` slices and
+  each slice is replaced by the number of its nearest of 256 trained
+  centroids, one byte per slice (384 dimensions in 48 slices: 32x smaller).
+
+Scoring is asymmetric: the query stays float and is compared with the
+decoded codes without decoding them into a full matrix, so only the codes
+are read. The best `limit * rerank` candidates can then be re-scored
+exactly from the float embeddings, which touches only their rows.
+"""
+
+import math
+import os
+from typing import List, Sequence, Tuple
+
+from config import get_env, get_int
+
+DEFAULT_VECTOR_QUANTIZATION = get_env("VECTOR_QUANTIZATION", "off").lower()
+DEFAULT_PQ_SUBSPACES = get_int("VECTOR_PQ_SUBSPACES", 48)
+DEFAULT_RERANK_FACTOR = get_int("VECTOR_RERANK_FACTOR", 10)
+
+QUANTIZERS = ("sq8", "pq")
+
+# Rows decoded at a time while scoring, which bounds the temporary memory
+SCORE_CHUNK_ROWS = 16384
+
+# Rows the product quantizer's k-means runs on; more barely changes the centroids
+PQ_TRAIN_ROWS = 32768
+
+
+def kmeans(vectors, k: int, iterations: int = 15, seed: int = 0):
+    """Return k centroids of the rows of a float32 matrix (Lloyd's algorithm, squared L2)."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        # argmin ||x - c||^2 == argmax x.c - ||c||^2 / 2
+        assignment = np.argmax(vectors @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        sums = np.stack([np.bincount(assignment, weights=column, minlength=k) for column in vectors.T], axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        filled = counts > 0
+        # Empty clusters keep their previous centroid
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class ScalarQuantizer:
+    """int8 scalar quantizer: x ~ offset + scale * code."""
+
+    kind = "sq8"
+    # Snapshot rows there were when the quantizer was trained (see SnapshotStore.quantize)
+    trained_rows = 0
+
+    def __init__(self, offset, scale):
+        self.offset = offset
+        self.scale = scale
+
+    @property
+    def dimensions(self) -> int:
+        return len(self.offset)
+
+    @property
+    def code_width(self) -> int:
+        """Bytes per coded row."""
+        return len(self.offset)
+
+    @classmethod
+    def train(cls, vectors) -> "ScalarQuantizer":
+        """Fit the range of each dimension."""
+        import numpy as np
+
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        scale = (high - low) / 254
+        scale[scale == 0] = 1
+        return cls(((low + high) / 2).astype(np.float32), scale.astype(np.float32))
+
+    def encode(self, vectors):
+        """Return the int8 codes of the rows of a float matrix."""
+        import numpy as np
+
+        return np.clip(np.rint((vectors - self.offset) / self.scale), -127, 127).astype(np.int8)
+
+    def decode(self, codes):
+        """Return the approximate float32 rows of codes."""
+        return self.offset + self.scale * codes.astype("float32")
+
+    def scores(self, codes, query):
+        """Return the approximate inner product of the query with every coded row."""
+        import numpy as np
+
+        weights = query * self.scale
+        base = float(query @ self.offset)
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK_ROWS):
+            chunk = codes[start:start + SCORE_CHUNK_ROWS]
+            scores[start:start + len(chunk)] = chunk.astype(np.float32) @ weights + base
+        return scores
+
+    def arrays(self):
+        return {"offset": self.offset, "scale": self.scale}
+
+
+class ProductQuantizer:
+    """Product quantizer with 256 centroids per subspace."""
+
+    kind = "pq"
+    trained_rows = 0
+
+    def __init__(self, centroids):
+        """
+        Args:
+            centroids: float32 array of shape (subspaces, 256, dimensions / subspaces)
+        """
+        self.centroids = centroids
+
+    @property
+    def subspaces(self) -> int:
+        return self.centroids.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self.centroids.shape[0] * self.centroids.shape[2]
+
+    @property
+    def code_width(self) -> int:
+        """Bytes per coded row."""
+        return self.centroids.shape[0]
+
+    @classmethod
+    def train(cls, vectors, subspaces: int = None) -> "ProductQuantizer":
+        """
+        Fit the centroids of each subspace.
+
+        The number of subspaces is reduced to a divisor of the dimensions if needed.
+        """
+        import numpy as np
+
+        if len(vectors) > PQ_TRAIN_ROWS:
+            vectors = vectors[np.random.default_rng(0).choice(len(vectors), size=PQ_TRAIN_ROWS, replace=False)]
+        subspaces = math.gcd(vectors.shape[1], subspaces or DEFAULT_PQ_SUBSPACES)
+        k = min(256, len(vectors))
+        width = vectors.shape[1] // subspaces
+        return cls(np.stack([
+            kmeans(np.ascontiguousarray(vectors[:, j * width:(j + 1) * width]), k, seed=j)
+            for j in range(subspaces)
+        ]))
+
+    def _slices(self, vectors):
+        return vectors.reshape(len(vectors), self.subspaces, -1)
+
+    def encode(self, vectors):
+        """Return the uint8 centroid numbers of the rows of a float matrix."""
+        import numpy as np
+
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), SCORE_CHUNK_ROWS):
+            chunk = self._slices(vectors[start:start + SCORE_CHUNK_ROWS])
+            for j in range(self.subspaces):
+                centroids = self.centroids[j]
+                codes[start:start + len(chunk), j] = np.argmax(chunk[:, j] @ centroids.T - 0.5 * (centroids ** 2).sum(axis=1), axis=1)
+        return codes
+
+    def decode(self, codes):
+        """Return the approximate float32 rows of codes."""
+        import numpy as np
+
+        return self.centroids[np.arange(self.subspaces), codes].reshape(len(codes), -1)
+
+    def scores(self, codes, query):
+        """Return the approximate inner product of the query with every coded row."""
+        import numpy as np
+
+        # Inner product of each query slice with each centroid of its subspace
+        table = np.einsum("jd,jkd->jk", self._slices(query[None, :])[0], self.centroids).astype(np.float32)
+        scores = np.zeros(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK_ROWS):
+            chunk = codes[start:start + SCORE_CHUNK_ROWS]
+            chunk_scores = scores[start:start + len(chunk)]
+            for j in range(self.subspaces):
+                chunk_scores += table[j][chunk[:, j]]
+        return scores
+
+    def arrays(self):
+        return {"centroids": self.centroids}
+
+
+def train_quantizer(kind: str, vectors):
+    """Train a quantizer of the given kind on normalized float32 rows."""
+    if kind == "sq8":
+        return ScalarQuantizer.train(vectors)
+    if kind == "pq":
+        return ProductQuantizer.train(vectors)
+    raise ValueError(f"Unsupported vector quantization: {kind}")
+
+
+def save_quantizer(quantizer, path: str):
+    """Write a quantizer to an .npz file, replacing it atomically."""
+    import numpy as np
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        np.savez(fh, trained_rows=quantizer.trained_rows, **quantizer.arrays())
+    os.replace(tmp_path, path)
+
+
+def load_quantizer(kind: str, path: str):
+    """Read a quantizer written by save_quantizer."""
+    import numpy as np
+
+    with np.load(path) as arrays:
+        if kind == "sq8":
+            quantizer = ScalarQuantizer(arrays["offset"], arrays["scale"])
+        else:
+            quantizer = ProductQuantizer(arrays["centroids"])
+        if "trained_rows" in arrays.files:
+            quantizer.trained_rows = int(arrays["trained_rows"])
+    return quantizer
+
+
+class QuantizedMatrix:
+    """
+    Coded embeddings searched like an EmbeddingMatrix.
+
+    With the float rows given as `exact`, the best `k * rerank` candidates by
+    approximate score are re-scored exactly before the top k are returned.
+    """
+
+    def __init__(self, codes, quantizer, refs, exact=None, rerank: int = None):
+        self.codes = codes
+        self.quantizer = quantizer
+        self.refs = refs
+        self.exact = exact
+        self.rerank = DEFAULT_RERANK_FACTOR if rerank is None else rerank
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    def search(self, query: Sequence[float], k: int) -> List[Tuple[Tuple, float]]:
+        """Return the k rows most similar to the query, best first."""
+        from vector_engine import normalize, top_k
+
+        query = normalize(query)
+        if query is None or not len(self) or self.quantizer.dimensions != len(query):
+            return []
+        scores = self.quantizer.scores(self.codes, query)
+        if self.exact is None or self.rerank <= 1:
+            return [(self.refs[i], float(scores[i])) for i in top_k(scores, k)]
+
+        candidates = top_k(scores, k * self.rerank)
+        candidates.sort()  # Read the float rows in file order
+        exact = self.exact[candidates] @ query
+        return [(self.refs[candidates[i]], float(exact[i])) for i in top_k(exact, k)]
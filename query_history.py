@@ -2,62 +2,117 @@
 
 import argparse
 import sys
-import os
 from typing import Dict, Any, List
-from dotenv import load_dotenv
+from pymongo.database import Database
 
-from db import connect_to_mongodb, query_commands, build_query_filters, clean_old_collections
+from config import get_env, get_int
+from bson.errors import InvalidId
+from pymongo.errors import OperationFailure
 
-# Load environment variables from .env file
-load_dotenv()
+from db import (
+    connect_to_mongodb, list_commands, list_projection, page_commands, get_command,
+    build_query_filters, clean_old_collections, SEARCH_MODE,
+)
+from output_storage import decode_output, output_preview
 
+# Server error code for a $text query on a collection without a text index
+INDEX_NOT_FOUND = 27
 
-def display_results(results: List[Dict[str, Any]]):
-    """Display the query results in a readable format."""
+
+def display_results(results: List[Dict[str, Any]], db: Database = None, start: int = 1):
+    """
+    Display the query results in a readable format.
+
+    Compressed output is only decoded for the fields that are printed; the
+    database is needed to read output that was spilled to GridFS. Results from
+    list_commands carry only a preview of each output plus its full length in
+    stdout_length/stderr_length, which marks the preview as truncated.
+    Results are numbered from `start`.
+    """
     if not results:
         print("No matching commands found.")
         return
     
-    for i, result in enumerate(results, 1):
+    for i, result in enumerate(results, start):
         print(f"[{i}] Command: {result['command']}")
+        if "_id" in result:
+            print(f"    ID: {result['_id']}")
         print(f"    Executed at: {result['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"    Exit code: {result['exit_code']}")
         print(f"    Execution time: {result['execution_time_seconds']:.2f} seconds")
+        if "score" in result:
+            print(f"    Relevance: {result['score']:.2f}")
         
         # Display AI analysis if available
         if "ai_category" in result and "ai_description" in result:
             print(f"    Category: {result['ai_category']}")
             print(f"    Description: {result['ai_description']}")
         
-        if result["stdout"] and len(result["stdout"]) > 100:
-            print(f"    Output: {result['stdout'][:100]}...")
-        elif result["stdout"]:
-            print(f"    Output: {result['stdout']}")
+        if result["stdout"]:
+            preview, truncated = output_preview(result["stdout"], 100)
+            truncated = truncated or result.get("stdout_length", 0) > len(preview)
+            print(f"    Output: {preview}..." if truncated else f"    Output: {preview}")
             
         if result["stderr"]:
-            print(f"    Error: {result['stderr']}")
+            error = decode_output(result["stderr"], db)
+            truncated = result.get("stderr_length", 0) > len(error)
+            print(f"    Error: {error}..." if truncated else f"    Error: {error}")
             
         print()
 
 
+def display_record(record: Dict[str, Any], db: Database = None):
+    """Display one full record, including its complete output."""
+    print(f"Command: {record['command']}")
+    print(f"ID: {record['_id']}")
+    print(f"Executed at: {record['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}")
+    if record.get("dir"):
+        print(f"Directory: {record['dir']}")
+    print(f"Exit code: {record['exit_code']}")
+    print(f"Execution time: {record['execution_time_seconds']:.2f} seconds")
+    if "ai_category" in record and "ai_description" in record:
+        print(f"Category: {record['ai_category']}")
+        print(f"Description: {record['ai_description']}")
+    for label, field in (("Output", "stdout"), ("Error", "stderr")):
+        if record.get(field):
+            print(f"\n{label}:")
+            print(decode_output(record[field], db))
+
+
 def main():
     parser = argparse.ArgumentParser(description="Query command history from MongoDB")
-    parser.add_argument("--host", default=os.environ.get("MONGODB_HOST", "localhost"), help="MongoDB host (default: localhost or $MONGODB_HOST)")
-    parser.add_argument("--port", type=int, default=int(os.environ.get("MONGODB_PORT", 27017)), help="MongoDB port (default: 27017 or $MONGODB_PORT)")
-    parser.add_argument("--db", default=os.environ.get("MONGODB_DB", "terminal_logger"), help="MongoDB database name (default: terminal_logger or $MONGODB_DB)")
+    parser.add_argument("--host", default=get_env("MONGODB_HOST", "localhost"), help="MongoDB host (default: localhost or $MONGODB_HOST)")
+    parser.add_argument("--port", type=int, default=get_int("MONGODB_PORT", 27017), help="MongoDB port (default: 27017 or $MONGODB_PORT)")
+    parser.add_argument("--db", default=get_env("MONGODB_DB", "terminal_logger"), help="MongoDB database name (default: terminal_logger or $MONGODB_DB)")
     parser.add_argument("--limit", type=int, default=10, help="Maximum number of results to show (default: 10)")
-    parser.add_argument("--search", help="Search for commands containing this text")
-    parser.add_argument("--days", type=int, default=int(os.environ.get("RETENTION_DAYS", 30)), help="Search commands from the last N days (default: 30 or $RETENTION_DAYS)")
+    parser.add_argument("--search", help="Search commands and AI descriptions for these words, most relevant first")
+    parser.add_argument("--regex", action="store_true", default=SEARCH_MODE == "regex", help="Match --search as a case-insensitive substring of the command instead (unindexed; default with SEARCH_MODE=regex)")
+    parser.add_argument("--days", type=int, default=get_int("RETENTION_DAYS", 30), help="Search commands from the last N days (default: 30 or $RETENTION_DAYS)")
     parser.add_argument("--success", action="store_true", help="Show only successful commands (exit code 0)")
     parser.add_argument("--failed", action="store_true", help="Show only failed commands (non-zero exit code)")
     parser.add_argument("--category", help="Filter commands by AI-assigned category")
     parser.add_argument("--clean", action="store_true", help="Clean old collections before querying")
-    parser.add_argument("--retention", type=int, default=int(os.environ.get("RETENTION_DAYS", 30)), help="Number of days to retain command history (default: 30 or $RETENTION_DAYS)")
+    parser.add_argument("--retention", type=int, default=get_int("RETENTION_DAYS", 30), help="Number of days to retain command history (default: 30 or $RETENTION_DAYS)")
+    parser.add_argument("--page", type=int, default=1, help="Show this page of --limit results, newest first (default: 1)")
+    parser.add_argument("--after", metavar="TOKEN", help="Continue listing after the page that printed this token")
+    parser.add_argument("--show", metavar="ID", help="Show the full record of the command with this ID, including its complete output")
     
     args = parser.parse_args()
     
     # Connect to MongoDB
     db = connect_to_mongodb(args.host, args.port, args.db)
+
+    if args.show:
+        try:
+            record = get_command(db, args.show)
+        except InvalidId:
+            print(f"Error: '{args.show}' is not a valid command ID", file=sys.stderr)
+            return 1
+        if record is None:
+            print(f"Error: no command with ID {args.show}", file=sys.stderr)
+            return 1
+        display_record(record, db=db)
+        return 0
     
     # Clean old collections if requested
     if args.clean:
@@ -71,13 +126,44 @@ def main():
         None,  # Days filter is now handled by query_commands 
         args.success, 
         args.failed,
-        args.category
+        args.category,
+        text_search=not args.regex
     )
     
+    # A text search is ranked by relevance, which the newest-first page tokens cannot continue
+    ranked = bool(args.search) and not args.regex
+    if ranked and (args.after is not None or args.page > 1):
+        print("Error: --page and --after list matches newest first and cannot continue a search ranked by "
+              "relevance; add --regex to page through the matches", file=sys.stderr)
+        return 1
+
+    def fetch(filters):
+        if ranked:
+            return list_commands(db, filters, args.limit, args.days), None
+        return page_commands(db, filters, args.limit, args.days, list_projection(), args.after, args.page)
+
     # Query and display results
-    results = query_commands(db, filters, args.limit, args.days)
-    display_results(results)
+    try:
+        results, next_token = fetch(filters)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+        print("Warning: some collections have no text index yet; run 'maintain-db --repair-indexes'. "
+              "Falling back to --regex.", file=sys.stderr)
+        filters = build_query_filters(args.search, None, args.success, args.failed, args.category)
+        results, next_token = fetch(filters)
+
+    if ranked:
+        display_results(results, db=db)
+    else:
+        display_results(results, db=db, start=(args.page - 1) * args.limit + 1)
+        if next_token:
+            print(f"Next page: --after {next_token}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
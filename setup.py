@@ -30,7 +30,14 @@ setup(
             "terminal-logger=terminal_logger:main",
             "query-history=query_history:main",
             "maintain-db=maintain_db:main",
+            "migrate-history=migrate_history:main",
             "vector-query=vector_query:main",
+            "ingest-daemon=ingest_daemon:main",
+            "embedding-server=embedding_server:main",
+            "analysis-cache=analysis_cache:main",
+            "neighbour-classifier=neighbour_classifier:main",
+            "history-stats=history_stats:main",
+            "vector-index=ann_index:main",
         ],
     },
     tests_require=[
@@ -5,40 +5,139 @@ import datetime
 import os
 import subprocess
 import sys
-from typing import Dict, Any
-from dotenv import load_dotenv
+import threading
+from typing import Dict, Any, Tuple
 
+from config import get_env, get_int, get_bool
 from db import connect_to_mongodb, store_command_result, clean_old_collections
-from ai_integration import analyze_command
+from ai_integration import categorize_command
 from vector_search import add_vector_to_result
+from ingest_daemon import submit_result
 
-# Load environment variables from .env file
-load_dotenv()
+DEFAULT_CAPTURE_HEAD_BYTES = get_int("CAPTURE_HEAD_BYTES", 65536)
+DEFAULT_CAPTURE_TAIL_BYTES = get_int("CAPTURE_TAIL_BYTES", 65536)
+STREAM_CHUNK_SIZE = 65536
 
-def execute_command(command: str,original_dir: str = None) -> Dict[str, Any]:
-    """Execute the given command and return the result details."""
+
+class BoundedCapture:
+    """Keep the first and last bytes of a stream, dropping everything in between."""
+
+    def __init__(self, head_bytes: int = None, tail_bytes: int = None):
+        self.head_bytes = DEFAULT_CAPTURE_HEAD_BYTES if head_bytes is None else head_bytes
+        self.tail_bytes = DEFAULT_CAPTURE_TAIL_BYTES if tail_bytes is None else tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    def write(self, chunk: bytes):
+        """Add a chunk of output to the capture."""
+        self.total_bytes += len(chunk)
+
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+
+        if chunk and self.tail_bytes > 0:
+            self.tail += chunk
+            overflow = len(self.tail) - self.tail_bytes
+            if overflow > 0:
+                del self.tail[:overflow]
+
+    @property
+    def dropped_bytes(self) -> int:
+        """Number of bytes discarded from the middle of the stream."""
+        return self.total_bytes - len(self.head) - len(self.tail)
+
+    def getvalue(self) -> str:
+        """Return the captured text, marking where output was dropped."""
+        text = self.head.decode("utf-8", errors="replace")
+        if self.dropped_bytes:
+            text += f"\n... [{self.dropped_bytes} bytes truncated] ...\n"
+        return text + self.tail.decode("utf-8", errors="replace")
+
+
+def _pump(fd: int, terminal, capture: BoundedCapture):
+    """Copy a pipe to the terminal as data arrives, keeping a bounded copy."""
+    buffer = getattr(terminal, "buffer", None)
+    while True:
+        chunk = os.read(fd, STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        if buffer is not None:
+            buffer.write(chunk)
+        else:
+            terminal.write(chunk.decode("utf-8", errors="replace"))
+        terminal.flush()
+        capture.write(chunk)
+
+
+def _run_streaming(command: str, execution_dir: str) -> Tuple[int, str, str]:
+    """Run a command, teeing stdout and stderr to the terminal and into bounded captures."""
+    stdout_capture = BoundedCapture()
+    stderr_capture = BoundedCapture()
+
+    process = subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        cwd=execution_dir,
+    )
+    pumps = [
+        threading.Thread(target=_pump, args=(process.stdout.fileno(), sys.stdout, stdout_capture), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr.fileno(), sys.stderr, stderr_capture), daemon=True),
+    ]
+    for pump in pumps:
+        pump.start()
+
+    try:
+        returncode = process.wait()
+    except KeyboardInterrupt:
+        # The child received the same SIGINT; let it finish and record its exit code
+        returncode = process.wait()
+
+    for pump in pumps:
+        pump.join()
+    process.stdout.close()
+    process.stderr.close()
+
+    return returncode, stdout_capture.getvalue(), stderr_capture.getvalue()
+
+
+def execute_command(command: str,original_dir: str = None, stream: bool = False) -> Dict[str, Any]:
+    """
+    Execute the given command and return the result details.
+
+    With stream=True, stdout and stderr are passed through to the terminal as
+    they arrive and only a bounded head and tail of each is kept in the result.
+    """
     start_time = datetime.datetime.now()
     execution_dir = original_dir if original_dir else os.getcwd()
     
     try:
-        # Execute the command and capture output
-        process = subprocess.run(
-            command,
-            shell=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            cwd=execution_dir,
-        )
+        if stream:
+            returncode, stdout, stderr = _run_streaming(command, execution_dir)
+        else:
+            # Execute the command and capture output
+            process = subprocess.run(
+                command,
+                shell=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                cwd=execution_dir,
+            )
+            returncode, stdout, stderr = process.returncode, process.stdout, process.stderr
         
         end_time = datetime.datetime.now()
         execution_time = (end_time - start_time).total_seconds()
         
         return {
             "command": command,
-            "exit_code": process.returncode,
-            "stdout": process.stdout,
-            "stderr": process.stderr,
+            "exit_code": returncode,
+            "stdout": stdout,
+            "stderr": stderr,
             "execution_time_seconds": execution_time,
             "timestamp": start_time,
         }
@@ -58,8 +157,10 @@ def execute_command(command: str,original_dir: str = None) -> Dict[str, Any]:
 
 def main():
     # Get default values for AI and retention settings (DB settings now come from db.py)
-    default_ai_model = os.environ.get("AI_MODEL", "")
-    default_retention = int(os.environ.get("RETENTION_DAYS", "30"))
+    default_ai_model = get_env("AI_MODEL", "")
+    default_retention = get_int("RETENTION_DAYS", 30)
+    default_sync = get_env("INGEST_MODE", "daemon").lower() == "sync"
+    default_no_stream = not get_bool("STREAM_OUTPUT", True)
 
     parser = argparse.ArgumentParser(description="Execute terminal commands and log them to MongoDB")
     parser.add_argument("command", help="The command to execute")
@@ -69,13 +170,17 @@ def main():
     parser.add_argument("--no-ai", action="store_true", help="Skip AI analysis of the command")
     parser.add_argument("--retention", type=int, default=default_retention, help=f"Number of days to retain command history (default: {default_retention})")
     parser.add_argument("--clean", action="store_true", help="Clean old collections before executing the command")
+    parser.add_argument("--sync", action="store_true", default=default_sync, help="Analyze and store the result before exiting instead of handing it to the ingestion daemon (default: $INGEST_MODE=sync)")
+    parser.add_argument("--no-stream", action="store_true", default=default_no_stream, help="Capture all output and print it after the command exits instead of streaming it (default: $STREAM_OUTPUT=0)")
     
     args = parser.parse_args()
     
-    # Connect to MongoDB (using only environment variables from db.py)
-    db = connect_to_mongodb()
+    # Only the synchronous path and cleaning need a database connection
+    db = None
+    if args.sync or args.clean:
+        # Connect to MongoDB (using only environment variables from db.py)
+        db = connect_to_mongodb()
 
-    
     # Clean old collections if requested
     if args.clean:
         removed = clean_old_collections(db, args.retention)
@@ -83,36 +188,42 @@ def main():
             print(f"Cleaned {len(removed)} old collections: {', '.join(removed)}", file=sys.stderr)
     
     # Execute the command
-    result = execute_command(args.command, args.original_dir)
+    result = execute_command(args.command, args.original_dir, stream=not args.no_stream)
     result["dir"] = args.original_dir if args.original_dir else os.getcwd()
-    # If AI analysis is enabled, analyze the command
-    if not args.no_ai:
-        try:
-            print("Analyzing command with AI...", file=sys.stderr)
-            category, description = analyze_command(args.command, args.ai_model)
-            result["ai_category"] = category
-            result["ai_description"] = description
-            print(f"Category: {category}", file=sys.stderr)
-            print(f"Description: {description}", file=sys.stderr)
-            print("---", file=sys.stderr)
-        except Exception as e:
-            print(f"AI analysis failed: {e}", file=sys.stderr)
-            result["ai_category"] = "error"
-            result["ai_description"] = f"AI analysis failed: {str(e)}"
+
+    # Streamed output has already reached the terminal
+    if args.no_stream:
+        if result["stdout"]:
+            print(result["stdout"], end="")
+        if result["stderr"]:
+            print(result["stderr"], file=sys.stderr, end="")
+
+    if args.sync:
+        # If AI analysis is enabled, analyze the command
+        if not args.no_ai:
+            try:
+                print("Analyzing command with AI...", file=sys.stderr)
+                category, description = categorize_command(args.command, args.ai_model)
+                result["ai_category"] = category
+                result["ai_description"] = description
+                print(f"Category: {category}", file=sys.stderr)
+                print(f"Description: {description}", file=sys.stderr)
+                print("---", file=sys.stderr)
+            except Exception as e:
+                print(f"AI analysis failed: {e}", file=sys.stderr)
+                result["ai_category"] = "error"
+                result["ai_description"] = f"AI analysis failed: {str(e)}"
+        else:
+            result["ai_category"] = "uncategorized"
+            result["ai_description"] = "AI analysis skipped"
+
+        result = add_vector_to_result(result)
+
+        # Store the result in MongoDB
+        record_id = store_command_result(db, result)
     else:
-        result["ai_category"] = "uncategorized"
-        result["ai_description"] = "AI analysis skipped"
-        
-    result = add_vector_to_result(result)
-    
-    # Print command output to terminal
-    if result["stdout"]:
-        print(result["stdout"], end="")
-    if result["stderr"]:
-        print(result["stderr"], file=sys.stderr, end="")
-    
-    # Store the result in MongoDB
-    record_id = store_command_result(db, result)
+        # Hand analysis, embedding and storage off to the ingestion daemon
+        submit_result(result, args.ai_model, args.no_ai)
     
     # Exit with the same code as the executed command
     sys.exit(result["exit_code"])
@@ -5,28 +5,54 @@ from unittest.mock import MagicMock, patch
 import sys
 import os
 import json
+import shutil
+import tempfile
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import ai_integration
+from analysis_cache import AnalysisCache
+from circuit_breaker import CircuitBreaker
+from command_rules import Classification, RuleClassifier
+
+
+def stream_response(text, status_code=200, chunk_size=8):
+    """Build a mock streaming Ollama response that yields text in small chunks."""
+    response = MagicMock()
+    response.status_code = status_code
+    lines = [
+        json.dumps({"response": text[i:i + chunk_size], "done": False}).encode()
+        for i in range(0, len(text), chunk_size)
+    ]
+    lines.append(json.dumps({"response": "", "done": True}).encode())
+    response.iter_lines.return_value = iter(lines)
+    return response
 
 
 class TestAIIntegration(unittest.TestCase):
     """Test cases for AI integration."""
 
-    @patch('requests.post')
-    def test_analyze_command_success(self, mock_post):
+    def setUp(self):
+        """Use a pooled session mock and an in-memory circuit breaker."""
+        self.session = MagicMock()
+        self.mock_post = self.session.post
+        patchers = [
+            patch('ai_integration.get_session', return_value=self.session),
+            patch('ai_integration._circuit_breaker', CircuitBreaker(3, 60)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_analyze_command_success(self):
         """Test successful command analysis."""
         # Arrange
         command = "ls -la"
         
         # Mock the API response
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            'response': '{"category": "file_management", "description": "List all files with detailed information"}'
-        }
-        mock_post.return_value = mock_response
+        self.mock_post.return_value = stream_response(
+            '{"category": "file_management", "description": "List all files with detailed information"}'
+        )
         
         # Act
         category, description = ai_integration.analyze_command(command, "test_model")
@@ -34,22 +60,19 @@ class TestAIIntegration(unittest.TestCase):
         # Assert
         self.assertEqual("file_management", category)
         self.assertEqual("List all files with detailed information", description)
-        mock_post.assert_called_once()
-        args, kwargs = mock_post.call_args
+        self.mock_post.assert_called_once()
+        args, kwargs = self.mock_post.call_args
         self.assertEqual(ai_integration.OLLAMA_API_URL, args[0])
         self.assertEqual("test_model", kwargs["json"]["model"])
         self.assertEqual(command, kwargs["json"]["prompt"].strip().split("\n")[-1].replace("Command: ", ""))
 
-    @patch('requests.post')
-    def test_analyze_command_api_error(self, mock_post):
+    def test_analyze_command_api_error(self):
         """Test handling API errors."""
         # Arrange
         command = "ls -la"
         
         # Mock the API response for an error
-        mock_response = MagicMock()
-        mock_response.status_code = 500
-        mock_post.return_value = mock_response
+        self.mock_post.return_value = stream_response("", status_code=500)
         
         # Act
         category, description = ai_integration.analyze_command(command)
@@ -58,19 +81,15 @@ class TestAIIntegration(unittest.TestCase):
         self.assertEqual("uncategorized", category)
         self.assertIn("Failed to categorize", description)
 
-    @patch('requests.post')
-    def test_analyze_command_json_error(self, mock_post):
+    def test_analyze_command_json_error(self):
         """Test handling JSON parsing errors."""
         # Arrange
         command = "ls -la"
         
         # Mock the API response with invalid JSON
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
-            'response': 'This is not JSON'
-        }
-        mock_post.return_value = mock_response
+        self.mock_post.return_value = stream_response(
+            'This is not JSON'
+        )
         
         # Act
         category, description = ai_integration.analyze_command(command)
@@ -79,14 +98,13 @@ class TestAIIntegration(unittest.TestCase):
         self.assertEqual("uncategorized", category)
         self.assertIn("Response format error", description)
 
-    @patch('requests.post')
-    def test_analyze_command_connection_error(self, mock_post):
+    def test_analyze_command_connection_error(self):
         """Test handling connection errors."""
         # Arrange
         command = "ls -la"
         
         # Mock a connection error
-        mock_post.side_effect = Exception("Connection error")
+        self.mock_post.side_effect = Exception("Connection error")
         
         # Act
         category, description = ai_integration.analyze_command(command)
@@ -95,6 +113,226 @@ class TestAIIntegration(unittest.TestCase):
         self.assertEqual("uncategorized", category)
         self.assertIn("Error analyzing command", description)
 
+    def test_analyze_command_stops_at_complete_json(self):
+        """Test that streaming stops once a complete JSON object has arrived."""
+        # Arrange
+        response = stream_response('{"category": "network", "description": "Fetch a URL"} And some more rambling text')
+        self.mock_post.return_value = response
+
+        # Act
+        category, description = ai_integration.analyze_command("curl example.com")
+
+        # Assert
+        self.assertEqual(("network", "Fetch a URL"), (category, description))
+        kwargs = self.mock_post.call_args[1]
+        self.assertTrue(kwargs["json"]["stream"])
+        self.assertTrue(kwargs["stream"])
+        self.assertEqual((ai_integration.OLLAMA_CONNECT_TIMEOUT, ai_integration.OLLAMA_READ_TIMEOUT), kwargs["timeout"])
+        # The rest of the stream was never read
+        self.assertGreater(len(list(response.iter_lines.return_value)), 0)
+        response.close.assert_called_once()
+
+    def test_circuit_breaker_skips_ollama(self):
+        """Test that repeated failures skip Ollama for the cool-down period."""
+        # Arrange
+        self.mock_post.side_effect = Exception("Connection refused")
+
+        # Act
+        for _ in range(3):
+            ai_integration.analyze_command("ls")
+        category, description = ai_integration.analyze_command("ls")
+
+        # Assert
+        self.assertEqual(3, self.mock_post.call_count)
+        self.assertEqual("uncategorized", category)
+        self.assertIn("Ollama is unavailable", description)
+
+    def test_analyze_commands_batch(self):
+        """Test analyzing several commands in a single request."""
+        # Arrange
+        self.mock_post.return_value = stream_response(
+            'Here you go: [{"index": 1, "category": "network", "description": "Fetch a URL"}, '
+            '{"index": 0, "category": "file_management", "description": "List files"}]'
+        )
+        
+        # Act
+        results = ai_integration.analyze_commands(["ls -la", "curl example.com"], "test_model")
+        
+        # Assert
+        self.assertEqual([("file_management", "List files"), ("network", "Fetch a URL")], results)
+        self.mock_post.assert_called_once()
+        prompt = self.mock_post.call_args[1]["json"]["prompt"]
+        self.assertIn("0: ls -la", prompt)
+        self.assertIn("1: curl example.com", prompt)
+
+    @patch('ai_integration.analyze_command')
+    def test_analyze_commands_partial_response(self, mock_analyze):
+        """Test that commands missing from a truncated response are analyzed individually."""
+        # Arrange
+        self.mock_post.return_value = stream_response(
+            '[{"index": 0, "category": "file_management", "description": "List files"}, {"index": 1, "categ'
+        )
+        mock_analyze.return_value = ("network", "Fetch a URL")
+        
+        # Act
+        results = ai_integration.analyze_commands(["ls -la", "curl example.com"], "test_model")
+        
+        # Assert
+        self.assertEqual([("file_management", "List files"), ("network", "Fetch a URL")], results)
+        mock_analyze.assert_called_once_with("curl example.com", "test_model")
+
+    @patch('ai_integration.analyze_command')
+    def test_analyze_commands_request_failure(self, mock_analyze):
+        """Test falling back to per-command analysis when the batch request fails."""
+        # Arrange
+        self.mock_post.side_effect = Exception("Connection error")
+        mock_analyze.return_value = ("uncategorized", "Failed to connect to Ollama API")
+        
+        # Act
+        results = ai_integration.analyze_commands(["ls", "pwd", "make"], batch_size=2)
+        
+        # Assert
+        self.assertEqual(3, len(results))
+        self.assertEqual(2, self.mock_post.call_count)
+        self.assertEqual(3, mock_analyze.call_count)
+
+    def test_parse_batch_response_by_position(self):
+        """Test mapping objects without an index by their position."""
+        # Act
+        parsed = ai_integration._parse_batch_response(
+            '[{"category": "a", "description": "x"}, {"category": "b", "description": "y"}]', 2
+        )
+        
+        # Assert
+        self.assertEqual({0: ("a", "x"), 1: ("b", "y")}, parsed)
+
+
+class TestCategorizeCommand(unittest.TestCase):
+    """Test cases for cached command categorization."""
+
+    def setUp(self):
+        """Create a cache in a scratch directory and an in-memory circuit breaker."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = AnalysisCache(os.path.join(self.tmp_dir, "cache.sqlite3"))
+        self.breaker = CircuitBreaker(3, 60)
+        patcher = patch('ai_integration._circuit_breaker', self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    @patch('ai_integration.analyze_command')
+    def test_cache_hit_skips_ollama(self, mock_analyze):
+        """Test that commands with the same template are only analyzed once."""
+        # Arrange
+        mock_analyze.return_value = ("file management", "List files in a directory")
+
+        # Act
+        first = ai_integration.categorize_command("ls -la /tmp", "test_model", cache=self.cache, stages=[])
+        second = ai_integration.categorize_command("ls -la /home/user", "test_model", cache=self.cache, stages=[])
+
+        # Assert
+        self.assertEqual(first, second)
+        mock_analyze.assert_called_once_with("ls -la /tmp", "test_model")
+        counters = self.cache.counters()
+        self.assertEqual(1, counters["cache.hit"])
+        self.assertEqual(1, counters["cache.miss"])
+        self.assertEqual(1, counters["llm.calls"])
+
+    @patch('ai_integration.analyze_command')
+    def test_failed_analysis_not_cached(self, mock_analyze):
+        """Test that failures are retried rather than cached."""
+        # Arrange
+        mock_analyze.return_value = ("uncategorized", "Failed to connect to Ollama API")
+
+        # Act
+        ai_integration.categorize_command("git status", cache=self.cache, stages=[])
+        ai_integration.categorize_command("git status", cache=self.cache, stages=[])
+
+        # Assert
+        self.assertEqual(2, mock_analyze.call_count)
+        self.assertEqual(0, len(self.cache))
+
+    @patch('ai_integration.analyze_command')
+    def test_open_circuit_skips_ollama(self, mock_analyze):
+        """Test that no command is sent to Ollama while the circuit is open."""
+        # Arrange
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        # Act
+        category, _ = ai_integration.categorize_command("cmake ..", cache=self.cache, stages=[])
+
+        # Assert
+        self.assertEqual("uncategorized", category)
+        mock_analyze.assert_not_called()
+        self.assertEqual(1, self.cache.counters()["llm.skipped"])
+
+    @patch('ai_integration.analyze_command')
+    def test_rules_stage_skips_ollama(self, mock_analyze):
+        """Test that a confident rule classification answers without the cache or Ollama."""
+        # Act
+        category, description = ai_integration.categorize_command(
+            "sudo docker ps -a", cache=self.cache, stages=[RuleClassifier()]
+        )
+
+        # Assert
+        self.assertEqual("containers", category)
+        self.assertEqual("Lists containers or images.", description)
+        mock_analyze.assert_not_called()
+        self.assertEqual({"rules.hit": 1}, self.cache.counters())
+
+    @patch('ai_integration.analyze_command')
+    def test_low_confidence_falls_through(self, mock_analyze):
+        """Test that stages below the confidence threshold fall through to Ollama."""
+        # Arrange
+        mock_analyze.return_value = ("build", "Builds the project")
+        unsure = MagicMock(return_value=Classification("file management", "Unsure", 0.1, "unsure"))
+        unsure.name = "unsure"
+
+        # Act
+        category, _ = ai_integration.categorize_command("make -j8", cache=self.cache, stages=[unsure])
+
+        # Assert
+        self.assertEqual("build", category)
+        mock_analyze.assert_called_once()
+        self.assertEqual(1, self.cache.counters()["unsure.miss"])
+
+    @patch('ai_integration.analyze_command')
+    def test_stages_observe_ollama_answers(self, mock_analyze):
+        """Test that stages with an observe hook are told what Ollama answered."""
+        # Arrange
+        mock_analyze.return_value = ("build", "Builds the project")
+        shadow = MagicMock(return_value=None)
+        shadow.name = "shadow"
+
+        # Act
+        ai_integration.categorize_command("make -j8", cache=self.cache, stages=[shadow])
+
+        # Assert
+        shadow.observe.assert_called_once_with("make -j8", "build", self.cache)
+
+    @patch('ai_integration.analyze_commands')
+    def test_categorize_commands_batches_misses(self, mock_analyze_commands):
+        """Test that only commands missed by the rules and cache are sent to Ollama, together."""
+        # Arrange
+        self.cache.put("make -j8", "build", "Builds the project")
+        mock_analyze_commands.return_value = [("build", "Runs CMake"), ("testing", "Runs the tests")]
+
+        # Act
+        results = ai_integration.categorize_commands(
+            ["git status", "make -j8", "cmake ..", "pytest -q"], cache=self.cache, stages=[RuleClassifier()]
+        )
+
+        # Assert
+        self.assertEqual("version control", results[0][0])
+        self.assertEqual(("build", "Builds the project"), results[1])
+        self.assertEqual([("build", "Runs CMake"), ("testing", "Runs the tests")], results[2:])
+        mock_analyze_commands.assert_called_once_with(["cmake ..", "pytest -q"], None)
+        self.assertEqual(2, self.cache.counters()["llm.calls"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+"""Tests for the analysis cache module."""
+
+import unittest
+from unittest.mock import patch
+import shutil
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import analysis_cache
+
+
+class TestAnalysisCache(unittest.TestCase):
+    """Test cases for the analysis cache."""
+
+    def setUp(self):
+        """Create a cache in a scratch directory."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "cache.sqlite3")
+        self.cache = analysis_cache.AnalysisCache(self.path, max_entries=3, ttl_days=1)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_get_and_put(self):
+        """Test hits and misses are counted."""
+        # Act
+        missing = self.cache.get("git status")
+        self.cache.put("git status", "version control", "Show the working tree status")
+        found = self.cache.get("git status")
+
+        # Assert
+        self.assertIsNone(missing)
+        self.assertEqual(("version control", "Show the working tree status"), found)
+        self.assertEqual({"cache.hit": 1, "cache.miss": 1}, self.cache.counters())
+
+    def test_persistent_across_instances(self):
+        """Test that entries are shared through the database file."""
+        # Arrange
+        self.cache.put("ls -la <path>", "file management", "List files")
+
+        # Act
+        other = analysis_cache.AnalysisCache(self.path)
+        try:
+            found = other.get("ls -la <path>")
+        finally:
+            other.close()
+
+        # Assert
+        self.assertEqual(("file management", "List files"), found)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        # Arrange
+        with patch('analysis_cache.time.time') as mock_time:
+            for i, template in enumerate(["a", "b", "c"]):
+                mock_time.return_value = 1000 + i
+                self.cache.put(template, "category", template)
+            mock_time.return_value = 1010
+            self.cache.get("a")
+
+            # Act
+            mock_time.return_value = 1020
+            self.cache.put("d", "category", "d")
+
+        # Assert
+        self.assertEqual(3, len(self.cache))
+        with patch('analysis_cache.time.time', return_value=1030):
+            self.assertIsNone(self.cache.get("b"))
+            self.assertIsNotNone(self.cache.get("a"))
+        self.assertEqual(1, self.cache.counters()["cache.evicted"])
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are treated as misses."""
+        # Arrange
+        with patch('analysis_cache.time.time', return_value=1000):
+            self.cache.put("git status", "version control", "Show status")
+
+        # Act
+        with patch('analysis_cache.time.time', return_value=1000 + 2 * 86400):
+            found = self.cache.get("git status")
+
+        # Assert
+        self.assertIsNone(found)
+        self.assertEqual(0, len(self.cache))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+"""Tests for the on-disk IVF vector index."""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+import sys
+
+import numpy as np
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ann_index
+from vector_engine import EmbeddingMatrix
+
+
+def clustered_vectors(count, dimensions=32, clusters=20, seed=3):
+    """Return normalized vectors scattered around random cluster centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimensions))
+    vectors = centres[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, dimensions))
+    vectors = vectors.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestIVFIndex(unittest.TestCase):
+    """Test cases for building, updating, searching and pruning the index."""
+
+    def setUp(self):
+        """Create an index in a temporary directory."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.index = ann_index.IVFIndex(os.path.join(self.tmp_dir, "terminal_logger"))
+
+    def _build(self, vectors, days=("2023_02_14", "2023_02_15"), lists=16):
+        ids = [ObjectId() for _ in range(len(vectors))]
+        half = len(vectors) // 2
+        self.index.rebuild({
+            days[0]: (ids[:half], vectors[:half]),
+            days[1]: (ids[half:], vectors[half:]),
+        }, lists=lists)
+        return ids
+
+    def test_recall_against_exact_scan(self):
+        """Test that the index finds nearly all of the exact top 10, and all with every cluster probed."""
+        # Arrange
+        vectors = clustered_vectors(4000)
+        ids = self._build(vectors)
+        exact = EmbeddingMatrix(vectors, ids)
+        queries = clustered_vectors(20, seed=11)
+
+        # Act
+        recall = {}
+        for nprobe in (4, 16):
+            found = 0
+            for query in queries:
+                expected = {ref for ref, _ in exact.search(query, 10)}
+                found += len(expected & {record_id for _, record_id, _ in self.index.search(query, 10, nprobe=nprobe)})
+            recall[nprobe] = found / (10 * len(queries))
+
+        # Assert
+        self.assertGreaterEqual(recall[4], 0.9)
+        self.assertEqual(1.0, recall[16])
+
+    def test_incremental_add_is_searchable(self):
+        """Test that an appended embedding is found, before and after training."""
+        # Arrange
+        record_id = ObjectId()
+
+        # Act
+        self.assertTrue(self.index.add("2023_02_15", record_id, [0.0, 3.0, 4.0]))
+        before = self.index.search([0.0, 0.6, 0.8], 1)
+        self.assertFalse(self.index.add("2023_02_15", ObjectId(), [1.0, 0.0]))
+
+        # Assert
+        self.assertEqual([("2023_02_15", record_id)], [(day, rid) for day, rid, _ in before])
+        self.assertAlmostEqual(1.0, before[0][2], places=5)
+
+        # Arrange: train, then add a new embedding which gets a cluster
+        vectors = clustered_vectors(400, dimensions=3)
+        self._build(vectors, lists=4)
+        new_id = ObjectId()
+        self.index.add("2023_02_15", new_id, [5.0, 5.0, 5.0])
+
+        # Act
+        after = self.index.search([1.0, 1.0, 1.0], 1, nprobe=1)
+
+        # Assert
+        self.assertEqual(new_id, after[0][1])
+
+    def test_rebuild_keeps_records_appended_during_build(self):
+        """Test that embeddings appended after the build read MongoDB survive the rebuild."""
+        # Arrange
+        vectors = clustered_vectors(400)
+        old_id = ObjectId.from_datetime(datetime.now() - timedelta(hours=1))
+        self.index.rebuild({"2023_02_14": ([old_id] * 200, vectors[:200]), "2023_02_15": ([old_id] * 200, vectors[200:])}, lists=4)
+        self.index.add("2023_02_15", old_id, vectors[0])
+        read_at = datetime.now() - timedelta(seconds=5)
+        late_ids = [ObjectId(), ObjectId()]
+        self.index.add("2023_02_15", late_ids[0], vectors[300])
+        self.index.add("2023_02_16", late_ids[1], vectors[301])
+
+        # Act
+        self.index.rebuild({"2023_02_14": ([ObjectId() for _ in range(200)], vectors[:200])}, lists=4, appended_since=read_at)
+
+        # Assert
+        self.assertEqual(["2023_02_14", "2023_02_15", "2023_02_16"], self.index.days())
+        self.assertEqual(202, self.index.stats()["records"])
+        for day, record_id, vector in zip(("2023_02_15", "2023_02_16"), late_ids, vectors[300:302]):
+            records = self.index._read_day(day)
+            self.assertEqual([record_id.binary], [row.tobytes() for row in records["id"]])
+            self.assertNotEqual(ann_index.UNASSIGNED, records["list"][0])
+            self.assertIn(record_id, [rid for _, rid, _ in self.index.search(vector, 1, nprobe=4)])
+
+    def test_add_waits_for_rebuild_in_another_process(self):
+        """Test that an append blocks while another index instance holds the rebuild lock."""
+        # Arrange
+        self.index.add("2023_02_15", ObjectId(), [1.0, 0.0])
+        other = ann_index.IVFIndex(self.index.path)
+        added = threading.Event()
+
+        # Act
+        with self.index._locked(exclusive=True):
+            thread = threading.Thread(target=lambda: (other.add("2023_02_15", ObjectId(), [0.0, 1.0]), added.set()))
+            thread.start()
+            blocked = not added.wait(0.2)
+        thread.join(5)
+
+        # Assert
+        self.assertTrue(blocked)
+        self.assertTrue(added.is_set())
+        self.assertEqual(2, self.index.stats()["records"])
+
+    def test_partial_record_is_ignored(self):
+        """Test that a record cut short by an interrupted write is skipped."""
+        # Arrange
+        self.index.add("2023_02_15", ObjectId(), [1.0, 0.0])
+        with open(os.path.join(self.index.path, "2023_02_15.ivf"), "ab") as fh:
+            fh.write(b"\x00" * 7)
+
+        # Act
+        stats = self.index.stats()
+
+        # Assert
+        self.assertEqual(1, stats["records"])
+
+    def test_prune_and_start_day(self):
+        """Test that dropped days lose their file and searches respect the date range."""
+        # Arrange
+        old_id, new_id = ObjectId(), ObjectId()
+        self.index.add("2023_01_01", old_id, [1.0, 0.0])
+        self.index.add("2023_02_15", new_id, [0.9, 0.1])
+
+        # Act
+        recent = self.index.search([1.0, 0.0], 5, start_day="2023_02_01")
+        removed = self.index.prune("2023_01_16")
+
+        # Assert
+        self.assertEqual([new_id], [record_id for _, record_id, _ in recent])
+        self.assertEqual(["2023_01_01"], removed)
+        self.assertEqual(["2023_02_15"], self.index.days())
+
+
+class TestVectorIndexHooks(unittest.TestCase):
+    """Test cases for keeping the index in step with the database."""
+
+    @patch('db.vector_index_enabled', return_value=True)
+    @patch('db.get_vector_index')
+    def test_store_adds_to_index(self, mock_get_index, mock_enabled):
+        """Test that storing a command with an embedding appends it to the index."""
+        import db
+
+        # Arrange
+        mock_db = MagicMock()
+        mock_db.name = "terminal_logger"
+        collection = MagicMock()
+        collection.name = "command_history_2023_02_15"
+        record_id = ObjectId()
+        collection.insert_one.return_value.inserted_id = record_id
+
+        # Act
+        with patch('db.get_collection_for_today', return_value=collection), \
+                patch('db.get_catalog') as mock_catalog, \
+                patch('db.prepare_result_for_storage', side_effect=lambda db_, result, name: result):
+            mock_catalog.return_value.__contains__.return_value = True
+            db.store_command_result(mock_db, {"command": "ls", "vector_embedding": [0.1, 0.2]})
+
+        # Assert
+        mock_get_index.assert_called_once_with("terminal_logger")
+        mock_get_index.return_value.add.assert_called_once_with("2023_02_15", record_id, [0.1, 0.2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Tests for the circuit breaker module."""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from circuit_breaker import CircuitBreaker
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the circuit breaker."""
+
+    def setUp(self):
+        """Set up a scratch directory for the state file."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp_dir, "circuit.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    @patch('circuit_breaker.time.time')
+    def test_opens_after_threshold_and_recovers(self, mock_time):
+        """Test that the circuit opens after repeated failures and allows a trial after the cool-down."""
+        # Arrange
+        mock_time.return_value = 1000.0
+        breaker = CircuitBreaker(2, 60)
+
+        # Act & Assert
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        self.assertEqual(60, breaker.retry_after())
+
+        mock_time.return_value = 1061.0
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(0, breaker.failures)
+
+    @patch('circuit_breaker.time.time')
+    def test_failed_trial_reopens(self, mock_time):
+        """Test that a failed trial call opens the circuit for another cool-down."""
+        # Arrange
+        mock_time.return_value = 1000.0
+        breaker = CircuitBreaker(1, 60)
+        breaker.record_failure()
+
+        # Act
+        mock_time.return_value = 1061.0
+        breaker.record_failure()
+
+        # Assert
+        self.assertFalse(breaker.allow())
+
+    def test_state_shared_between_instances(self):
+        """Test that the state file is shared, as between wrapper processes."""
+        # Arrange
+        first = CircuitBreaker(2, 60, self.state_path)
+        second = CircuitBreaker(2, 60, self.state_path)
+
+        # Act
+        first.record_failure()
+        second.record_failure()
+
+        # Assert
+        self.assertFalse(first.allow())
+        second.record_success()
+        self.assertTrue(first.allow())
+
+
+if __name__ == '__main__':
+    unittest.main()
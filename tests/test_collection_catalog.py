@@ -0,0 +1,86 @@
+"""Tests for the collection catalog module."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import collection_catalog
+from collection_catalog import CollectionCatalog
+
+
+class TestCollectionCatalog(unittest.TestCase):
+    """Test cases for the cached collection catalog."""
+
+    def setUp(self):
+        """Set up a database with a few day collections."""
+        self.mock_db = MagicMock()
+        self.mock_db.list_collection_names.return_value = [
+            "command_history_2023_02_01",
+            "command_history_2023_01_15",
+            "command_history_2023_01_01",
+            "command_output.files",
+        ]
+        self.catalog = CollectionCatalog(self.mock_db, ttl_seconds=60)
+
+    def test_listing_is_cached(self):
+        """Test that collections are listed once within the TTL."""
+        # Act
+        self.catalog.history_collections()
+        self.catalog.in_range("2023_01_10")
+        self.assertIn("command_output.files", self.catalog)
+
+        # Assert
+        self.mock_db.list_collection_names.assert_called_once()
+
+    @patch('collection_catalog.time.monotonic')
+    def test_listing_expires(self, mock_monotonic):
+        """Test that collections are listed again after the TTL."""
+        # Arrange
+        mock_monotonic.return_value = 100.0
+        self.catalog.history_collections()
+
+        # Act
+        mock_monotonic.return_value = 161.0
+        self.catalog.history_collections()
+
+        # Assert
+        self.assertEqual(2, self.mock_db.list_collection_names.call_count)
+
+    def test_date_ranges(self):
+        """Test selecting day collections by date."""
+        # Act & Assert
+        self.assertEqual(
+            ["command_history_2023_01_01", "command_history_2023_01_15", "command_history_2023_02_01"],
+            self.catalog.history_collections(),
+        )
+        self.assertEqual(["command_history_2023_02_01", "command_history_2023_01_15"], self.catalog.in_range("2023_01_15"))
+        self.assertEqual(["command_history_2023_01_15"], self.catalog.in_range("2023_01_02", "2023_01_31"))
+        self.assertEqual(["command_history_2023_01_01"], self.catalog.before("2023_01_15"))
+
+    def test_local_updates(self):
+        """Test that created and dropped collections update the cached listing."""
+        # Arrange
+        self.catalog.history_collections()
+
+        # Act
+        self.catalog.add("command_history_2023_02_02")
+        self.catalog.discard("command_history_2023_01_01")
+
+        # Assert
+        self.assertEqual(["command_history_2023_02_02", "command_history_2023_02_01"], self.catalog.in_range("2023_02_01"))
+        self.assertEqual([], self.catalog.before("2023_01_15"))
+        self.mock_db.list_collection_names.assert_called_once()
+
+    def test_shared_per_database(self):
+        """Test that the same database shares one catalog."""
+        # Act & Assert
+        with patch.dict(collection_catalog._catalogs, clear=True):
+            self.assertIs(collection_catalog.get_catalog(self.mock_db), collection_catalog.get_catalog(self.mock_db))
+            self.assertIsNot(collection_catalog.get_catalog(self.mock_db), collection_catalog.get_catalog(MagicMock()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Tests for the command rules module."""
+
+import unittest
+import json
+import shutil
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import command_rules
+
+
+class TestCommandRules(unittest.TestCase):
+    """Test cases for rule-based classification."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.classifier = command_rules.RuleClassifier()
+
+    def test_split_segments(self):
+        """Test splitting pipelines and command lists, respecting quotes."""
+        self.assertEqual(
+            [["ps", "aux"], ["grep", "a | b"], ["wc", "-l"]],
+            command_rules.split_segments('ps aux | grep "a | b" && wc -l'),
+        )
+
+    def test_strip_prefixes(self):
+        """Test removing sudo/env wrappers and assignments."""
+        self.assertEqual(["rm", "-rf", "build"], command_rules.strip_prefixes(["sudo", "-u", "root", "rm", "-rf", "build"]))
+        self.assertEqual(["kubectl", "get", "pods"], command_rules.strip_prefixes(["env", "KUBECONFIG=x", "kubectl", "get", "pods"]))
+        self.assertEqual(["make"], command_rules.strip_prefixes(["CC=clang", "make"]))
+
+    def test_classify_by_subcommand(self):
+        """Test that subcommand rules take precedence over binary rules."""
+        # Act
+        result = self.classifier("git status")
+
+        # Assert
+        self.assertEqual("version control", result.category)
+        self.assertEqual("Shows the state of the working tree and staging area.", result.description)
+        self.assertEqual("rules", result.source)
+
+    def test_classify_pipeline_ignores_filters(self):
+        """Test that output filters do not decide a pipeline's category."""
+        self.assertEqual("process management", self.classifier("ps aux | grep python | head -5").category)
+        self.assertEqual("data processing", self.classifier("cat access.log | sort | uniq -c").category)
+
+    def test_mixed_pipeline_lowers_confidence(self):
+        """Test that commands spanning several categories are left to the LLM."""
+        # Act
+        result = self.classifier("ls -la && git push")
+
+        # Assert
+        self.assertLess(result.confidence, self.classifier.confidence)
+
+    def test_unknown_main_command_is_not_classified(self):
+        """Test that filters and known commands do not classify a line whose other segments are unknown."""
+        for command in (
+            "./deploy.sh | grep ERROR",
+            "python train.py | tee log.txt",
+            "make && rm -rf dist",
+            "terraform apply; ls",
+        ):
+            with self.subTest(command=command):
+                self.assertIsNone(self.classifier(command))
+
+    def test_unknown_command(self):
+        """Test that commands without a rule are not classified."""
+        self.assertIsNone(self.classifier("make -j8"))
+        self.assertIsNone(self.classifier(""))
+
+    def test_user_rules_file(self):
+        """Test extending and overriding the defaults from a rules file."""
+        # Arrange
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, "rules.json")
+        with open(path, "w") as fh:
+            json.dump({"rules": [
+                {"command": ["make", "ninja"], "category": "build", "description": "Builds the project."},
+                {"command": "git", "subcommand": "status", "category": "vcs", "description": "Status."},
+            ]}, fh)
+
+        # Act
+        try:
+            classifier = command_rules.RuleClassifier.from_config(path)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        # Assert
+        self.assertEqual("build", classifier("make -j8").category)
+        self.assertEqual("vcs", classifier("git status").category)
+        self.assertEqual("version control", classifier("git log").category)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+"""Tests for the command templates module."""
+
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from command_templates import normalize_command
+
+
+class TestCommandTemplates(unittest.TestCase):
+    """Test cases for command normalization."""
+
+    def test_commands_without_arguments_are_unchanged(self):
+        """Test that plain commands and flags are kept."""
+        self.assertEqual("git status", normalize_command("git status"))
+        self.assertEqual("ls -la", normalize_command("  ls   -la "))
+
+    def test_paths_are_replaced(self):
+        """Test that different paths share a template."""
+        self.assertEqual("ls -la <path>", normalize_command("ls -la /tmp/build"))
+        self.assertEqual("ls -la <path>", normalize_command("ls -la ~/src"))
+        self.assertEqual("cat <path>", normalize_command("cat main.py"))
+        self.assertEqual("tail -n <num> <path>", normalize_command("tail -n 100 ./logs/app.log"))
+
+    def test_strings_numbers_and_hashes_are_replaced(self):
+        """Test replacing quoted strings, numbers and hashes."""
+        self.assertEqual("git commit -m <str>", normalize_command('git commit -m "fix the \\"bug\\""'))
+        self.assertEqual("git show <hash>", normalize_command("git show a1b2c3d"))
+        self.assertEqual("kill -9 <num>", normalize_command("kill -9 1234"))
+        self.assertEqual("curl <url>", normalize_command("curl https://example.com/api?page=2"))
+        self.assertEqual("FOO=<val> make -j8", normalize_command("FOO=bar make -j8"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Tests for the configuration module."""
+
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+
+
+class TestConfig(unittest.TestCase):
+    """Test cases for configuration loading."""
+
+    @patch('config.load_dotenv')
+    def test_load_config_once(self, mock_load_dotenv):
+        """Test that the .env file is only loaded once per process."""
+        # Arrange
+        with patch.object(config, '_loaded', False):
+            # Act
+            config.load_config()
+            config.load_config()
+            config.get_env("MONGODB_HOST")
+
+        # Assert
+        mock_load_dotenv.assert_called_once()
+
+    def test_typed_getters(self):
+        """Test reading typed values with defaults."""
+        # Arrange
+        env = {"TEST_INT": "42", "TEST_FLOAT": "0.5", "TEST_BOOL": "no", "TEST_PATH": "~/spool"}
+
+        # Act & Assert
+        with patch.dict(os.environ, env):
+            self.assertEqual(42, config.get_int("TEST_INT", 1))
+            self.assertEqual(7, config.get_int("TEST_MISSING", 7))
+            self.assertEqual(0.5, config.get_float("TEST_FLOAT", 1.0))
+            self.assertFalse(config.get_bool("TEST_BOOL", True))
+            self.assertTrue(config.get_bool("TEST_MISSING", True))
+            self.assertEqual(os.path.expanduser("~/spool"), config.get_path("TEST_PATH", "/tmp"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
 """Tests for the database module."""
 
 import datetime
+import threading
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 from pymongo.database import Database
 
@@ -21,6 +23,27 @@ class TestDB(unittest.TestCase):
         self.mock_collection = MagicMock()
         self.mock_db.__getitem__.return_value = self.mock_collection
 
+    @patch('db.MongoClient')
+    def test_connect_shares_client_per_uri(self, mock_client_class):
+        """Test that one lazily connecting client is created per URI and closed on shutdown."""
+        # Act
+        with patch.dict(db._clients, clear=True):
+            first = db.connect_to_mongodb("localhost", 27017, "a")
+            second = db.connect_to_mongodb("localhost", 27017, "a")
+            db.connect_to_mongodb("otherhost", 27017, "a")
+            db.close_mongodb_clients()
+
+            # Assert
+            self.assertEqual({}, db._clients)
+
+        self.assertIs(first, second)
+        self.assertEqual(2, mock_client_class.call_count)
+        kwargs = mock_client_class.call_args[1]
+        self.assertFalse(kwargs["connect"])
+        self.assertEqual(db.MONGODB_MAX_POOL_SIZE, kwargs["maxPoolSize"])
+        self.assertEqual(db.MONGODB_SERVER_SELECTION_TIMEOUT_MS, kwargs["serverSelectionTimeoutMS"])
+        self.assertEqual(2, mock_client_class.return_value.close.call_count)
+
     def test_get_collection_for_today(self):
         """Test getting the collection for today."""
         # Arrange
@@ -71,6 +94,7 @@ class TestDB(unittest.TestCase):
         """Test storing a command result."""
         # Arrange
         result = {"command": "ls", "exit_code": 0}
+        self.mock_collection.name = "command_history_2023_02_15"
         self.mock_collection.insert_one.return_value.inserted_id = "test_id"
         
         with patch('db.get_collection_for_today') as mock_get_collection:
@@ -134,6 +158,362 @@ class TestDB(unittest.TestCase):
             self.assertEqual("ls", results[0]["command"])
             self.assertEqual("pwd", results[1]["command"])
 
+    def _one_per_day(self, names):
+        """Serve one command per day collection, the newest day first."""
+        collections = {name: MagicMock() for name in names}
+        for day, name in enumerate(names):
+            collections[name].find.return_value.sort.return_value.limit.return_value = [
+                {"command": name, "timestamp": datetime.datetime(2023, 2, 14 - day, 12)}
+            ]
+        self.mock_db.__getitem__.side_effect = collections.__getitem__
+        return collections
+
+    def test_query_threaded_stops_when_enough(self):
+        """Test that older days are not read once the newer days have enough matches."""
+        # Arrange
+        names = [f"command_history_2023_02_{day:02d}" for day in range(14, 0, -1)]
+        collections = self._one_per_day(names)
+
+        class LazyExecutor:
+            """Runs a submitted query only when its result is taken."""
+            def submit(self, fn, *args):
+                future = MagicMock()
+                future.result.side_effect = lambda: fn(*args)
+                return future
+
+        # Act
+        with patch('db._get_query_executor', return_value=LazyExecutor()):
+            results = db._query_threaded(self.mock_db, names, {}, 3)
+
+        # Assert
+        self.assertEqual(names[:3], [r["command"] for r in results])
+        for remaining, name in zip((3, 2, 1), names):
+            collections[name].find.assert_called_once_with({}, None, batch_size=remaining)
+        for name in names[3:]:
+            collections[name].find.assert_not_called()
+
+    def test_query_threaded_has_no_waves(self):
+        """Test that a slow newest day does not hold back the older days."""
+        # Arrange
+        names = [f"command_history_2023_02_{day:02d}" for day in range(14, 4, -1)]
+        collections = self._one_per_day(names)
+        oldest_read = threading.Event()
+        newest = collections[names[0]].find.return_value.sort.return_value.limit
+        newest.side_effect = lambda limit: [{"command": names[0], "timestamp": datetime.datetime(2023, 2, 14, 12)}] if oldest_read.wait(5) else []
+        collections[names[-1]].find.side_effect = lambda *args, **kwargs: oldest_read.set() or collections[names[-1]].find.return_value
+
+        # Act
+        with patch('db._query_executor', ThreadPoolExecutor(max_workers=2)):
+            results = db._query_threaded(self.mock_db, names, {}, 20)
+            db._query_executor.shutdown()
+
+        # Assert
+        self.assertTrue(oldest_read.is_set())
+        self.assertEqual(names, [r["command"] for r in results])
+
+    def test_query_union_pipeline(self):
+        """Test that all day collections are read with one $unionWith aggregation."""
+        # Arrange
+        names = ["command_history_2023_02_03", "command_history_2023_02_02"]
+        self.mock_collection.aggregate.return_value = [{"command": "ls"}]
+
+        # Act
+        results = db._query_union(self.mock_db, names, {"exit_code": 0}, 5)
+
+        # Assert
+        self.assertEqual([{"command": "ls"}], results)
+        self.mock_db.__getitem__.assert_called_once_with("command_history_2023_02_03")
+        pipeline = self.mock_collection.aggregate.call_args[0][0]
+        per_collection = [{"$match": {"exit_code": 0}}, {"$sort": {"timestamp": -1}}, {"$limit": 5}]
+        self.assertEqual(per_collection, pipeline[:3])
+        self.assertEqual({"$unionWith": {"coll": names[1], "pipeline": per_collection}}, pipeline[3])
+        self.assertEqual([{"$sort": {"timestamp": -1}}, {"$limit": 5}], pipeline[4:])
+
+    def test_build_query_filters_text_search(self):
+        """Test that a text search goes through the text index instead of a regex."""
+        # Act
+        filters = db.build_query_filters(search="git push", failed=True, text_search=True)
+
+        # Assert
+        self.assertEqual({"$text": {"$search": "git push"}, "exit_code": {"$ne": 0}}, filters)
+
+    def test_build_query_filters_text_search_with_flag(self):
+        """Test that flags are searched for instead of being read as negations."""
+        # Act
+        filters = db.build_query_filters(search='rm -rf --force "dist" -', text_search=True)
+
+        # Assert
+        self.assertEqual({"$text": {"$search": "rm rf force dist"}}, filters)
+
+    def test_query_commands_ranks_text_search(self):
+        """Test that text search results from every day are merged by relevance."""
+        # Arrange
+        names = ["command_history_2023_02_15", "command_history_2023_02_14"]
+        self.mock_db.list_collection_names.return_value = names
+        collections = {name: MagicMock() for name in names}
+        collections[names[0]].find.return_value.sort.return_value.limit.return_value = [
+            {"command": "git status", "score": 1.1, "timestamp": datetime.datetime(2023, 2, 15, 12)}
+        ]
+        collections[names[1]].find.return_value.sort.return_value.limit.return_value = [
+            {"command": "git push", "score": 5.5, "timestamp": datetime.datetime(2023, 2, 14, 12)},
+            {"command": "git pull", "score": 1.1, "timestamp": datetime.datetime(2023, 2, 14, 9)},
+        ]
+        self.mock_db.__getitem__.side_effect = collections.__getitem__
+        filters = {"$text": {"$search": "git"}}
+
+        with patch('db.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime(2023, 2, 15)
+
+            # Act
+            results = db.query_commands(self.mock_db, filters, 2, 30, projection={"command": 1})
+
+        # Assert
+        self.assertEqual(["git push", "git status"], [r["command"] for r in results])
+        collections[names[1]].find.assert_called_once_with(
+            filters, {"command": 1, "score": {"$meta": "textScore"}}, batch_size=2
+        )
+        collections[names[1]].find.return_value.sort.assert_called_once_with(
+            [("score", {"$meta": "textScore"}), ("timestamp", -1)]
+        )
+
+    def _day_collections(self, documents_by_day):
+        """Serve each day collection's documents from find().sort()."""
+        names = sorted(documents_by_day, reverse=True)
+        self.mock_db.list_collection_names.return_value = names
+        collections = {name: MagicMock() for name in names}
+        for name, documents in documents_by_day.items():
+            collections[name].find.return_value.sort.return_value = documents
+        self.mock_db.__getitem__.side_effect = collections.__getitem__
+        return collections
+
+    def test_iter_commands_merges_late_ingested_commands(self):
+        """Test that a command ingested after midnight is streamed in timestamp order."""
+        # Arrange
+        ids = [db.ObjectId() for _ in range(4)]
+        collections = self._day_collections({
+            "command_history_2023_02_15": [
+                {"_id": ids[0], "timestamp": datetime.datetime(2023, 2, 15, 9)},
+                {"_id": ids[2], "timestamp": datetime.datetime(2023, 2, 14, 23, 50)},
+            ],
+            "command_history_2023_02_14": [
+                {"_id": ids[1], "timestamp": datetime.datetime(2023, 2, 14, 23, 55)},
+                {"_id": ids[3], "timestamp": datetime.datetime(2023, 2, 14, 8)},
+            ],
+            "command_history_2023_02_10": [],
+        })
+
+        with patch('db.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime(2023, 2, 15, 12)
+            mock_datetime.strptime.side_effect = datetime.datetime.strptime
+            mock_datetime.min = datetime.datetime.min
+
+            # Act
+            stream = db.iter_commands(self.mock_db, {}, 30)
+            first = [next(stream)["_id"] for _ in range(3)]
+
+            # Assert
+            self.assertEqual(ids[:3], first)
+            collections["command_history_2023_02_10"].find.assert_not_called()
+            self.assertEqual(ids[3], next(stream)["_id"])
+            self.assertEqual([], list(stream))
+
+    def test_iter_commands_after_keyset(self):
+        """Test that streaming after a key filters on (timestamp, _id) and skips newer days."""
+        # Arrange
+        record_id = db.ObjectId()
+        after = (datetime.datetime(2023, 2, 10, 12), record_id)
+        collections = self._day_collections({
+            "command_history_2023_02_15": [],
+            "command_history_2023_02_11": [],
+            "command_history_2023_02_10": [],
+        })
+
+        with patch('db.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime(2023, 2, 15, 12)
+            mock_datetime.strptime.side_effect = datetime.datetime.strptime
+
+            # Act
+            results = list(db.iter_commands(self.mock_db, {"exit_code": 0}, 30, after=after, batch_size=5))
+
+        # Assert
+        self.assertEqual([], results)
+        collections["command_history_2023_02_15"].find.assert_not_called()
+        collections["command_history_2023_02_10"].find.assert_called_once_with(
+            {"$and": [
+                {"exit_code": 0},
+                {"$or": [{"timestamp": {"$lt": after[0]}}, {"timestamp": after[0], "_id": {"$lt": record_id}}]},
+            ]},
+            None,
+            batch_size=5,
+        )
+        collections["command_history_2023_02_10"].find.return_value.sort.assert_called_once_with(db.KEYSET_SORT)
+
+    def test_page_token_round_trip(self):
+        """Test that page tokens are opaque and decode to the same key."""
+        # Arrange
+        document = {"_id": db.ObjectId(), "timestamp": datetime.datetime(2023, 2, 15, 12, 30, 1, 250000)}
+
+        # Act
+        token = db.encode_page_token(document)
+
+        # Assert
+        self.assertEqual((document["timestamp"], document["_id"]), db.decode_page_token(token))
+        with self.assertRaises(ValueError):
+            db.decode_page_token("not-a-token")
+
+    def test_page_commands(self):
+        """Test paging with a next-page token and jumping to a later page."""
+        # Arrange
+        documents = [
+            {"_id": db.ObjectId(), "command": f"cmd{i}", "timestamp": datetime.datetime(2023, 2, 15, 12) - datetime.timedelta(minutes=i)}
+            for i in range(5)
+        ]
+
+
+        def iter_commands(db_, filters, days, projection, after, batch_size):
+            return iter([d for d in documents if after is None or (d["timestamp"], d["_id"]) < after])
+
+        with patch('db.iter_commands', side_effect=iter_commands) as mock_iter:
+            # Act
+            first, token = db.page_commands(self.mock_db, {}, 2)
+            second, _ = db.page_commands(self.mock_db, {}, 2, after=token)
+            third, last_token = db.page_commands(self.mock_db, {}, 2, page=3)
+
+        # Assert
+        self.assertEqual(["cmd0", "cmd1"], [r["command"] for r in first])
+        self.assertEqual(["cmd2", "cmd3"], [r["command"] for r in second])
+        self.assertEqual(["cmd4"], [r["command"] for r in third])
+        self.assertIsNone(last_token)
+        self.assertEqual({"timestamp": 1}, mock_iter.call_args_list[2][0][3])
+
+    def test_collection_stats(self):
+        """Test reading counts and sizes from collStats, falling back to the estimated count."""
+        # Arrange
+        from pymongo.errors import OperationFailure
+
+        def command(name, collection_name):
+            if collection_name == "command_history_2023_02_14":
+                raise OperationFailure("collStats is not supported")
+            return {"count": 5, "size": 100, "storageSize": 4096, "totalIndexSize": 8192}
+
+        self.mock_db.command.side_effect = command
+        self.mock_collection.estimated_document_count.return_value = 7
+
+        # Act
+        stats = db.collection_stats(self.mock_db, ["command_history_2023_02_15", "command_history_2023_02_14"])
+
+        # Assert
+        self.assertEqual({"count": 5, "size": 100, "storage_size": 4096, "index_size": 8192}, stats["command_history_2023_02_15"])
+        self.assertEqual(7, stats["command_history_2023_02_14"]["count"])
+        self.mock_collection.count_documents.assert_not_called()
+
+    @patch('db.get_catalog')
+    def test_migrate_embeddings(self, mock_catalog):
+        """Test that list embeddings are rewritten as binaries in batches, and only counted in a dry run."""
+        # Arrange
+        from bson import ObjectId
+        from embedding_storage import FLOAT16_SUBTYPE
+
+        mock_catalog.return_value.history_collections.return_value = ["command_history_2023_02_15"]
+        ids = [ObjectId() for _ in range(3)]
+        self.mock_collection.find.return_value = iter([{"_id": i, "vector_embedding": [1.0, 0.5]} for i in ids])
+        self.mock_collection.count_documents.return_value = 3
+
+        # Act
+        counted = db.migrate_embeddings(self.mock_db, dry_run=True)
+        converted = db.migrate_embeddings(self.mock_db, dtype="float16", batch_size=2)
+
+        # Assert
+        legacy = {"vector_embedding": {"$type": "array"}}
+        self.assertEqual({"command_history_2023_02_15": 3}, counted)
+        self.assertEqual({"command_history_2023_02_15": 3}, converted)
+        self.mock_collection.count_documents.assert_called_once_with(legacy)
+        self.assertEqual([2, 1], [len(call[0][0]) for call in self.mock_collection.bulk_write.call_args_list])
+        update = self.mock_collection.bulk_write.call_args_list[0][0][0][0]
+        self.assertEqual({"_id": ids[0], **legacy}, update._filter)
+        self.assertEqual(FLOAT16_SUBTYPE, update._doc["$set"]["vector_embedding"].subtype)
+
+    def test_list_projection(self):
+        """Test that listings project the metadata and a server-side preview of the output."""
+        # Act
+        projection = db.list_projection(50)
+
+        # Assert
+        self.assertEqual(1, projection["command"])
+        self.assertNotIn("vector_embedding", projection)
+        is_text = {"$eq": [{"$type": "$stdout"}, "string"]}
+        self.assertEqual(
+            {"$substrCP": [{"$cond": [is_text, "$stdout", {"$ifNull": ["$stdout.preview", ""]}]}, 0, 50]},
+            projection["stdout"],
+        )
+        self.assertEqual(
+            {"$cond": [is_text, {"$strLenCP": "$stdout"}, {"$ifNull": ["$stdout.length", 0]}]},
+            projection["stdout_length"],
+        )
+        self.assertIn("stderr_length", projection)
+
+    def test_query_union_projects_each_collection(self):
+        """Test that a projection is applied inside every branch of the union."""
+        # Arrange
+        names = ["command_history_2023_02_03", "command_history_2023_02_02"]
+        self.mock_collection.aggregate.return_value = []
+
+        # Act
+        db._query_union(self.mock_db, names, {}, 5, {"command": 1})
+
+        # Assert
+        pipeline = self.mock_collection.aggregate.call_args[0][0]
+        self.assertEqual({"$project": {"command": 1}}, pipeline[3])
+        self.assertEqual({"$project": {"command": 1}}, pipeline[4]["$unionWith"]["pipeline"][3])
+
+    def test_get_command_reads_day_from_object_id(self):
+        """Test that a record is looked up in the day collection its ObjectId was created on."""
+        # Arrange
+        created = datetime.datetime(2023, 2, 15, 12, 0)
+        object_id = db.ObjectId.from_datetime(created.astimezone())
+        names = ["command_history_2023_02_14", "command_history_2023_02_15"]
+        self.mock_db.list_collection_names.return_value = names
+        collections = {name: MagicMock() for name in names}
+        collections[names[1]].find_one.return_value = {"_id": object_id, "command": "ls"}
+        self.mock_db.__getitem__.side_effect = collections.__getitem__
+
+        # Act
+        record = db.get_command(self.mock_db, str(object_id))
+
+        # Assert
+        self.assertEqual("ls", record["command"])
+        collections[names[1]].find_one.assert_called_once_with({"_id": object_id})
+        collections[names[0]].find_one.assert_not_called()
+
+    def test_get_command_not_found(self):
+        """Test that a missing record returns None after trying every collection."""
+        # Arrange
+        self.mock_db.list_collection_names.return_value = ["command_history_2023_01_01"]
+        self.mock_collection.find_one.return_value = None
+
+        # Act
+        record = db.get_command(self.mock_db, db.ObjectId())
+
+        # Assert
+        self.assertIsNone(record)
+        self.mock_collection.find_one.assert_called_once()
+
+    @patch('db.provision_day_collections')
+    def test_store_provisions_new_day(self, mock_provision):
+        """Test that the first insert into an unknown day collection indexes it first."""
+        # Arrange
+        self.mock_db.list_collection_names.return_value = []
+        self.mock_collection.name = "command_history_2023_02_15"
+
+        with patch('db.get_collection_for_today', return_value=self.mock_collection):
+            # Act
+            db.store_command_result(self.mock_db, {"command": "ls", "exit_code": 0})
+            db.store_command_result(self.mock_db, {"command": "pwd", "exit_code": 0})
+
+        # Assert
+        mock_provision.assert_called_once_with(self.mock_db)
+        self.assertEqual(2, self.mock_collection.insert_one.call_count)
+
     def test_build_query_filters(self):
         """Test building query filters."""
         # Test with search
@@ -161,5 +541,119 @@ class TestDB(unittest.TestCase):
         }, filters)
 
 
+class TestSingleCollectionLayout(unittest.TestCase):
+    """Test cases for the single command_history collection layout."""
+
+    def setUp(self):
+        """Switch to the single-collection layout."""
+        self.mock_db = MagicMock(spec=Database)
+        self.mock_db.name = "terminal_logger"
+        self.mock_collection = MagicMock()
+        self.mock_collection.index_information.return_value = {"_id_": {"key": [("_id", 1)]}}
+        self.mock_db.__getitem__.return_value = self.mock_collection
+        patcher = patch('db.STORAGE_LAYOUT', "single")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ensure_history_indexes(self):
+        """Test creating the TTL and compound indexes."""
+        # Act
+        db.ensure_history_indexes(self.mock_db, 7)
+
+        # Assert
+        self.mock_collection.update_many.assert_called_once_with(
+            {"created_at": {"$exists": False}}, [{"$set": {"created_at": {"$toDate": "$_id"}}}]
+        )
+        self.mock_collection.create_index.assert_any_call([("created_at", 1)], expireAfterSeconds=7 * 86400)
+        self.mock_collection.create_index.assert_any_call([("timestamp", -1)])
+        self.mock_collection.create_index.assert_any_call([("exit_code", 1), ("timestamp", -1)])
+        self.mock_collection.create_index.assert_any_call([("ai_category", 1), ("timestamp", -1)])
+        self.mock_collection.create_index.assert_any_call(
+            [("command", "text"), ("ai_description", "text")], weights={"command": 10, "ai_description": 1}
+        )
+
+    def test_ensure_history_indexes_updates_ttl(self):
+        """Test that a changed retention period updates the TTL in place."""
+        # Arrange
+        self.mock_collection.index_information.return_value = {
+            "created_at_1": {"key": [("created_at", 1)], "expireAfterSeconds": 30 * 86400},
+            "timestamp_-1": {"key": [("timestamp", -1)]},
+            "exit_code_1_timestamp_-1": {"key": [("exit_code", 1), ("timestamp", -1)]},
+            "ai_category_1_timestamp_-1": {"key": [("ai_category", 1), ("timestamp", -1)]},
+            "timestamp_-1__id_-1": {"key": [("timestamp", -1), ("_id", -1)]},
+            "command_text_ai_description_text": {"key": [("_fts", "text"), ("_ftsx", 1)]},
+        }
+
+        # Act
+        db.ensure_history_indexes(self.mock_db, 60)
+
+        # Assert
+        self.mock_collection.create_index.assert_not_called()
+        self.mock_db.command.assert_called_once_with(
+            "collMod", "command_history", index={"keyPattern": {"created_at": 1}, "expireAfterSeconds": 60 * 86400}
+        )
+
+    def test_ensure_history_indexes_replaces_timestamp_ttl(self):
+        """Test that a TTL on the local-time timestamp is replaced by a plain index and a created_at TTL."""
+        # Arrange
+        self.mock_collection.index_information.return_value = {
+            "timestamp_-1": {"key": [("timestamp", -1)], "expireAfterSeconds": 30 * 86400},
+        }
+
+        # Act
+        db.ensure_history_indexes(self.mock_db, 30)
+
+        # Assert
+        self.mock_collection.drop_index.assert_called_once_with([("timestamp", -1)])
+        self.mock_collection.create_index.assert_any_call([("timestamp", -1)])
+        self.mock_collection.create_index.assert_any_call([("created_at", 1)], expireAfterSeconds=30 * 86400)
+        self.mock_collection.update_many.assert_called_once()
+
+    def test_store_command_result_sets_utc_created_at(self):
+        """Test that documents carry the UTC time the TTL index expires them by."""
+        # Arrange
+        self.mock_collection.insert_one.return_value.inserted_id = "test_id"
+
+        # Act
+        with patch('db._indexed_databases', {"terminal_logger"}), patch('db.get_catalog'):
+            db.store_command_result(self.mock_db, {"command": "ls", "exit_code": 0})
+
+        # Assert
+        created_at = self.mock_collection.insert_one.call_args[0][0]["created_at"]
+        self.assertEqual(datetime.timezone.utc, created_at.tzinfo)
+        self.assertLess(abs(datetime.datetime.now(datetime.timezone.utc) - created_at), datetime.timedelta(minutes=1))
+
+    def test_get_collection_for_today(self):
+        """Test that all days share one collection, indexed once per process."""
+        # Act
+        with patch('db._indexed_databases', set()):
+            db.get_collection_for_today(self.mock_db)
+            collection = db.get_collection_for_today(self.mock_db)
+
+        # Assert
+        self.mock_db.__getitem__.assert_called_with("command_history")
+        self.assertEqual(self.mock_collection, collection)
+        self.mock_collection.index_information.assert_called_once()
+
+    def test_query_commands(self):
+        """Test that a query is a single cursor filtered on timestamp."""
+        # Arrange
+        self.mock_collection.find().sort().limit.return_value = [{"command": "ls"}]
+        self.mock_collection.find.reset_mock()
+
+        with patch('db.datetime') as mock_datetime:
+            mock_datetime.now.return_value = datetime.datetime(2023, 2, 15)
+
+            # Act
+            results = db.query_commands(self.mock_db, {"exit_code": 0}, 5, 30)
+
+        # Assert
+        self.assertEqual([{"command": "ls"}], results)
+        self.mock_collection.find.assert_called_once_with(
+            {"exit_code": 0, "timestamp": {"$gte": datetime.datetime(2023, 1, 16)}}, None
+        )
+        self.mock_db.list_collection_names.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
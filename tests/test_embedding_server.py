@@ -0,0 +1,128 @@
+"""Tests for the embedding server module."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import shutil
+import sys
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import embedding_server
+import vector_search
+
+
+class FakeModel:
+    """Stand-in for SentenceTransformer that records each encode call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        if isinstance(texts, str):
+            return self.encode([texts])[0]
+        self.calls.append(list(texts))
+        return np.array([[float(len(text)), 1.0] for text in texts])
+
+
+class TestEmbeddingServer(unittest.TestCase):
+    """Test cases for the embedding server."""
+
+    def setUp(self):
+        """Start a server with a fake model on a scratch socket."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, "embedding.sock")
+        self.model = FakeModel()
+        self.server = embedding_server.EmbeddingServer(self.model, self.socket_path, batch_size=64, batch_wait_ms=200)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def test_fetch_embeddings(self):
+        """Test embedding texts through the server."""
+        # Act
+        embeddings = embedding_server.fetch_embeddings(["ls", "git status"], self.socket_path)
+
+        # Assert
+        self.assertEqual([[2.0, 1.0], [10.0, 1.0]], embeddings)
+
+    def test_concurrent_requests_are_batched(self):
+        """Test that concurrent requests share a single encode call."""
+        # Arrange
+        texts = [f"command {i}" for i in range(8)]
+        results = {}
+
+        def request(text):
+            results[text] = embedding_server.fetch_embeddings([text], self.socket_path)
+
+        threads = [threading.Thread(target=request, args=(text,)) for text in texts]
+
+        # Act
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert
+        for text in texts:
+            self.assertEqual([[float(len(text)), 1.0]], results[text])
+        self.assertLess(len(self.model.calls), len(texts))
+        self.assertEqual(len(texts), sum(len(call) for call in self.model.calls))
+
+    def test_hung_model_times_out(self):
+        """Test that a request to a hung model gets an error instead of blocking forever."""
+        # Arrange
+        release = threading.Event()
+        self.addCleanup(release.set)
+        model = MagicMock()
+        model.encode.side_effect = lambda texts: release.wait() and np.zeros((len(texts), 2))
+        server = embedding_server.EmbeddingServer(model, os.path.join(self.tmp_dir, "hung.sock"), batch_wait_ms=0, request_timeout=0.1)
+        server.start()
+        self.addCleanup(server.stop)
+
+        # Act
+        with self.assertRaises(TimeoutError):
+            server.embed(["ls"])
+        embeddings = embedding_server.fetch_embeddings(["ls"], server.socket_path, timeout=2)
+
+        # Assert
+        self.assertIsNone(embeddings)
+
+    def test_fetch_embeddings_without_server(self):
+        """Test that a missing server is reported as unavailable."""
+        # Act & Assert
+        self.assertIsNone(embedding_server.fetch_embeddings(["ls"], os.path.join(self.tmp_dir, "missing.sock")))
+
+    def test_generate_embedding_uses_server(self):
+        """Test that generate_embedding prefers the server over a local model."""
+        # Act
+        with patch.object(embedding_server, 'DEFAULT_EMBEDDING_SOCKET', self.socket_path), \
+                patch('vector_search.get_model') as mock_get_model:
+            embedding = vector_search.generate_embedding("ls -la")
+
+        # Assert
+        self.assertEqual([6.0, 1.0], embedding)
+        mock_get_model.assert_not_called()
+
+    @patch('vector_search.fetch_embeddings', return_value=None)
+    @patch('vector_search.get_model')
+    def test_generate_embedding_falls_back_to_local_model(self, mock_get_model, mock_fetch):
+        """Test encoding in-process when the server is unavailable."""
+        # Arrange
+        mock_get_model.return_value = self.model
+
+        # Act
+        embedding = vector_search.generate_embedding("pwd")
+
+        # Assert
+        self.assertEqual([3.0, 1.0], embedding)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Tests for the memory-mapped embedding snapshots."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock, patch
+import sys
+
+import numpy as np
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import embedding_snapshots
+from vector_engine import EmbeddingMatrix
+
+
+def day_string(days_ago):
+    return (datetime.now() - timedelta(days=days_ago)).strftime("%Y_%m_%d")
+
+
+class TestEmbeddingSnapshots(unittest.TestCase):
+    """Test cases for exporting, loading and pruning snapshots."""
+
+    def setUp(self):
+        """Point the snapshot store at a temporary directory."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        patcher = patch.dict(embedding_snapshots._stores, {"terminal_logger": embedding_snapshots.SnapshotStore(self.tmp_dir)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.store = embedding_snapshots._stores["terminal_logger"]
+        self.mock_db = MagicMock()
+        self.mock_db.name = "terminal_logger"
+
+    def _matrix(self, rows, ids=None, seed=5):
+        vectors = np.random.default_rng(seed).normal(size=(rows, 8))
+        ids = ids or [ObjectId() for _ in range(rows)]
+        return EmbeddingMatrix.from_blocks([(vectors, [("command_history_2023_02_14", i) for i in ids])])
+
+    def test_save_and_memory_map(self):
+        """Test that a snapshot is memory-mapped and ranks like the matrix it was saved from."""
+        # Arrange
+        matrix = self._matrix(50)
+        self.store.save("2023_02_14", matrix)
+        query = np.random.default_rng(9).normal(size=8)
+
+        # Act
+        loaded = self.store.load("2023_02_14", "command_history_2023_02_14")
+
+        # Assert
+        self.assertEqual(["2023_02_14"], self.store.days())
+        self.assertIsInstance(loaded.matrix, np.memmap)
+        self.assertEqual(matrix.search(query, 5), loaded.search(query, 5))
+
+    def test_load_since_filters_by_id_time(self):
+        """Test that rows created before `since` are left out."""
+        # Arrange
+        start = datetime(2023, 2, 14, 12, 0)
+        early = ObjectId.from_datetime((start - timedelta(hours=1)).astimezone())
+        late = ObjectId.from_datetime((start + timedelta(hours=1)).astimezone())
+        self.store.save("2023_02_14", self._matrix(2, [early, late]))
+
+        # Act
+        loaded = self.store.load("2023_02_14", "command_history", since=start)
+
+        # Assert
+        self.assertEqual([("command_history", late)], [loaded.refs[i] for i in range(len(loaded))])
+
+    def test_missing_and_empty_snapshots(self):
+        """Test that a missing snapshot is None and an empty one has no rows."""
+        # Act
+        self.store.save("2023_02_14", EmbeddingMatrix.from_blocks([]))
+
+        # Assert
+        self.assertIsNone(self.store.load("2023_02_13", "command_history_2023_02_13"))
+        self.assertEqual(0, len(self.store.load("2023_02_14", "command_history_2023_02_14")))
+
+    def test_prune(self):
+        """Test that snapshots of days before the cutoff are deleted."""
+        # Arrange
+        self.store.save("2023_01_01", self._matrix(3))
+        self.store.save("2023_02_14", self._matrix(3))
+
+        # Act
+        removed = self.store.prune("2023_01_16")
+
+        # Assert
+        self.assertEqual(["2023_01_01"], removed)
+        self.assertEqual(["2023_02_14"], self.store.days())
+        self.assertEqual(["2023_02_14.ids.npy", "2023_02_14.npy"], sorted(os.listdir(self.tmp_dir)))
+
+    @patch('db.uses_single_collection', return_value=False)
+    @patch('embedding_snapshots.load_embeddings')
+    def test_export_closed_days(self, mock_load, mock_single):
+        """Test that only closed days within retention without a snapshot are exported."""
+        # Arrange
+        names = [f"command_history_{day_string(n)}" for n in (40, 2, 1, 0)]
+        mock_load.return_value = self._matrix(4)
+
+        # Act
+        with patch('collection_catalog.get_catalog') as mock_catalog:
+            mock_catalog.return_value.history_collections.return_value = names
+            pending = embedding_snapshots.export_closed_days(self.mock_db, 30, dry_run=True)
+            self.store.save(day_string(2), self._matrix(1))
+            exported = embedding_snapshots.export_closed_days(self.mock_db, 30)
+            again = embedding_snapshots.export_closed_days(self.mock_db, 30)
+
+        # Assert
+        self.assertEqual([day_string(2), day_string(1)], pending)
+        self.assertEqual([day_string(1)], exported)
+        self.assertEqual([], again)
+        mock_load.assert_called_once_with(self.mock_db, [names[2]], {})
+
+    @patch('db.uses_single_collection', return_value=False)
+    @patch('db.get_collections_in_date_range')
+    @patch('embedding_snapshots.load_embeddings')
+    def test_recent_embeddings_query_only_live_days(self, mock_load, mock_range, mock_single):
+        """Test that days with a snapshot are memory-mapped and only the others are queried."""
+        # Arrange
+        today, yesterday = f"command_history_{day_string(0)}", f"command_history_{day_string(1)}"
+        mock_range.return_value = [today, yesterday]
+        self.store.save(day_string(1), self._matrix(6))
+
+        # Act
+        matrices = embedding_snapshots.load_recent_embeddings(self.mock_db, datetime.now() - timedelta(days=30), dimensions=8)
+
+        # Assert
+        self.assertEqual(6, len(matrices[0]))
+        self.assertEqual(yesterday, matrices[0].refs[0][0])
+        mock_load.assert_called_once_with(self.mock_db, [today], {}, 8)
+
+    @patch('db.uses_single_collection', return_value=True)
+    @patch('embedding_snapshots.load_embeddings')
+    def test_recent_embeddings_single_collection(self, mock_load, mock_single):
+        """Test that the single collection is only queried after the snapshotted days."""
+        # Arrange
+        start = datetime.now() - timedelta(days=2)
+        for n in (2, 1):
+            self.store.save(day_string(n), self._matrix(3, seed=n))
+
+        # Act
+        matrices = embedding_snapshots.load_recent_embeddings(self.mock_db, start)
+
+        # Assert
+        self.assertEqual(3, len(matrices))
+        self.assertEqual("command_history", matrices[1].refs[0][0])
+        query = mock_load.call_args[0][2]
+        self.assertEqual(ObjectId.from_datetime(datetime.strptime(day_string(0), "%Y_%m_%d").astimezone()), query["_id"]["$gte"])
+        self.assertNotIn("$lt", query["_id"])
+
+
+if __name__ == '__main__':
+    unittest.main()
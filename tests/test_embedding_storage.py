@@ -0,0 +1,96 @@
+"""Tests for the embedding storage module."""
+
+import unittest
+import sys
+import os
+
+import bson
+import numpy as np
+from bson.binary import Binary
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import embedding_storage
+
+
+class TestEmbeddingStorage(unittest.TestCase):
+    """Test cases for embedding storage."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.vector = [0.25, -1.5, 3.0, 0.125]
+
+    def test_float32_round_trip(self):
+        """Test that float32 embeddings are stored as a binary numpy can read in place."""
+        # Act
+        encoded = embedding_storage.encode_embedding(self.vector, "float32")
+        decoded = embedding_storage.decode_embedding(encoded)
+
+        # Assert
+        self.assertEqual(embedding_storage.FLOAT32_SUBTYPE, encoded.subtype)
+        self.assertEqual(16, len(encoded))
+        self.assertEqual(np.float32, decoded.dtype)
+        np.testing.assert_array_equal(self.vector, decoded)
+        self.assertEqual(self.vector, embedding_storage.embedding_to_list(encoded))
+
+    def test_float16_round_trip(self):
+        """Test that float16 embeddings take half the space and decode to float32."""
+        # Arrange
+        vector = np.random.default_rng(1).normal(size=384).astype(np.float32)
+
+        # Act
+        encoded = embedding_storage.encode_embedding(vector, "float16")
+        decoded = embedding_storage.decode_embedding(encoded)
+
+        # Assert
+        self.assertEqual(768, len(encoded))
+        self.assertEqual(384, embedding_storage.embedding_length(encoded))
+        self.assertEqual(np.float32, decoded.dtype)
+        np.testing.assert_allclose(vector, decoded, rtol=1e-3)
+
+    def test_smaller_than_list_in_bson(self):
+        """Test that a binary embedding is a fraction of the size of a list of doubles."""
+        # Arrange
+        vector = [0.1] * 384
+
+        # Act
+        as_list = len(bson.encode({"vector_embedding": vector}))
+        as_binary = len(bson.encode({"vector_embedding": embedding_storage.encode_embedding(vector)}))
+
+        # Assert
+        self.assertLess(as_binary * 3, as_list)
+
+    def test_legacy_list(self):
+        """Test that embeddings stored as lists are still read."""
+        # Act & Assert
+        self.assertEqual(4, embedding_storage.embedding_length(self.vector))
+        self.assertEqual(0, embedding_storage.embedding_length(None))
+        self.assertFalse(embedding_storage.is_binary_embedding(self.vector))
+        self.assertFalse(embedding_storage.is_binary_embedding(Binary(b"\x00" * 4)))
+        np.testing.assert_array_equal(self.vector, embedding_storage.decode_embedding(self.vector))
+
+    def test_stack_mixed_formats(self):
+        """Test that binary and list embeddings stack into one writable matrix."""
+        # Arrange
+        other = [1.0, 2.0, 3.0, 4.0]
+        binary = [embedding_storage.encode_embedding(self.vector), embedding_storage.encode_embedding(other)]
+
+        # Act
+        fast = embedding_storage.stack_embeddings(binary, 4)
+        mixed = embedding_storage.stack_embeddings([binary[0], other], 4)
+
+        # Assert
+        np.testing.assert_array_equal([self.vector, other], fast)
+        np.testing.assert_array_equal([self.vector, other], mixed)
+        self.assertTrue(fast.flags.writeable)
+        self.assertEqual((0, 4), embedding_storage.stack_embeddings([], 4).shape)
+
+    def test_unsupported_dtype(self):
+        """Test that an unknown EMBEDDING_DTYPE is rejected."""
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            embedding_storage.encode_embedding(self.vector, "int8")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+"""Tests for the history statistics module."""
+
+import datetime
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+from io import StringIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import history_stats
+
+
+def group_row(command, category, bucket, count, failures=0, seconds=0.0):
+    return {"_id": {"command": command, "category": category, "bucket": bucket}, "count": count, "failures": failures, "seconds": seconds}
+
+
+def day_rows(groups, hours=()):
+    """Return an aggregate() side effect answering the group and hour pipelines of a day."""
+    def aggregate(pipeline, **kwargs):
+        return list(groups) if "command" in pipeline[1]["$group"]["_id"] else list(hours)
+    return aggregate
+
+
+class TestHistoryStats(unittest.TestCase):
+    """Test cases for history aggregation and rollups."""
+
+    def setUp(self):
+        """Set up a daily-layout database with two day collections."""
+        self.mock_db = MagicMock()
+        self.mock_db.list_collection_names.return_value = ["command_history_2023_02_13", "command_history_2023_02_14"]
+        self.rollups = MagicMock()
+        self.history = MagicMock()
+        self.mock_db.__getitem__.side_effect = lambda name: self.rollups if name == "command_rollups" else self.history
+        patcher = patch('history_stats.uses_single_collection', return_value=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_summarize_folds_commands_into_templates(self):
+        """Test that command lines sharing a template are counted together."""
+        # Arrange
+        rows = {
+            "groups": [
+                group_row("ls -la /tmp", "file", 0, 3, seconds=0.03),
+                group_row("ls -la ~/src", "file", 1, 1, seconds=0.07),
+                group_row("make test", "build", 6, 2, failures=1, seconds=12.0),
+            ],
+            "hours": [{"_id": 9, "count": 4}, {"_id": 17, "count": 2}],
+        }
+
+        # Act
+        summary = history_stats.summarize(rows)
+
+        # Assert
+        self.assertEqual(6, summary["total"])
+        self.assertEqual(1, summary["failures"])
+        self.assertEqual(4, summary["hours"][9])
+        groups = {(g["template"], g["category"]): g for g in summary["groups"]}
+        self.assertEqual(4, groups[("ls -la <path>", "file")]["count"])
+        self.assertEqual([3, 1], groups[("ls -la <path>", "file")]["histogram"][:2])
+        self.assertEqual(1, groups[("make test", "build")]["failures"])
+
+    def test_merge_summaries(self):
+        """Test that summaries of several days add up per template and category."""
+        # Arrange
+        day = history_stats.summarize({"groups": [group_row("git status", "vcs", 0, 2)], "hours": [{"_id": 10, "count": 2}]})
+
+        # Act
+        merged = history_stats.merge_summaries([day, day])
+
+        # Assert
+        self.assertEqual(4, merged["total"])
+        self.assertEqual(4, merged["hours"][10])
+        self.assertEqual([4], [g["histogram"][0] for g in merged["groups"]])
+        self.assertEqual(2, day["groups"][0]["histogram"][0])
+
+    def test_histogram_percentile(self):
+        """Test interpolating percentiles within histogram buckets."""
+        # Arrange
+        histogram = [0] * (len(history_stats.LATENCY_BUCKETS) + 1)
+        histogram[4] = 10  # 0.5 s to 1 s
+
+        # Act / Assert
+        self.assertAlmostEqual(0.75, history_stats.histogram_percentile(histogram, 0.5))
+        self.assertAlmostEqual(0.975, history_stats.histogram_percentile(histogram, 0.95))
+        histogram[-1] = 90
+        self.assertEqual(900, history_stats.histogram_percentile(histogram, 0.95))
+        self.assertEqual(0.0, history_stats.histogram_percentile([0, 0], 0.5))
+
+    def test_rollup_closed_days_skips_existing(self):
+        """Test that only closed days with history and no rollup are summarized."""
+        # Arrange
+        self.rollups.find.return_value = [{"_id": "2023_02_13", "total": 5}]
+        self.history.estimated_document_count.return_value = 5
+        self.history.aggregate.side_effect = day_rows([group_row("ls", "file", 0, 5)])
+
+        # Act
+        rolled_up = history_stats.rollup_closed_days(self.mock_db, 30, now=datetime.datetime(2023, 2, 15, 8))
+
+        # Assert
+        self.assertEqual(["2023_02_14"], rolled_up)
+        self.history.aggregate.assert_any_call(history_stats.day_summary_pipeline({}), allowDiskUse=True)
+        self.history.aggregate.assert_any_call(history_stats.day_hours_pipeline({}), allowDiskUse=True)
+        key, document = self.rollups.replace_one.call_args[0]
+        self.assertEqual({"_id": "2023_02_14"}, key)
+        self.assertEqual(5, document["total"])
+        self.assertTrue(self.rollups.replace_one.call_args[1]["upsert"])
+
+    def test_rollup_closed_days_redoes_grown_days(self):
+        """Test that a rolled-up day is summarized again once late commands arrive, but not when it shrinks."""
+        # Arrange
+        self.rollups.find.return_value = [{"_id": "2023_02_13", "total": 5}, {"_id": "2023_02_14", "total": 9}]
+        self.history.estimated_document_count.side_effect = [7, 4]
+        self.history.aggregate.side_effect = day_rows([group_row("ls", "file", 0, 7)])
+
+        # Act
+        rolled_up = history_stats.rollup_closed_days(self.mock_db, 30, now=datetime.datetime(2023, 2, 15, 8))
+
+        # Assert
+        self.assertEqual(["2023_02_13"], rolled_up)
+        self.assertEqual(7, self.rollups.replace_one.call_args[0][1]["total"])
+
+    def test_collect_summary_prefers_rollups(self):
+        """Test that closed days come from rollups and only the rest from raw history."""
+        # Arrange
+        rollup = history_stats.summarize({"groups": [group_row("ls", "file", 0, 7)]})
+        self.rollups.find.return_value = [{"_id": "2023_02_13", **rollup}]
+        self.history.aggregate.side_effect = day_rows([group_row("ls", "file", 0, 1)])
+
+        # Act
+        collected = history_stats.collect_summary(self.mock_db, 3, now=datetime.datetime(2023, 2, 15, 8))
+
+        # Assert
+        self.assertEqual(1, collected["rollups"])
+        self.assertEqual(1, collected["raw"])  # today has no collection yet
+        self.assertEqual(8, collected["summary"]["total"])
+
+    def test_single_layout_summarizes_by_timestamp(self):
+        """Test that the single collection is filtered on the day's timestamps."""
+        # Arrange
+        self.history.aggregate.side_effect = day_rows([], [{"_id": 15, "count": 2}])
+
+        # Act
+        with patch('history_stats.uses_single_collection', return_value=True):
+            summary = history_stats.summarize_day(self.mock_db, datetime.datetime(2023, 2, 14, 15))
+
+        # Assert
+        self.assertEqual(0, summary["total"])
+        self.assertEqual(2, summary["hours"][15])
+        match = self.history.aggregate.call_args[0][0][0]["$match"]
+        self.assertEqual(
+            {"timestamp": {"$gte": datetime.datetime(2023, 2, 14), "$lt": datetime.datetime(2023, 2, 15)}}, match
+        )
+
+    @patch('history_stats.connect_to_mongodb')
+    @patch('history_stats.collect_summary')
+    @patch('sys.argv', ['history_stats.py', '--days', '7'])
+    def test_main_function(self, mock_collect, mock_connect):
+        """Test printing the reports."""
+        # Arrange
+        summary = history_stats.summarize({
+            "groups": [group_row("make test", "build", 6, 4, failures=1, seconds=14.0)],
+            "hours": [{"_id": 9, "count": 4}],
+        })
+        mock_collect.return_value = {"summary": summary, "rollups": 6, "raw": 1}
+
+        # Act
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            result = history_stats.main()
+            output = fake_out.getvalue()
+
+        # Assert
+        self.assertEqual(0, result)
+        self.assertIn("Last 7 days: 4 commands, 1 failed (25.0%)", output)
+        self.assertIn("Read 6 days from rollups, aggregated 1 from raw history", output)
+        self.assertIn("make test", output)
+        self.assertIn("09:00", output)
+
+
+if __name__ == '__main__':
+    unittest.main()
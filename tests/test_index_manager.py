@@ -0,0 +1,105 @@
+"""Tests for the index manager module."""
+
+import datetime
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import index_manager
+from collection_catalog import CollectionCatalog
+
+
+class TestIndexManager(unittest.TestCase):
+    """Test cases for day collection indexes."""
+
+    def setUp(self):
+        """Set up a database whose collections only have the _id index."""
+        self.collections = {}
+        self.mock_db = MagicMock()
+        self.mock_db.__getitem__.side_effect = self._collection
+        self.mock_db.list_collection_names.return_value = ["command_history_2023_02_14"]
+
+    def _collection(self, name):
+        if name not in self.collections:
+            collection = MagicMock()
+            collection.index_information.return_value = {"_id_": {"key": [("_id", 1)]}}
+            collection.create_indexes.side_effect = lambda models: [model.document["name"] for model in models]
+            self.collections[name] = collection
+        return self.collections[name]
+
+    def test_missing_indexes(self):
+        """Test comparing existing indexes with the required ones."""
+        # Arrange
+        collection = self._collection("command_history_2023_02_14")
+        collection.index_information.return_value = {
+            "_id_": {"key": [("_id", 1)]},
+            "timestamp_-1__id_-1": {"key": [("timestamp", -1), ("_id", -1)]},
+            "exit_code_1_timestamp_-1": {"key": [("exit_code", 1), ("timestamp", -1.0)]},
+        }
+
+        # Act
+        missing = index_manager.missing_indexes(collection)
+
+        # Assert
+        self.assertEqual(
+            ["ai_category+timestamp", "dir+timestamp", "command+ai_description"],
+            [index_manager.format_index(keys) for keys in missing],
+        )
+
+    def test_text_index_matched_by_internal_key(self):
+        """Test that an existing text index is recognised, whatever fields it reports."""
+        # Arrange
+        collection = self._collection("command_history_2023_02_14")
+        collection.index_information.return_value = {
+            "_id_": {"key": [("_id", 1)]},
+            "command_text_ai_description_text": {"key": [("_fts", "text"), ("_ftsx", 1)]},
+        }
+
+        # Act
+        missing = index_manager.missing_indexes(collection)
+
+        # Assert
+        self.assertNotIn(index_manager.TEXT_INDEX, missing)
+        self.assertEqual({"weights": index_manager.TEXT_INDEX_WEIGHTS}, index_manager.index_options(index_manager.TEXT_INDEX))
+
+    def test_provision_today_and_tomorrow(self):
+        """Test that today's and tomorrow's collections are indexed ahead of time."""
+        # Arrange
+        catalog = CollectionCatalog(self.mock_db)
+        catalog.history_collections()
+
+        # Act
+        with patch('index_manager.get_catalog', return_value=catalog):
+            created = index_manager.provision_day_collections(self.mock_db, now=datetime.datetime(2023, 2, 14, 23, 50))
+
+        # Assert
+        self.assertEqual(["command_history_2023_02_14", "command_history_2023_02_15"], sorted(created))
+        self.assertEqual(
+            ["timestamp_-1__id_-1", "exit_code_1_timestamp_-1", "ai_category_1_timestamp_-1", "dir_1_timestamp_-1",
+             "command_text_ai_description_text"],
+            created["command_history_2023_02_15"],
+        )
+        self.assertIn("command_history_2023_02_15", catalog)
+
+    def test_check_and_repair(self):
+        """Test reporting and repairing missing indexes on old days."""
+        # Arrange
+        catalog = CollectionCatalog(self.mock_db)
+
+        # Act
+        with patch('index_manager.get_catalog', return_value=catalog):
+            report = index_manager.check_day_collections(self.mock_db)
+            self.collections["command_history_2023_02_14"].create_indexes.assert_not_called()
+            index_manager.check_day_collections(self.mock_db, repair=True)
+
+        # Assert
+        self.assertEqual(["command_history_2023_02_14"], list(report))
+        self.assertEqual(5, len(report["command_history_2023_02_14"]))
+        self.collections["command_history_2023_02_14"].create_indexes.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
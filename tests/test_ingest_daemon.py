@@ -0,0 +1,206 @@
+"""Tests for the ingestion daemon module."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import datetime
+import shutil
+import sys
+import os
+import tempfile
+import time
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import ingest_daemon
+
+
+class TestIngestDaemon(unittest.TestCase):
+    """Test cases for the ingestion daemon."""
+
+    def setUp(self):
+        """Set up a scratch directory for the socket and spool."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, "ingest.sock")
+        self.spool_dir = os.path.join(self.tmp_dir, "spool")
+        self.result = {
+            "command": "echo test",
+            "exit_code": 0,
+            "stdout": "test\n",
+            "stderr": "",
+            "execution_time_seconds": 0.1,
+            "timestamp": datetime.datetime(2023, 2, 15, 12, 0),
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_payload_round_trip(self):
+        """Test that payloads survive encoding, including datetimes."""
+        # Act
+        payload = ingest_daemon.decode_payload(ingest_daemon.encode_payload(self.result, "test_model", True))
+
+        # Assert
+        self.assertEqual(self.result, payload["result"])
+        self.assertEqual({"ai_model": "test_model", "no_ai": True}, payload["options"])
+
+    def test_submit_result_spools_without_daemon(self):
+        """Test that results are spooled when the daemon is not running."""
+        # Act
+        mode = ingest_daemon.submit_result(self.result, socket_path=self.socket_path, spool_dir=self.spool_dir)
+
+        # Assert
+        self.assertEqual("spool", mode)
+        spooled = ingest_daemon.list_spool(self.spool_dir)
+        self.assertEqual(1, len(spooled))
+        with open(spooled[0], "rb") as fh:
+            self.assertEqual(self.result, ingest_daemon.decode_payload(fh.read())["result"])
+
+    @patch('ingest_daemon.annotate_payloads')
+    @patch('ingest_daemon.process_payload')
+    def test_submit_result_to_daemon(self, mock_process, mock_annotate):
+        """Test that a running daemon accepts and ingests results."""
+        # Arrange
+        mock_db = MagicMock()
+        daemon = ingest_daemon.IngestDaemon(mock_db, self.socket_path, self.spool_dir, scan_interval=60)
+        daemon.start()
+
+        try:
+            # Act
+            mode = ingest_daemon.submit_result(self.result, "test_model", socket_path=self.socket_path, spool_dir=self.spool_dir)
+
+            deadline = time.time() + 5
+            while not mock_process.called and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            daemon.stop()
+
+        # Assert
+        self.assertEqual("daemon", mode)
+        mock_process.assert_called_once()
+        db_arg, payload = mock_process.call_args[0]
+        self.assertIs(mock_db, db_arg)
+        self.assertEqual(self.result, payload["result"])
+        self.assertEqual([], ingest_daemon.list_spool(self.spool_dir))
+
+    @patch('ingest_daemon.annotate_payloads')
+    @patch('ingest_daemon.process_payload')
+    def test_drain_spool(self, mock_process, mock_annotate):
+        """Test draining results spooled while the daemon was down."""
+        # Arrange
+        for _ in range(3):
+            ingest_daemon.submit_result(self.result, socket_path=self.socket_path, spool_dir=self.spool_dir)
+        daemon = ingest_daemon.IngestDaemon(MagicMock(), self.socket_path, self.spool_dir)
+
+        # Act
+        ingested = daemon.drain()
+
+        # Assert
+        self.assertEqual(3, ingested)
+        self.assertEqual(3, mock_process.call_count)
+        mock_annotate.assert_called_once()
+        self.assertEqual(3, len(mock_annotate.call_args[0][0]))
+        self.assertEqual([], ingest_daemon.list_spool(self.spool_dir))
+
+    @patch('ingest_daemon.annotate_payloads')
+    @patch('ingest_daemon.process_payload')
+    @patch('ingest_daemon.RETRY_BACKOFF_SECONDS', 0)
+    def test_drain_spool_retries_after_outage(self, mock_process, mock_annotate):
+        """Test that a payload failing on connection errors stays spooled until it is ingested."""
+        # Arrange
+        outage = ServerSelectionTimeoutError("localhost:27017: connection refused")
+        mock_process.side_effect = [outage, outage, outage, "id"]
+        ingest_daemon.submit_result(self.result, socket_path=self.socket_path, spool_dir=self.spool_dir)
+        daemon = ingest_daemon.IngestDaemon(MagicMock(), self.socket_path, self.spool_dir)
+
+        # Act
+        with patch('sys.stderr'):
+            failed = [daemon.drain() for _ in range(3)]
+            ingested = daemon.drain()
+
+        # Assert
+        self.assertEqual([0, 0, 0], failed)
+        self.assertEqual(1, ingested)
+        self.assertEqual(self.result, mock_process.call_args[0][1]["result"])
+        self.assertEqual([], ingest_daemon.list_spool(self.spool_dir))
+        self.assertFalse(os.path.exists(os.path.join(self.spool_dir, "failed")))
+
+    @patch('ingest_daemon.annotate_payloads')
+    @patch('ingest_daemon.process_payload', side_effect=ConnectionError("Ollama unavailable"))
+    def test_failed_payload_waits_for_retry(self, mock_process, mock_annotate):
+        """Test that the scanner does not queue a failed payload again before its retry time."""
+        # Arrange
+        ingest_daemon.submit_result(self.result, socket_path=self.socket_path, spool_dir=self.spool_dir)
+        daemon = ingest_daemon.IngestDaemon(MagicMock(), self.socket_path, self.spool_dir)
+        with patch('sys.stderr'):
+            daemon.drain()
+
+        # Act
+        queued = daemon.scan_spool()
+
+        # Assert
+        self.assertEqual(0, queued)
+        self.assertEqual(1, len(ingest_daemon.list_spool(self.spool_dir)))
+
+    @patch('ingest_daemon.annotate_payloads')
+    @patch('ingest_daemon.process_payload')
+    def test_undecodable_payload_is_set_aside(self, mock_process, mock_annotate):
+        """Test that only payloads that cannot be decoded are moved to failed/."""
+        # Arrange
+        ingest_daemon.spool_payload(b"not json", self.spool_dir)
+        daemon = ingest_daemon.IngestDaemon(MagicMock(), self.socket_path, self.spool_dir)
+
+        # Act
+        with patch('sys.stderr'):
+            ingested = daemon.drain()
+
+        # Assert
+        self.assertEqual(0, ingested)
+        mock_process.assert_not_called()
+        self.assertEqual([], ingest_daemon.list_spool(self.spool_dir))
+        self.assertEqual(1, len(os.listdir(os.path.join(self.spool_dir, "failed"))))
+
+    @patch('vector_search.add_vector_to_result', side_effect=lambda result: result)
+    @patch('db.store_command_result')
+    def test_process_payload_no_ai(self, mock_store, mock_vector):
+        """Test processing a payload with AI analysis disabled."""
+        # Arrange
+        mock_db = MagicMock()
+        mock_store.return_value = "test_id"
+        payload = {"result": dict(self.result), "options": {"ai_model": None, "no_ai": True}}
+
+        # Act
+        record_id = ingest_daemon.process_payload(mock_db, payload)
+
+        # Assert
+        self.assertEqual("test_id", record_id)
+        stored = mock_store.call_args[0][1]
+        self.assertEqual("uncategorized", stored["ai_category"])
+        self.assertEqual("AI analysis skipped", stored["ai_description"])
+
+    @patch('ai_integration.categorize_commands')
+    def test_annotate_payloads_batches_by_model(self, mock_categorize):
+        """Test that commands are categorized in one call per model."""
+        # Arrange
+        mock_categorize.side_effect = lambda commands, model: [("category", f"{model}: {c}") for c in commands]
+        payloads = [
+            {"result": {"command": "ls"}, "options": {"ai_model": "a", "no_ai": False}},
+            {"result": {"command": "pwd"}, "options": {"ai_model": "a", "no_ai": False}},
+            {"result": {"command": "make"}, "options": {"ai_model": "b", "no_ai": False}},
+            {"result": {"command": "true"}, "options": {"ai_model": "a", "no_ai": True}},
+        ]
+
+        # Act
+        ingest_daemon.annotate_payloads(payloads)
+
+        # Assert
+        self.assertEqual(2, mock_categorize.call_count)
+        mock_categorize.assert_any_call(["ls", "pwd"], "a")
+        mock_categorize.assert_any_call(["make"], "b")
+        self.assertEqual("a: pwd", payloads[1]["result"]["ai_description"])
+        self.assertNotIn("ai_category", payloads[3]["result"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -57,20 +57,12 @@ class TestMaintainDB(unittest.TestCase):
             "some_other_collection"
         ]
         
-        # Mock collection document counts
-        coll1 = MagicMock()
-        coll1.count_documents.return_value = 10
-        coll2 = MagicMock()
-        coll2.count_documents.return_value = 20
-        
-        def get_collection(name):
-            if name == "command_history_2023_01_01":
-                return coll1
-            elif name == "command_history_2023_02_01":
-                return coll2
-            return MagicMock()
-            
-        mock_db.__getitem__.side_effect = get_collection
+        # Mock collection statistics
+        stats = {
+            "command_history_2023_01_01": {"count": 10, "size": 2048, "storageSize": 4096, "totalIndexSize": 4096},
+            "command_history_2023_02_01": {"count": 20, "size": 4096, "storageSize": 8192, "totalIndexSize": 4096},
+        }
+        mock_db.command.side_effect = lambda command, name: stats[name]
         
         # Mock current date to 2023-03-01
         mock_datetime.now.return_value.strftime.return_value = "2023-03-01 00:00:00"
@@ -101,11 +93,112 @@ class TestMaintainDB(unittest.TestCase):
                 self.assertIn("Terminal Logger Database Maintenance", output)
                 self.assertIn("Dry run: Yes", output)
                 self.assertIn("Found 2 command history collections:", output)
-                self.assertIn("command_history_2023_01_01: 10 documents", output)
-                self.assertIn("command_history_2023_02_01: 20 documents", output)
-                self.assertIn("Would remove 1 collections:", output)
-                self.assertIn("command_history_2023_01_01: 10 documents", output)
+                self.assertIn("command_history_2023_01_01: 10 documents, 2.0 KB (8.0 KB on disk)", output)
+                self.assertIn("command_history_2023_02_01: 20 documents, 4.0 KB (12.0 KB on disk)", output)
+                self.assertIn("Would remove 1 collections, freeing 8.0 KB:", output)
+                self.assertEqual(2, mock_db.command.call_count)
+                mock_db.__getitem__.return_value.count_documents.assert_not_called()
+
+    @patch('maintain_db.connect_to_mongodb')
+    @patch('maintain_db.check_day_collections')
+    @patch('sys.argv', ['maintain_db.py', '--dry-run', '--repair-indexes'])
+    def test_main_function_check_indexes(self, mock_check, mock_connect):
+        """Test that missing indexes are only reported during a dry run."""
+        # Arrange
+        mock_db = MagicMock()
+        mock_db.list_collection_names.return_value = []
+        mock_connect.return_value = mock_db
+        mock_check.return_value = {"command_history_2023_01_01": [[("dir", 1), ("timestamp", -1)]]}
+
+        # Act
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            result = maintain_db.main()
+
+        # Assert
+        self.assertEqual(0, result)
+        mock_check.assert_called_once_with(mock_db, repair=False)
+        output = fake_out.getvalue()
+        self.assertIn("1 collections with missing indexes:", output)
+        self.assertIn("command_history_2023_01_01: dir+timestamp", output)
+
+    @patch('maintain_db.connect_to_mongodb')
+    @patch('maintain_db.clean_old_collections', return_value=[])
+    @patch('maintain_db.provision_day_collections', return_value={})
+    @patch('maintain_db.rollup_closed_days', return_value=["2023_02_13", "2023_02_14"])
+    @patch('maintain_db.prune_rollups', return_value=3)
+    @patch('sys.argv', ['maintain_db.py', '--retention', '14'])
+    def test_main_rolls_up_before_cleaning(self, mock_prune, mock_rollup, mock_provision, mock_clean, mock_connect):
+        """Test that closed days are rolled up before old history is removed."""
+        # Arrange
+        order = MagicMock()
+        order.attach_mock(mock_rollup, "rollup")
+        order.attach_mock(mock_clean, "clean")
+
+        # Act
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            maintain_db.main()
+            output = fake_out.getvalue()
+
+        # Assert
+        self.assertEqual(["rollup", "clean"], [name for name, _, _ in order.mock_calls])
+        mock_rollup.assert_called_once_with(mock_connect.return_value, 14)
+        self.assertIn("Rolled up 2 days: 2023_02_13, 2023_02_14", output)
+        self.assertIn("Removed 3 rollups past ROLLUP_RETENTION_DAYS", output)
+
+    @patch('maintain_db.connect_to_mongodb')
+    @patch('maintain_db.migrate_embeddings', return_value={"command_history_2023_02_14": 12})
+    @patch('sys.argv', ['maintain_db.py', '--dry-run', '--migrate-embeddings'])
+    def test_main_migrate_embeddings_dry_run(self, mock_migrate, mock_connect):
+        """Test that a dry run only counts the list embeddings to convert."""
+        # Arrange
+        mock_connect.return_value.list_collection_names.return_value = []
+
+        # Act
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            maintain_db.main()
+            output = fake_out.getvalue()
+
+        # Assert
+        mock_migrate.assert_called_once_with(mock_connect.return_value, dry_run=True)
+        self.assertIn("Would convert 12 list embeddings to binary:", output)
+        self.assertIn("command_history_2023_02_14: 12", output)
+
+    @patch('maintain_db.connect_to_mongodb')
+    @patch('maintain_db.clean_old_collections')
+    @patch('maintain_db.DEFAULT_VECTOR_QUANTIZATION', 'int4')
+    @patch('sys.argv', ['maintain_db.py'])
+    def test_main_rejects_unknown_quantization(self, mock_clean, mock_connect):
+        """Test that an unsupported VECTOR_QUANTIZATION stops maintenance before anything is removed."""
+        # Act
+        with patch('sys.stdout', new=StringIO()), patch('sys.stderr', new=StringIO()) as fake_err:
+            exit_code = maintain_db.main()
+
+        # Assert
+        self.assertEqual(1, exit_code)
+        self.assertIn("int4", fake_err.getvalue())
+        mock_connect.assert_not_called()
+        mock_clean.assert_not_called()
+
+    @patch('maintain_db.connect_to_mongodb')
+    @patch('maintain_db.clean_old_collections', return_value=[])
+    @patch('maintain_db.provision_day_collections', return_value={})
+    @patch('maintain_db.rollup_closed_days', return_value=[])
+    @patch('maintain_db.prune_rollups', return_value=0)
+    @patch('maintain_db.export_closed_days', return_value=[])
+    @patch('maintain_db.quantize_snapshots', return_value=["2023_02_14"])
+    @patch('maintain_db.DEFAULT_EMBEDDING_SNAPSHOTS', True)
+    @patch('maintain_db.DEFAULT_VECTOR_QUANTIZATION', 'pq')
+    @patch('sys.argv', ['maintain_db.py', '--retrain-quantizer'])
+    def test_main_retrain_quantizer(self, mock_quantize, *mocks):
+        """Test that --retrain-quantizer retrains and re-encodes the snapshots."""
+        # Act
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            exit_code = maintain_db.main()
 
+        # Assert
+        self.assertEqual(0, exit_code)
+        mock_quantize.assert_called_once_with(mocks[-1].return_value, retrain=True)
+        self.assertIn("Quantized (pq) the embeddings of 1 days", fake_out.getvalue())
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+"""Tests for the history migration module."""
+
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import migrate_history
+
+
+class TestMigrateHistory(unittest.TestCase):
+    """Test cases for copying day collections."""
+
+    def setUp(self):
+        """Set up a source day collection and the target collection."""
+        self.source = MagicMock()
+        self.source.find.return_value = [{"_id": ObjectId(), "command": f"echo {i}"} for i in range(5)]
+        self.target = MagicMock()
+        self.mock_db = MagicMock()
+        self.mock_db.__getitem__.side_effect = lambda name: self.target if name == "command_history" else self.source
+
+    def test_copy_in_batches(self):
+        """Test that documents are copied with unordered bulk inserts."""
+        # Arrange
+        self.target.insert_many.side_effect = lambda batch, ordered: MagicMock(inserted_ids=[d["_id"] for d in batch])
+
+        # Act
+        counts = migrate_history.copy_collection(self.mock_db, "command_history_2023_01_01", batch_size=2)
+
+        # Assert
+        self.assertEqual({"copied": 5, "skipped": 0}, counts)
+        self.assertEqual(3, self.target.insert_many.call_count)
+        self.assertFalse(self.target.insert_many.call_args[1]["ordered"])
+        document = self.target.insert_many.call_args[0][0][0]
+        self.assertEqual(document["_id"].generation_time, document["created_at"])
+
+    def test_rerun_skips_copied_documents(self):
+        """Test that duplicate keys from an earlier run are skipped."""
+        # Arrange
+        self.target.insert_many.side_effect = BulkWriteError({
+            "nInserted": 2,
+            "writeErrors": [{"code": 11000}, {"code": 11000}, {"code": 11000}],
+        })
+
+        # Act
+        counts = migrate_history.copy_collection(self.mock_db, "command_history_2023_01_01")
+
+        # Assert
+        self.assertEqual({"copied": 2, "skipped": 3}, counts)
+
+    def test_other_write_errors_raise(self):
+        """Test that errors other than duplicates are not swallowed."""
+        # Arrange
+        self.target.insert_many.side_effect = BulkWriteError({"nInserted": 0, "writeErrors": [{"code": 2}]})
+
+        # Act & Assert
+        with self.assertRaises(BulkWriteError):
+            migrate_history.copy_collection(self.mock_db, "command_history_2023_01_01")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+"""Tests for the nearest-neighbour classifier module."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import neighbour_classifier
+from analysis_cache import AnalysisCache
+from neighbour_classifier import NeighbourClassifier
+
+
+def labelled(command, category, vector, description=""):
+    return {"command": command, "ai_category": category, "ai_description": description, "vector_embedding": vector}
+
+
+class TestNeighbourClassifier(unittest.TestCase):
+    """Test cases for nearest-neighbour categorization."""
+
+    def setUp(self):
+        """Build a classifier over a few labelled commands."""
+        self.candidates = [
+            labelled("git push origin main", "version control", [1.0, 0.0, 0.0], "Pushes commits."),
+            labelled("git push origin dev", "version_control", [0.95, 0.05, 0.0]),
+            labelled("git pull", "Version Control", [0.9, 0.1, 0.0]),
+            labelled("curl example.com", "network", [0.0, 1.0, 0.0], "Fetches a URL."),
+            labelled("wget example.com", "network", [0.1, 0.9, 0.0]),
+        ]
+        self.classifier = NeighbourClassifier(MagicMock(), k=3, min_similarity=0.5, refresh_seconds=3600)
+        self.classifier.set_candidates(self.candidates)
+
+    def test_weighted_vote(self):
+        """Test that the closest neighbours vote, with spelling variants of a category merged."""
+        # Act
+        prediction = self.classifier.predict("git push origin feature", [1.0, 0.02, 0.0])
+
+        # Assert
+        self.assertEqual("version control", prediction.category)
+        self.assertEqual("Pushes commits.", prediction.description)
+        self.assertAlmostEqual(1.0, prediction.confidence)
+        self.assertEqual("neighbours", prediction.source)
+
+    def test_mixed_neighbours_lower_confidence(self):
+        """Test that confidence is the winner's share of the similarity."""
+        # Arrange
+        classifier = NeighbourClassifier(MagicMock(), k=5, min_similarity=0.5, refresh_seconds=3600)
+        classifier.set_candidates(self.candidates)
+
+        # Act
+        result = classifier.predict("curl git.example.com", [0.6, 0.8, 0.0])
+
+        # Assert
+        self.assertEqual("version control", result.category.lower())
+        self.assertLess(result.confidence, 0.8)
+
+    def test_no_similar_neighbours(self):
+        """Test abstaining when nothing is similar enough."""
+        # Act & Assert
+        self.assertIsNone(self.classifier.predict("make", [0.0, 0.0, 1.0]))
+
+    @patch('vector_search.create_command_vector', return_value=[0.05, 1.0, 0.0])
+    def test_shadow_mode_counts_agreement(self, mock_vector):
+        """Test that shadow mode never answers but records agreement with Ollama."""
+        # Arrange
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        cache = AnalysisCache(os.path.join(tmp_dir, "cache.sqlite3"))
+        self.addCleanup(cache.close)
+        self.classifier.shadow = True
+
+        # Act
+        self.assertIsNone(self.classifier("curl example.org"))
+        self.classifier.observe("curl example.org", "Network", cache)
+        self.assertIsNone(self.classifier("wget example.org"))
+        self.classifier.observe("wget example.org", "file management", cache)
+
+        # Assert
+        counters = cache.counters()
+        self.assertEqual(1, counters["neighbours.agree"])
+        self.assertEqual(1, counters["neighbours.disagree"])
+
+    def test_evaluate_leave_one_out(self):
+        """Test that each command is embedded alone and voted on without its own row."""
+        # Arrange
+        self.classifier.load_candidates = MagicMock(return_value=self.candidates)
+        self.classifier.k = 1
+        command_vectors = {
+            "git push origin main": [0.9, 0.1, 0.0],
+            "git push origin dev": [1.0, 0.0, 0.0],
+            "git pull": [1.0, 0.0, 0.0],
+            "curl example.com": [0.1, 0.9, 0.0],
+            "wget example.com": [0.0, 1.0, 0.0],
+        }
+
+        # Act
+        with patch('vector_search.generate_embeddings', side_effect=lambda texts: [command_vectors[t] for t in texts]) as mock_embed:
+            report = neighbour_classifier.evaluate(self.classifier, 0.8)
+
+        # Assert
+        mock_embed.assert_called_once_with(list(command_vectors))
+        self.assertEqual(5, report["total"])
+        self.assertEqual(5, report["answered"])
+        self.assertEqual(5, report["agreed"])
+
+    def test_evaluate_masks_held_out_row(self):
+        """Test that a command with no other similar neighbour is not answered from its own row."""
+        # Arrange
+        candidates = self.candidates + [labelled("make", "build", [0.0, 0.0, 1.0])]
+        self.classifier.load_candidates = MagicMock(return_value=candidates)
+        self.classifier.k = 1
+        vectors = {doc["command"]: doc["vector_embedding"] for doc in candidates}
+
+        # Act
+        with patch('vector_search.generate_embeddings', side_effect=lambda texts: [vectors[t] for t in texts]):
+            report = neighbour_classifier.evaluate(self.classifier, 0.8)
+
+        # Assert
+        self.assertEqual(6, report["total"])
+        self.assertEqual(5, report["answered"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Tests for the output storage module."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import output_storage
+
+
+class TestOutputStorage(unittest.TestCase):
+    """Test cases for output storage."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.mock_db = MagicMock()
+        self.long_output = "line of build output\n" * 5000
+
+    def test_truncate_output(self):
+        """Test head/tail truncation of long output."""
+        # Act
+        truncated = output_storage.truncate_output("a" * 10 + "b" * 80 + "c" * 10, 10, 10)
+
+        # Assert
+        self.assertEqual("a" * 10 + "\n... [80 bytes truncated] ...\n" + "c" * 10, truncated)
+        self.assertEqual("short", output_storage.truncate_output("short", 10, 10))
+
+    def test_encode_short_output(self):
+        """Test that short output is stored as a plain string."""
+        # Act
+        encoded = output_storage.encode_output(self.mock_db, "total 0\n", "command_history_2023_02_15")
+
+        # Assert
+        self.assertEqual("total 0\n", encoded)
+
+    @patch.object(output_storage, 'DEFAULT_OUTPUT_COMPRESSION', 'gzip')
+    def test_encode_inline_gzip(self):
+        """Test compressing long output inline."""
+        # Act
+        encoded = output_storage.encode_output(self.mock_db, self.long_output, "command_history_2023_02_15")
+
+        # Assert
+        self.assertEqual("gzip", encoded["encoding"])
+        self.assertNotIn("gridfs_id", encoded)
+        self.assertLess(len(encoded["data"]), len(self.long_output))
+        self.assertEqual(self.long_output[:100], encoded["preview"])
+        self.assertEqual(self.long_output, output_storage.decode_output(encoded))
+
+    @unittest.skipIf(output_storage.zstandard is None, "zstandard is not installed")
+    @patch.object(output_storage, 'DEFAULT_OUTPUT_COMPRESSION', 'zstd')
+    def test_encode_inline_zstd(self):
+        """Test compressing long output with zstd."""
+        # Act
+        encoded = output_storage.encode_output(self.mock_db, self.long_output, "command_history_2023_02_15")
+
+        # Assert
+        self.assertEqual("zstd", encoded["encoding"])
+        self.assertEqual(self.long_output, output_storage.decode_output(encoded))
+
+    @patch.object(output_storage, 'DEFAULT_OUTPUT_COMPRESSION', 'gzip')
+    @patch.object(output_storage, 'DEFAULT_GRIDFS_THRESHOLD', 0)
+    @patch('output_storage.GridFSBucket')
+    def test_encode_spills_to_gridfs(self, mock_bucket_class):
+        """Test that output above the threshold is stored in GridFS."""
+        # Arrange
+        mock_bucket = mock_bucket_class.return_value
+        mock_bucket.upload_from_stream.return_value = "file_id"
+
+        # Act
+        encoded = output_storage.encode_output(self.mock_db, self.long_output, "command_history_2023_02_15")
+
+        # Assert
+        self.assertEqual("file_id", encoded["gridfs_id"])
+        self.assertNotIn("data", encoded)
+        kwargs = mock_bucket.upload_from_stream.call_args[1]
+        self.assertEqual("2023_02_15", kwargs["metadata"]["day"])
+
+        # Decoding reads the file back from GridFS
+        compressed = mock_bucket.upload_from_stream.call_args[0][1]
+        mock_bucket.open_download_stream.return_value.read.return_value = compressed
+        self.assertEqual(self.long_output, output_storage.decode_output(encoded, self.mock_db))
+        mock_bucket.open_download_stream.assert_called_once_with("file_id")
+
+    def test_output_preview(self):
+        """Test previews of plain and encoded output."""
+        # Act & Assert
+        self.assertEqual(("abc", False), output_storage.output_preview("abc", 100))
+        self.assertEqual(("a" * 100, True), output_storage.output_preview("a" * 101, 100))
+        self.assertEqual(("start", True), output_storage.output_preview({"preview": "start", "length": 5000}, 100))
+
+    def test_prepare_result_for_storage(self):
+        """Test that only the output fields are encoded and the input is not modified."""
+        # Arrange
+        result = {"command": "ls", "stdout": self.long_output, "stderr": "", "exit_code": 0}
+
+        # Act
+        with patch.object(output_storage, 'DEFAULT_OUTPUT_COMPRESSION', 'gzip'):
+            prepared = output_storage.prepare_result_for_storage(self.mock_db, result, "command_history_2023_02_15")
+
+        # Assert
+        self.assertEqual(self.long_output, result["stdout"])
+        self.assertEqual("gzip", prepared["stdout"]["encoding"])
+        self.assertEqual("", prepared["stderr"])
+        self.assertEqual("ls", prepared["command"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+"""Tests for scalar and product quantization of embeddings."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import sys
+
+import numpy as np
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import quantization
+from embedding_snapshots import SnapshotStore
+from vector_engine import EmbeddingMatrix, normalize_rows
+
+
+def clustered_vectors(count, dimensions=32, clusters=20, seed=3):
+    """Return normalized vectors scattered around random cluster centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dimensions))
+    return normalize_rows((centres[rng.integers(clusters, size=count)] + 0.3 * rng.normal(size=(count, dimensions))).astype(np.float32))
+
+
+def recall(matrix, exact, queries, k=10):
+    found = sum(len({ref for ref, _ in exact.search(q, k)} & {ref for ref, _ in matrix.search(q, k)}) for q in queries)
+    return found / (k * len(queries))
+
+
+class TestQuantization(unittest.TestCase):
+    """Test cases for the quantizers and asymmetric scoring."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.vectors = clustered_vectors(3000)
+        self.refs = list(range(3000))
+        self.exact = EmbeddingMatrix(self.vectors, self.refs)
+        self.queries = clustered_vectors(20, seed=11)
+
+    def test_scalar_quantizer(self):
+        """Test that int8 codes decode closely and score like the float vectors."""
+        # Arrange
+        quantizer = quantization.ScalarQuantizer.train(self.vectors)
+
+        # Act
+        codes = quantizer.encode(self.vectors)
+        scores = quantizer.scores(codes, self.queries[0])
+
+        # Assert
+        self.assertEqual(np.int8, codes.dtype)
+        self.assertEqual(self.vectors.shape, codes.shape)
+        self.assertLess(np.abs(quantizer.decode(codes) - self.vectors).max(), quantizer.scale.max())
+        np.testing.assert_allclose(self.vectors @ self.queries[0], scores, atol=0.02)
+        self.assertGreaterEqual(recall(quantization.QuantizedMatrix(codes, quantizer, self.refs), self.exact, self.queries), 0.9)
+
+    def test_product_quantizer(self):
+        """Test that PQ codes are one byte per subspace and re-ranking restores the exact order."""
+        # Arrange
+        quantizer = quantization.ProductQuantizer.train(self.vectors, subspaces=8)
+
+        # Act
+        codes = quantizer.encode(self.vectors)
+        approximate = quantization.QuantizedMatrix(codes, quantizer, self.refs)
+        reranked = quantization.QuantizedMatrix(codes, quantizer, self.refs, exact=self.vectors, rerank=10)
+
+        # Assert
+        self.assertEqual((3000, 8), codes.shape)
+        self.assertEqual(np.uint8, codes.dtype)
+        np.testing.assert_allclose(quantizer.decode(codes) @ self.queries[0], quantizer.scores(codes, self.queries[0]), atol=1e-5)
+        self.assertGreaterEqual(recall(reranked, self.exact, self.queries), 0.95)
+        self.assertGreaterEqual(recall(reranked, self.exact, self.queries), recall(approximate, self.exact, self.queries))
+        query = self.queries[0]
+        (best_ref, best_score), = reranked.search(query, 1)
+        self.assertAlmostEqual(float(self.vectors[best_ref] @ (query / np.linalg.norm(query))), best_score, places=5)
+
+    def test_subspaces_divide_dimensions(self):
+        """Test that the number of subspaces is reduced to a divisor of the dimensions."""
+        # Act
+        quantizer = quantization.ProductQuantizer.train(self.vectors[:500], subspaces=12)
+
+        # Assert
+        self.assertEqual(4, quantizer.subspaces)
+        self.assertEqual(32, quantizer.dimensions)
+
+    def test_unsupported_kind(self):
+        """Test that an unknown VECTOR_QUANTIZATION is rejected."""
+        # Act & Assert
+        with self.assertRaises(ValueError):
+            quantization.train_quantizer("int4", self.vectors)
+
+
+class TestQuantizedSnapshots(unittest.TestCase):
+    """Test cases for the codes kept next to embedding snapshots."""
+
+    def setUp(self):
+        """Create a snapshot store in a temporary directory."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        self.store = SnapshotStore(self.tmp_dir)
+        vectors = clustered_vectors(400)
+        for day, block in (("2023_02_13", vectors[:200]), ("2023_02_14", vectors[200:])):
+            self.store.save(day, EmbeddingMatrix(block, [("c", ObjectId()) for _ in range(len(block))]))
+
+    def test_quantize_and_load(self):
+        """Test that every snapshot is encoded once and then searched through its codes."""
+        # Act
+        encoded = self.store.quantize("sq8")
+        again = self.store.quantize("sq8")
+        quantized = self.store.load("2023_02_14", "command_history_2023_02_14", quantization="sq8")
+        plain = self.store.load("2023_02_14", "command_history_2023_02_14")
+        query = clustered_vectors(1, seed=11)[0]
+
+        # Assert
+        self.assertEqual(["2023_02_13", "2023_02_14"], encoded)
+        self.assertEqual([], again)
+        self.assertIsInstance(quantized, quantization.QuantizedMatrix)
+        self.assertIsInstance(plain, EmbeddingMatrix)
+        self.assertEqual(plain.search(query, 3), quantized.search(query, 3))
+
+    def test_unquantized_day_falls_back_to_floats(self):
+        """Test that a snapshot without codes is searched as floats, and prune removes codes."""
+        # Arrange
+        self.store.quantize("pq")
+        os.remove(os.path.join(self.tmp_dir, "2023_02_14.pq.npy"))
+
+        # Act
+        loaded = self.store.load("2023_02_14", "command_history_2023_02_14", quantization="pq")
+        self.store.prune("2023_02_14")
+
+        # Assert
+        self.assertIsInstance(loaded, EmbeddingMatrix)
+        self.assertNotIn("2023_02_13.pq.npy", os.listdir(self.tmp_dir))
+
+    def test_retrain_after_growth(self):
+        """Test that the quantizer is retrained once the snapshots outgrow the rows it was trained from."""
+        # Arrange
+        self.store.quantize("sq8")
+        trained = self.store.quantizer("sq8")
+        vectors = clustered_vectors(1200, seed=5)
+        self.store.save("2023_02_15", EmbeddingMatrix(vectors, [("c", ObjectId()) for _ in range(len(vectors))]))
+
+        # Act
+        encoded = self.store.quantize("sq8")
+        retrained = self.store.quantizer("sq8")
+        again = self.store.quantize("sq8")
+        forced = self.store.quantize("sq8", retrain=True)
+
+        # Assert
+        self.assertEqual(400, trained.trained_rows)
+        self.assertEqual(["2023_02_13", "2023_02_14", "2023_02_15"], encoded)
+        self.assertEqual(1600, retrained.trained_rows)
+        self.assertEqual([], again)
+        self.assertEqual(encoded, forced)
+
+    def test_model_change_drops_stale_codes(self):
+        """Test that days of an older embedding size are searched as floats once the quantizer is retrained."""
+        # Arrange
+        self.store.quantize("sq8")
+        stale = os.path.join(self.tmp_dir, "2023_02_14.sq8.npy")
+        shutil.copy(stale, stale + ".old")
+        wider = clustered_vectors(200, dimensions=48, seed=7)
+        self.store.save("2023_02_15", EmbeddingMatrix(wider, [("c", ObjectId()) for _ in range(len(wider))]))
+        query = clustered_vectors(1, seed=11)[0]
+
+        # Act
+        self.store.quantize("sq8")
+        removed = not os.path.exists(stale)
+        os.replace(stale + ".old", stale)  # Codes left by an older version
+        loaded = self.store.load("2023_02_14", "command_history_2023_02_14", quantization="sq8")
+
+        # Assert
+        self.assertTrue(removed)
+        self.assertEqual(48, self.store.quantizer("sq8").dimensions)
+        self.assertIsInstance(loaded, EmbeddingMatrix)
+        self.assertEqual(3, len(loaded.search(query, 3)))
+
+    @patch.object(quantization, 'DEFAULT_RERANK_FACTOR', 0)
+    def test_rerank_default(self):
+        """Test that VECTOR_RERANK_FACTOR=0 keeps the approximate scores."""
+        # Arrange
+        self.store.quantize("sq8")
+
+        # Act
+        loaded = self.store.load("2023_02_14", "command_history_2023_02_14", quantization="sq8")
+
+        # Assert
+        self.assertEqual(0, loaded.rerank)
+
+
+if __name__ == '__main__':
+    unittest.main()
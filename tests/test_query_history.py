@@ -6,10 +6,12 @@ import datetime
 import sys
 import os
 from io import StringIO
+from pymongo.errors import OperationFailure
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import query_history
+import output_storage
 
 
 class TestQueryHistory(unittest.TestCase):
@@ -56,9 +58,35 @@ class TestQueryHistory(unittest.TestCase):
             self.assertIn("    Description: List all files with detailed information", output)
             self.assertIn("    Output: total 0", output)
 
+    def test_display_results_compressed_output(self):
+        """Test displaying output that was stored compressed."""
+        # Arrange
+        stdout = "x" * 5000
+        stderr = "warning: something happened\n" * 100
+        with patch.object(output_storage, 'DEFAULT_OUTPUT_COMPRESSION', 'gzip'):
+            results = [
+                {
+                    "command": "make",
+                    "exit_code": 0,
+                    "stdout": output_storage.encode_output(None, stdout),
+                    "stderr": output_storage.encode_output(None, stderr),
+                    "execution_time_seconds": 12.5,
+                    "timestamp": datetime.datetime(2023, 2, 15, 12, 0)
+                }
+            ]
+        
+        # Act
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            query_history.display_results(results)
+            output = fake_out.getvalue()
+            
+        # Assert
+        self.assertIn(f"    Output: {'x' * 100}...", output)
+        self.assertIn(f"    Error: {stderr}", output)
+
     @patch('query_history.connect_to_mongodb')
     @patch('query_history.build_query_filters')
-    @patch('query_history.query_commands')
+    @patch('query_history.list_commands')
     @patch('query_history.clean_old_collections')
     @patch('sys.argv', ['query_history.py', '--search', 'ls'])
     def test_main_function(self, mock_clean, mock_query, mock_build_filters, mock_connect):
@@ -93,7 +121,135 @@ class TestQueryHistory(unittest.TestCase):
             mock_connect.assert_called_once()
             mock_build_filters.assert_called_once()
             mock_query.assert_called_once_with(mock_db, mock_filters, 10, 30)
-            mock_display.assert_called_once_with(mock_results)
+            mock_display.assert_called_once_with(mock_results, db=mock_db)
+
+    def test_display_results_list_preview(self):
+        """Test that a projected preview is marked truncated from the full output length."""
+        # Arrange
+        results = [
+            {
+                "_id": "65c0f1a2b3c4d5e6f7a8b9c0",
+                "command": "make",
+                "exit_code": 2,
+                "stdout": "x" * 100,
+                "stdout_length": 5000,
+                "stderr": "error: missing",
+                "stderr_length": 14,
+                "execution_time_seconds": 3.0,
+                "timestamp": datetime.datetime(2023, 2, 15, 12, 0)
+            }
+        ]
+
+        # Act
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            query_history.display_results(results)
+            output = fake_out.getvalue()
+
+        # Assert
+        self.assertIn("    ID: 65c0f1a2b3c4d5e6f7a8b9c0", output)
+        self.assertIn(f"    Output: {'x' * 100}...", output)
+        self.assertIn("    Error: error: missing\n", output)
+
+    @patch('query_history.connect_to_mongodb')
+    @patch('query_history.list_commands')
+    @patch('sys.argv', ['query_history.py', '--search', 'docker build'])
+    def test_main_falls_back_to_regex_without_text_index(self, mock_list, mock_connect):
+        """Test that a missing text index falls back to the regex search."""
+        # Arrange
+        mock_list.side_effect = [OperationFailure("text index required for $text query", code=27), []]
+
+        # Act
+        with patch('sys.stdout', new=StringIO()), patch('sys.stderr', new=StringIO()) as fake_err:
+            exit_code = query_history.main()
+
+        # Assert
+        self.assertEqual(0, exit_code)
+        self.assertEqual({"$text": {"$search": "docker build"}}, mock_list.call_args_list[0][0][1])
+        self.assertEqual({"command": {"$regex": "docker build", "$options": "i"}}, mock_list.call_args_list[1][0][1])
+        self.assertIn("--repair-indexes", fake_err.getvalue())
+
+    @patch('query_history.connect_to_mongodb')
+    @patch('query_history.page_commands')
+    @patch('sys.argv', ['query_history.py', '--page', '2', '--limit', '5', '--after', 'abc'])
+    def test_main_paging(self, mock_page, mock_connect):
+        """Test that --page/--after stream a page and print the next page's token."""
+        # Arrange
+        mock_page.return_value = ([], "next-token")
+
+        # Act
+        with patch('query_history.display_results') as mock_display, patch('sys.stdout', new=StringIO()) as fake_out:
+            exit_code = query_history.main()
+
+        # Assert
+        self.assertEqual(0, exit_code)
+        args = mock_page.call_args[0]
+        self.assertEqual((5, 30), args[2:4])
+        self.assertEqual(("abc", 2), args[5:])
+        mock_display.assert_called_once_with([], db=mock_connect.return_value, start=6)
+        self.assertIn("Next page: --after next-token", fake_out.getvalue())
+
+    @patch('query_history.connect_to_mongodb')
+    @patch('query_history.page_commands')
+    @patch('sys.argv', ['query_history.py', '--failed'])
+    def test_main_first_page_prints_token(self, mock_page, mock_connect):
+        """Test that the first page of a listing is keyset paged and prints its token."""
+        # Arrange
+        mock_page.return_value = ([], "next-token")
+
+        # Act
+        with patch('query_history.display_results') as mock_display, patch('sys.stdout', new=StringIO()) as fake_out:
+            exit_code = query_history.main()
+
+        # Assert
+        self.assertEqual(0, exit_code)
+        self.assertEqual((None, 1), mock_page.call_args[0][5:])
+        mock_display.assert_called_once_with([], db=mock_connect.return_value, start=1)
+        self.assertIn("Next page: --after next-token", fake_out.getvalue())
+
+    @patch('query_history.connect_to_mongodb')
+    @patch('query_history.page_commands')
+    @patch('query_history.list_commands')
+    def test_main_rejects_paging_ranked_search(self, mock_list, mock_page, mock_connect):
+        """Test that a relevance-ranked search cannot be continued with newest-first paging."""
+        for argv in (['--search', 'docker', '--page', '2'], ['--search', 'docker', '--after', 'abc']):
+            with self.subTest(argv=argv):
+                # Act
+                with patch('sys.argv', ['query_history.py'] + argv), patch('sys.stderr', new=StringIO()) as fake_err:
+                    exit_code = query_history.main()
+
+                # Assert
+                self.assertEqual(1, exit_code)
+                self.assertIn("--regex", fake_err.getvalue())
+        mock_list.assert_not_called()
+        mock_page.assert_not_called()
+
+    @patch('query_history.connect_to_mongodb')
+    @patch('query_history.get_command')
+    @patch('query_history.list_commands')
+    @patch('sys.argv', ['query_history.py', '--show', '65c0f1a2b3c4d5e6f7a8b9c0'])
+    def test_main_show_record(self, mock_list, mock_get, mock_connect):
+        """Test that --show prints the full record instead of listing."""
+        # Arrange
+        mock_get.return_value = {
+            "_id": "65c0f1a2b3c4d5e6f7a8b9c0",
+            "command": "make",
+            "exit_code": 0,
+            "stdout": "y" * 500,
+            "stderr": "",
+            "execution_time_seconds": 3.0,
+            "timestamp": datetime.datetime(2023, 2, 15, 12, 0)
+        }
+
+        # Act
+        with patch('sys.stdout', new=StringIO()) as fake_out:
+            exit_code = query_history.main()
+            output = fake_out.getvalue()
+
+        # Assert
+        self.assertEqual(0, exit_code)
+        mock_get.assert_called_once_with(mock_connect.return_value, "65c0f1a2b3c4d5e6f7a8b9c0")
+        mock_list.assert_not_called()
+        self.assertIn("y" * 500, output)
 
 
 if __name__ == '__main__':
@@ -3,6 +3,7 @@
 import unittest
 from unittest.mock import MagicMock, patch
 import datetime
+import io
 import sys
 import os
 
@@ -65,14 +66,64 @@ class TestTerminalLogger(unittest.TestCase):
             self.assertIsInstance(result["execution_time_seconds"], float)
             self.assertIsInstance(result["timestamp"], datetime.datetime)
 
+    def test_execute_command_stream(self):
+        """Test streaming output to the terminal while capturing it."""
+        # Arrange
+        command = "echo 'out'; echo 'err' >&2; exit 3"
+        fake_stdout = io.TextIOWrapper(io.BytesIO())
+        fake_stderr = io.TextIOWrapper(io.BytesIO())
+        
+        # Act
+        with patch('sys.stdout', new=fake_stdout), patch('sys.stderr', new=fake_stderr):
+            result = terminal_logger.execute_command(command, stream=True)
+        
+        # Assert
+        self.assertEqual(3, result["exit_code"])
+        self.assertEqual("out\n", result["stdout"])
+        self.assertEqual("err\n", result["stderr"])
+        self.assertEqual(b"out\n", fake_stdout.buffer.getvalue())
+        self.assertEqual(b"err\n", fake_stderr.buffer.getvalue())
+
+    def test_execute_command_stream_bounded(self):
+        """Test that streamed output is passed through in full but captured within bounds."""
+        # Arrange
+        command = f"{sys.executable} -c \"print('a' * 100 + 'b' * 100000 + 'c' * 100)\""
+        fake_stdout = io.TextIOWrapper(io.BytesIO())
+        
+        # Act
+        with patch('sys.stdout', new=fake_stdout), \
+                patch.object(terminal_logger, 'DEFAULT_CAPTURE_HEAD_BYTES', 100), \
+                patch.object(terminal_logger, 'DEFAULT_CAPTURE_TAIL_BYTES', 101):
+            result = terminal_logger.execute_command(command, stream=True)
+        
+        # Assert
+        self.assertEqual(100201, len(fake_stdout.buffer.getvalue()))
+        self.assertTrue(result["stdout"].startswith("a" * 100 + "\n... [100000 bytes truncated] ...\n"))
+        self.assertTrue(result["stdout"].endswith("c" * 100 + "\n"))
+
+    def test_bounded_capture(self):
+        """Test keeping the head and tail of a stream."""
+        # Arrange
+        capture = terminal_logger.BoundedCapture(head_bytes=4, tail_bytes=4)
+        
+        # Act
+        for chunk in (b"abc", b"defgh", b"ijklmn"):
+            capture.write(chunk)
+        
+        # Assert
+        self.assertEqual(14, capture.total_bytes)
+        self.assertEqual(6, capture.dropped_bytes)
+        self.assertEqual("abcd\n... [6 bytes truncated] ...\nklmn", capture.getvalue())
+
     @patch('terminal_logger.connect_to_mongodb')
     @patch('terminal_logger.execute_command')
-    @patch('terminal_logger.analyze_command')
+    @patch('terminal_logger.categorize_command')
+    @patch('terminal_logger.add_vector_to_result', side_effect=lambda result: result)
     @patch('terminal_logger.store_command_result')
     @patch('terminal_logger.clean_old_collections')
-    @patch('sys.argv', ['terminal_logger.py', 'echo test'])
-    def test_main_function(self, mock_clean, mock_store, mock_analyze, mock_execute, mock_connect):
-        """Test the main function."""
+    @patch('sys.argv', ['terminal_logger.py', '--sync', 'echo test'])
+    def test_main_function(self, mock_clean, mock_store, mock_vector, mock_analyze, mock_execute, mock_connect):
+        """Test the main function in synchronous mode."""
         # Arrange
         mock_db = MagicMock()
         mock_connect.return_value = mock_db
@@ -101,6 +152,38 @@ class TestTerminalLogger(unittest.TestCase):
             mock_store.assert_called_once()
             mock_exit.assert_called_once_with(0)
 
+    @patch('terminal_logger.connect_to_mongodb')
+    @patch('terminal_logger.execute_command')
+    @patch('terminal_logger.categorize_command')
+    @patch('terminal_logger.store_command_result')
+    @patch('terminal_logger.submit_result')
+    @patch('sys.argv', ['terminal_logger.py', '--no-ai', '--ai-model', 'test_model', 'false'])
+    def test_main_function_daemon(self, mock_submit, mock_store, mock_analyze, mock_execute, mock_connect):
+        """Test that the default mode hands the result to the ingestion daemon."""
+        # Arrange
+        result = {
+            "command": "false",
+            "exit_code": 1,
+            "stdout": "",
+            "stderr": "",
+            "execution_time_seconds": 0.1,
+            "timestamp": datetime.datetime.now()
+        }
+        mock_execute.return_value = result
+        mock_submit.return_value = "daemon"
+        
+        # Act
+        with patch.dict(os.environ, {"INGEST_MODE": "daemon"}):
+            with patch('sys.exit') as mock_exit:
+                terminal_logger.main()
+            
+        # Assert
+        mock_connect.assert_not_called()
+        mock_analyze.assert_not_called()
+        mock_store.assert_not_called()
+        mock_submit.assert_called_once_with(result, "test_model", True)
+        mock_exit.assert_called_once_with(1)
+
 
 if __name__ == '__main__':
     unittest.main()
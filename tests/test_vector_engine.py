@@ -0,0 +1,134 @@
+"""Tests for the vectorized similarity engine."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+import numpy as np
+from bson import ObjectId
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import vector_engine
+import vector_search
+
+
+class TestVectorEngine(unittest.TestCase):
+    """Test cases for matrix scoring and top-k selection."""
+
+    def test_top_k(self):
+        """Test that the best scores are returned best first."""
+        # Arrange
+        scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3], dtype=np.float32)
+
+        # Act & Assert
+        self.assertEqual([1, 3, 2], list(vector_engine.top_k(scores, 3)))
+        self.assertEqual([1, 3, 2, 4, 0], list(vector_engine.top_k(scores, 10)))
+        self.assertEqual([], list(vector_engine.top_k(scores, 0)))
+
+    def test_normalize_rows_keeps_zero_rows(self):
+        """Test that rows are scaled to unit length and zero rows are left alone."""
+        # Act
+        matrix = vector_engine.normalize_rows(np.array([[3, 4], [0, 0]], dtype=np.float32))
+
+        # Assert
+        np.testing.assert_allclose([[0.6, 0.8], [0, 0]], matrix)
+
+    def test_search_matches_pairwise_cosine(self):
+        """Test that matrix scoring ranks like the pairwise cosine similarity."""
+        # Arrange
+        rng = np.random.default_rng(7)
+        vectors = rng.normal(size=(200, 16))
+        refs = [("command_history_2023_02_15", ObjectId()) for _ in range(200)]
+        matrix = vector_engine.EmbeddingMatrix.from_blocks([(vectors[:120], refs[:120]), (vectors[120:], refs[120:])])
+        query = rng.normal(size=16)
+
+        # Act
+        ranked = matrix.search(query, 5)
+
+        # Assert
+        expected = sorted(range(200), key=lambda i: vector_search.cosine_similarity(query, vectors[i]), reverse=True)[:5]
+        self.assertEqual([refs[i] for i in expected], [ref for ref, _ in ranked])
+        self.assertAlmostEqual(vector_search.cosine_similarity(query, vectors[expected[0]]), ranked[0][1], places=5)
+        self.assertEqual(np.float32, matrix.matrix.dtype)
+
+    def test_load_embeddings_skips_other_dimensions(self):
+        """Test that only _id and the embedding are fetched and mismatched sizes are skipped."""
+        # Arrange
+        mock_db = MagicMock()
+        ids = [ObjectId(), ObjectId(), ObjectId()]
+        mock_db.__getitem__.return_value.find.return_value = [
+            {"_id": ids[0], "vector_embedding": [1.0, 0.0]},
+            {"_id": ids[1], "vector_embedding": [1.0, 0.0, 0.0]},
+            {"_id": ids[2], "vector_embedding": [0.0, 2.0]},
+        ]
+
+        # Act
+        matrix = vector_engine.load_embeddings(mock_db, ["command_history_2023_02_15"], {}, dimensions=2)
+
+        # Assert
+        self.assertEqual(2, len(matrix))
+        self.assertEqual(("command_history_2023_02_15", ids[2]), matrix.refs[1])
+        mock_db.__getitem__.return_value.find.assert_called_once_with(
+            {"vector_embedding": {"$exists": True}}, {"vector_embedding": 1}
+        )
+
+    def test_load_embeddings_reads_both_formats(self):
+        """Test that binary and legacy list embeddings are loaded into the same matrix."""
+        # Arrange
+        from embedding_storage import encode_embedding
+
+        mock_db = MagicMock()
+        ids = [ObjectId(), ObjectId()]
+        mock_db.__getitem__.return_value.find.return_value = [
+            {"_id": ids[0], "vector_embedding": encode_embedding([3.0, 4.0])},
+            {"_id": ids[1], "vector_embedding": [0.0, 2.0]},
+        ]
+
+        # Act
+        matrix = vector_engine.load_embeddings(mock_db, ["command_history_2023_02_15"], {})
+
+        # Assert
+        np.testing.assert_allclose([[0.6, 0.8], [0.0, 1.0]], matrix.matrix)
+
+    def test_fetch_ranked_keeps_rank_order(self):
+        """Test that winners are fetched by _id per collection and returned in rank order."""
+        # Arrange
+        mock_db = MagicMock()
+        ids = [ObjectId(), ObjectId()]
+        mock_db.__getitem__.return_value.find.return_value = [{"_id": ids[1], "command": "b"}, {"_id": ids[0], "command": "a"}]
+        ranked = [(("c", ids[0]), 0.9), (("c", ids[1]), 0.4)]
+
+        # Act
+        results = vector_engine.fetch_ranked(mock_db, ranked, {"command": 1})
+
+        # Assert
+        self.assertEqual(["a", "b"], [doc["command"] for doc in results])
+        self.assertEqual([0.9, 0.4], [doc["score"] for doc in results])
+        mock_db.__getitem__.return_value.find.assert_called_once_with({"_id": {"$in": ids}}, {"command": 1})
+
+    @patch('vector_search.generate_embedding', return_value=[1.0, 0.0])
+    def test_vector_search(self, mock_embedding):
+        """Test that vector_search scores all days at once and fetches only the winners."""
+        # Arrange
+        mock_db = MagicMock()
+        close, far = ObjectId(), ObjectId()
+        collection = mock_db.__getitem__.return_value
+        collection.find.side_effect = [
+            [{"_id": far, "vector_embedding": [0.0, 1.0]}, {"_id": close, "vector_embedding": [0.9, 0.1]}],
+            [{"_id": close, "command": "ls"}],
+        ]
+
+        # Act
+        with patch('db.get_collections_in_date_range', return_value=["command_history_2023_02_15"]), \
+                patch('db.date_range_filter', return_value={}):
+            results = vector_search.vector_search(mock_db, "list files", limit=1)
+
+        # Assert
+        self.assertEqual(["ls"], [doc["command"] for doc in results])
+        self.assertEqual({"_id": {"$in": [close]}}, collection.find.call_args[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
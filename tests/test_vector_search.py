@@ -0,0 +1,60 @@
+"""Tests for the vector search module."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+import subprocess
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import vector_search
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+class TestVectorSearch(unittest.TestCase):
+    """Test cases for vector search."""
+
+    def test_entry_points_do_not_import_heavy_modules(self):
+        """Test that importing the CLI modules does not load the model stack."""
+        # Arrange
+        code = (
+            "import sys, terminal_logger, query_history, vector_query, maintain_db, ingest_daemon; "
+            "print(','.join(m for m in ('sentence_transformers', 'torch', 'numpy', 'requests') if m in sys.modules))"
+        )
+
+        # Act
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+        # Assert
+        self.assertEqual("", output.stdout.strip())
+
+    @patch('vector_search.fetch_embeddings', return_value=None)
+    def test_model_loaded_once_on_first_use(self, mock_fetch):
+        """Test that the embedding model is created lazily and reused."""
+        # Arrange
+        fake_module = MagicMock()
+        fake_module.SentenceTransformer.return_value.encode.return_value = MagicMock(tolist=lambda: [0.1, 0.2])
+
+        # Act
+        with patch.dict(sys.modules, {"sentence_transformers": fake_module}), \
+                patch.object(vector_search, '_model', None):
+            first = vector_search.generate_embedding("ls -la")
+            second = vector_search.generate_embedding("pwd")
+
+        # Assert
+        self.assertEqual([0.1, 0.2], first)
+        self.assertEqual([0.1, 0.2], second)
+        fake_module.SentenceTransformer.assert_called_once_with(vector_search.EMBEDDING_MODEL_NAME)
+
+    def test_cosine_similarity(self):
+        """Test cosine similarity of simple vectors."""
+        # Act & Assert
+        self.assertAlmostEqual(1.0, vector_search.cosine_similarity([1, 0], [2, 0]))
+        self.assertAlmostEqual(0.0, vector_search.cosine_similarity([1, 0], [0, 1]))
+        self.assertEqual(0, vector_search.cosine_similarity([0, 0], [0, 1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Vectorized similarity search over command embeddings.
+
+Embeddings are held in one contiguous float32 matrix whose rows are scaled
+to unit length when it is built, so the cosine similarity with every row is
+a single matrix-vector product and the best matches are picked with
+argpartition instead of sorting all scores. numpy is imported by the
+functions that need it, so importing this module stays cheap.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from bson import ObjectId
+from pymongo.database import Database
+
+from embedding_storage import embedding_length, stack_embeddings
+
+# (collection name, _id) of the document a matrix row came from
+RowRef = Tuple[str, ObjectId]
+
+
+def normalize_rows(matrix):
+    """Scale the rows of a float matrix to unit length in place; zero rows stay zero."""
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+
+def normalize(vector: Sequence[float]):
+    """Return the vector as unit-length float32, or None if it is all zeros."""
+    import numpy as np
+
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else None
+
+
+def top_k(scores, k: int):
+    """Return the indices of the k highest scores, best first."""
+    import numpy as np
+
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class EmbeddingMatrix:
+    """Unit-length embeddings in one float32 matrix, with the document of each row."""
+
+    def __init__(self, matrix, refs: List[RowRef]):
+        """
+        Args:
+            matrix: float32 array of shape (rows, dimensions), already normalized
+            refs: (collection name, _id) of each row
+        """
+        self.matrix = matrix
+        self.refs = refs
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+    @classmethod
+    def from_blocks(cls, blocks: Iterable[Tuple[Any, List[RowRef]]]) -> "EmbeddingMatrix":
+        """Stack blocks of raw (unnormalized) vectors into one normalized matrix."""
+        import numpy as np
+
+        arrays, refs = [], []
+        for vectors, block_refs in blocks:
+            if len(block_refs):
+                arrays.append(np.asarray(vectors, dtype=np.float32))
+                refs.extend(block_refs)
+        if not arrays:
+            return cls(np.empty((0, 0), dtype=np.float32), [])
+        return cls(normalize_rows(np.concatenate(arrays) if len(arrays) > 1 else arrays[0].copy()), refs)
+
+    def search(self, query: Sequence[float], k: int) -> List[Tuple[RowRef, float]]:
+        """
+        Return the k rows most similar to the query, best first.
+
+        Returns:
+            List of ((collection name, _id), cosine similarity) pairs
+        """
+        query = normalize(query)
+        if query is None or not len(self) or self.matrix.shape[1] != len(query):
+            return []
+        scores = self.matrix @ query
+        return [(self.refs[i], float(scores[i])) for i in top_k(scores, k)]
+
+
+def search_matrices(matrices: Iterable[EmbeddingMatrix], query: Sequence[float], k: int) -> List[Tuple[RowRef, float]]:
+    """Return the k rows most similar to the query across several matrices, best first."""
+    ranked = [match for matrix in matrices for match in matrix.search(query, k)]
+    ranked.sort(key=lambda match: match[1], reverse=True)
+    return ranked[:k]
+
+
+def load_embeddings(
+    db: Database, collection_names: List[str], query: Dict[str, Any], dimensions: Optional[int] = None
+) -> EmbeddingMatrix:
+    """
+    Read the embeddings of matching documents into an EmbeddingMatrix.
+
+    Only _id and vector_embedding are fetched, in either stored format.
+    Embeddings of another size than `dimensions` (from a different model)
+    are skipped; without `dimensions`, the size of the first one is used.
+    """
+    blocks = []
+    for collection_name in collection_names:
+        vectors, refs = [], []
+        cursor = db[collection_name].find({"vector_embedding": {"$exists": True}, **query}, {"vector_embedding": 1})
+        for doc in cursor:
+            vector = doc.get("vector_embedding")
+            size = embedding_length(vector)
+            if dimensions is None and size:
+                dimensions = size
+            if size and size == dimensions:
+                vectors.append(vector)
+                refs.append((collection_name, doc["_id"]))
+        blocks.append((stack_embeddings(vectors, dimensions or 0), refs))
+    return EmbeddingMatrix.from_blocks(blocks)
+
+
+def fetch_ranked(
+    db: Database, ranked: List[Tuple[RowRef, float]], projection: Dict[str, Any] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch the documents of ranked rows by _id, in rank order.
+
+    Each document gets its similarity as 'score'. One query is sent per
+    collection that holds a winner.
+    """
+    by_collection: Dict[str, List[ObjectId]] = {}
+    for (collection_name, record_id), _ in ranked:
+        by_collection.setdefault(collection_name, []).append(record_id)
+
+    documents: Dict[RowRef, Dict[str, Any]] = {}
+    for collection_name, ids in by_collection.items():
+        for doc in db[collection_name].find({"_id": {"$in": ids}}, projection):
+            documents[(collection_name, doc["_id"])] = doc
+
+    results = []
+    for ref, score in ranked:
+        doc = documents.get(ref)
+        if doc is not None:
+            doc["score"] = score
+            results.append(doc)
+    return results
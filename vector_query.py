@@ -6,6 +6,7 @@ import sys
 from typing import Dict, Any, List
 
 from db import connect_to_mongodb
+from quantization import QUANTIZERS
 from vector_search import vector_search
 from query_history import display_results
 
@@ -15,6 +16,10 @@ def main():
     parser.add_argument("query", help="Natural language query")
     parser.add_argument("--limit", type=int, default=10, help="Maximum number of results (default: 10)")
     parser.add_argument("--days", type=int, default=30, help="Search commands from the last N days (default: 30)")
+    parser.add_argument("--nprobe", type=int, help="Vector index clusters to scan: higher finds more of the best matches but is slower (default: $VECTOR_INDEX_NPROBE)")
+    parser.add_argument("--exact", action="store_true", help="Scan every embedding as floats, even when the vector index or quantization is enabled")
+    parser.add_argument("--quantization", choices=("off",) + QUANTIZERS, help="Score past days from int8 (sq8) or product-quantized (pq) codes (default: $VECTOR_QUANTIZATION)")
+    parser.add_argument("--rerank", type=int, help="Candidates per result re-scored exactly after quantized scoring; 0 for none (default: $VECTOR_RERANK_FACTOR)")
     
     args = parser.parse_args()
     
@@ -25,10 +30,10 @@ def main():
     print("---")
     
     # Perform vector search
-    results = vector_search(db, args.query, args.limit, args.days)
+    results = vector_search(db, args.query, args.limit, args.days, nprobe=args.nprobe, exact=args.exact, quantization=args.quantization, rerank=args.rerank)
     
     # Display results
-    display_results(results)
+    display_results(results, db=db)
     
     return 0
 
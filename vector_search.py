@@ -1,18 +1,48 @@
 """Vector embedding and search functionality for terminal logger."""
 
-import numpy as np
-from sentence_transformers import SentenceTransformer
 from typing import Dict, Any, List, Optional
 from pymongo.database import Database
 
-# Initialize the embedding model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from config import get_env
+from embedding_server import fetch_embeddings
+from embedding_storage import encode_embedding
+
+EMBEDDING_MODEL_NAME = get_env("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# The embedding model is loaded on first use; importing sentence_transformers
+# pulls in torch, which would otherwise slow down every CLI start
+_model = None
+
+def get_model():
+    """Return the embedding model, loading it on first use."""
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+    return _model
 
 def generate_embedding(text: str) -> List[float]:
-    """Generate a vector embedding for the given text."""
-    embedding = model.encode(text)
+    """
+    Generate a vector embedding for the given text.
+
+    Uses the embedding server when one is running, so the model does not have
+    to be loaded in this process, and falls back to encoding locally.
+    """
+    embeddings = fetch_embeddings([text])
+    if embeddings is not None:
+        return embeddings[0]
+
+    embedding = get_model().encode(text)
     return embedding.tolist()  # Convert numpy array to list for MongoDB storage
 
+def generate_embeddings(texts: List[str]) -> List[List[float]]:
+    """Generate the embeddings of several texts in one batch (see generate_embedding)."""
+    embeddings = fetch_embeddings(texts)
+    if embeddings is not None:
+        return embeddings
+
+    return get_model().encode(texts).tolist()
+
 def create_command_vector(command: str, description: str = "") -> List[float]:
     """Create a combined vector for command and description."""
     # Combine command and description for a richer embedding
@@ -20,13 +50,13 @@ def create_command_vector(command: str, description: str = "") -> List[float]:
     return generate_embedding(combined_text)
 
 def add_vector_to_result(result: Dict[str, Any]) -> Dict[str, Any]:
-    """Add vector embedding to command result."""
+    """Add vector embedding to command result, packed as a binary (see embedding_storage)."""
     command = result["command"]
     description = result.get("ai_description", "")
     
     # Generate vector embedding
     vector = create_command_vector(command, description)
-    result["vector_embedding"] = vector
+    result["vector_embedding"] = encode_embedding(vector)
     
     return result
 
@@ -34,54 +64,70 @@ def vector_search(
     db: Database, 
     query: str, 
     limit: int = 10, 
-    days_to_search: int = 30
+    days_to_search: int = 30,
+    nprobe: int = None,
+    exact: bool = False,
+    quantization: str = None,
+    rerank: int = None
 ) -> List[Dict[str, Any]]:
     """
     Search for commands using vector similarity.
+
+    The embeddings in range are scored together as one normalized float32
+    matrix (see vector_engine); only the winning documents are fetched, by
+    _id, with the listing projection. With VECTOR_INDEX=ivf the on-disk index
+    (see ann_index) is searched instead of reading embeddings from MongoDB.
+    Past days are read from their snapshots (see embedding_snapshots), and
+    with VECTOR_QUANTIZATION from their compressed codes (see quantization).
     
     Args:
         db: MongoDB database instance
         query: Natural language query
         limit: Maximum number of results to return
         days_to_search: Number of days to search back
+        nprobe: Index clusters to scan; more is slower but finds more of
+            the true best matches (default: VECTOR_INDEX_NPROBE)
+        exact: Scan every embedding as floats, even when the index or
+            quantization is enabled
+        quantization: 'sq8', 'pq' or 'off' (default: VECTOR_QUANTIZATION)
+        rerank: Candidates per result re-scored exactly after quantized
+            scoring; 0 or 1 keeps the approximate order (default:
+            VECTOR_RERANK_FACTOR)
         
     Returns:
-        List of command history records sorted by relevance
+        List of command history records sorted by relevance, each with its
+        cosine similarity as 'score'
     """
+    from datetime import datetime, timedelta
+    from ann_index import get_vector_index, vector_index_enabled
+    from db import list_projection, uses_single_collection, HISTORY_COLLECTION
+    from embedding_snapshots import load_recent_embeddings
+    from index_manager import day_collection_name
+    from quantization import DEFAULT_VECTOR_QUANTIZATION
+    from vector_engine import fetch_ranked, search_matrices
+
     # Generate vector for the query
     query_vector = generate_embedding(query)
-    
-    # Get collections from the date range
-    from datetime import datetime, timedelta
-    from db import get_collections_in_date_range
-    
     start_date = datetime.now() - timedelta(days=days_to_search)
-    collections = get_collections_in_date_range(db, start_date)
-    
-    # Results with similarity scores
-    results_with_scores = []
-    
-    for collection_name in collections:
-        collection = db[collection_name]
-        
-        # Find documents with vector embeddings
-        documents = collection.find({"vector_embedding": {"$exists": True}})
-        
-        for doc in documents:
-            doc_vector = doc.get("vector_embedding")
-            if doc_vector:
-                # Calculate cosine similarity
-                similarity = cosine_similarity(query_vector, doc_vector)
-                results_with_scores.append((doc, similarity))
-    
-    # Sort by similarity score (highest first)
-    results_with_scores.sort(key=lambda x: x[1], reverse=True)
+
+    index = get_vector_index(db.name) if vector_index_enabled() and not exact else None
+    if index is not None and index.meta() is not None:
+        matches = index.search(query_vector, limit, nprobe, start_date.strftime("%Y_%m_%d"))
+        ranked = [
+            ((HISTORY_COLLECTION if uses_single_collection() else day_collection_name(datetime.strptime(day, "%Y_%m_%d")), record_id), score)
+            for day, record_id, score in matches
+        ]
+        return fetch_ranked(db, ranked, list_projection())
     
-    # Return top matches
-    return [item[0] for item in results_with_scores[:limit]]
+    # Past days from their memory-mapped snapshots, the rest from MongoDB
+    quantization = "off" if exact else (quantization or DEFAULT_VECTOR_QUANTIZATION)
+    matrices = load_recent_embeddings(db, start_date, len(query_vector), quantization, rerank)
+    return fetch_ranked(db, search_matrices(matrices, query_vector, limit), list_projection())
 
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     """Calculate cosine similarity between two vectors."""
+    import numpy as np
+
     vec1 = np.array(vec1)
     vec2 = np.array(vec2)
     